@@ -0,0 +1,147 @@
+"""Сравнение experiment4 (hashing + потоковый IDF) с experiment1 (TF-IDF + Ridge).
+
+Обе модели обучаются на одном сплите датасета basic_lemmas. IDF hashing
+копится через partial_fit по чанкам CSV, но Ridge обучается в памяти на
+матрице всех чанков: вне памяти обучается только IDF. Полностью потоковое
+обучение - тип sgd (train_incremental.py), сервисные артефакты experiment4
+сохраняет train_experiment.py.
+Сравниваются качество (MAE, RMSE, R2), время обучения, скорость transform и
+размер артефакта векторайзера, который нужен сервису.
+
+Запуск из корня проекта:
+    python benchmarks/bench_hashing.py
+    python benchmarks/bench_hashing.py --baseline experiment1 --hashing experiment4
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config_loader import config
+from hashing_features import HashingTfidfFeaturizer, iter_csv_chunks
+
+TARGET_COLUMN = "comments_count"
+
+
+def load_split(exp_config):
+    """Сплит как в ноутбуке: test_size и random_state из секции training"""
+    import pandas as pd
+
+    dataset_info = config.get_dataset_info(exp_config["dataset"])
+    text_column = dataset_info.get("text_column", "processed_text")
+    df = pd.read_csv(config.get_dataset_path(exp_config["dataset"]), usecols=[text_column, TARGET_COLUMN])
+    df = df.dropna(subset=[text_column, TARGET_COLUMN])
+
+    training = config.train_config.training
+    train_df, test_df = train_test_split(df, test_size=training.test_size, random_state=training.random_state)
+    return train_df, test_df, text_column
+
+
+def fit_tfidf(exp_config, train_df, text_column):
+    tfidf_params = dict(exp_config["tfidf_params"])
+    tfidf_params["ngram_range"] = tuple(tfidf_params["ngram_range"])
+    vectorizer = TfidfVectorizer(**tfidf_params)
+    model = Ridge(**exp_config["ridge_params"])
+    model.fit(vectorizer.fit_transform(train_df[text_column]), train_df[TARGET_COLUMN])
+    return vectorizer, model
+
+
+def fit_hashing(exp_config, train_path, text_column):
+    """IDF копится по чанкам; Ridge обучается в памяти на матрице, собранной из тех же чанков"""
+    chunk_size = exp_config.get("chunk_size", 1000)
+    featurizer = HashingTfidfFeaturizer.from_config(exp_config)
+    for chunk in iter_csv_chunks(train_path, text_column, TARGET_COLUMN, chunk_size):
+        featurizer.partial_fit(chunk[text_column].tolist())
+
+    # Второй проход: IDF уже финальный, храним только разреженные признаки
+    from scipy import sparse
+    parts, targets = [], []
+    for chunk in iter_csv_chunks(train_path, text_column, TARGET_COLUMN, chunk_size):
+        parts.append(featurizer.transform(chunk[text_column].tolist()))
+        targets.append(chunk[TARGET_COLUMN].values)
+
+    model = Ridge(**exp_config["ridge_params"])
+    model.fit(sparse.vstack(parts).tocsr(), np.concatenate(targets))
+    return featurizer, model
+
+
+def evaluate(name, vectorizer, model, test_df, text_column, fit_time, artifact_bytes):
+    texts = test_df[text_column].tolist()
+    start = time.perf_counter()
+    features = vectorizer.transform(texts)
+    transform_time = time.perf_counter() - start
+    predictions = model.predict(features)
+    y_true = test_df[TARGET_COLUMN].values
+
+    return {
+        "name": name,
+        "mae": mean_absolute_error(y_true, predictions),
+        "rmse": float(np.sqrt(mean_squared_error(y_true, predictions))),
+        "r2": r2_score(y_true, predictions),
+        "fit_time_s": fit_time,
+        "transform_per_s": len(texts) / transform_time if transform_time else float("inf"),
+        "artifact_kb": artifact_bytes / 1024,
+    }
+
+
+def pickle_size(obj) -> int:
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer)
+    return buffer.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк hashing векторайзера против TF-IDF")
+    parser.add_argument("--baseline", default="experiment1", help="Эксперимент с TfidfVectorizer")
+    parser.add_argument("--hashing", default="experiment4", help="Эксперимент типа hashing")
+    args = parser.parse_args()
+
+    baseline_config = config.get_experiment_config(int(args.baseline.replace("experiment", "")))
+    hashing_config = config.get_experiment_config(int(args.hashing.replace("experiment", "")))
+    if hashing_config["type"] != "hashing":
+        raise ValueError(f"{args.hashing} имеет тип {hashing_config['type']}, ожидается hashing")
+
+    train_df, test_df, text_column = load_split(baseline_config)
+    print(f"📊 Обучение: {len(train_df)}, тест: {len(test_df)}")
+
+    start = time.perf_counter()
+    vectorizer, model = fit_tfidf(baseline_config, train_df, text_column)
+    results = [evaluate(baseline_config["name"], vectorizer, model, test_df, text_column,
+                        time.perf_counter() - start, pickle_size(vectorizer))]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Тот же train сплит, но читается с диска чанками
+        train_path = os.path.join(tmp_dir, "train.csv")
+        train_df[[text_column, TARGET_COLUMN]].to_csv(train_path, index=False)
+
+        start = time.perf_counter()
+        featurizer, hashing_model = fit_hashing(hashing_config, train_path, text_column)
+        fit_time = time.perf_counter() - start
+
+        featurizer_path = os.path.join(tmp_dir, "hashing_vectorizer.npz")
+        featurizer.save(featurizer_path)
+        results.append(evaluate(hashing_config["name"], featurizer, hashing_model, test_df, text_column,
+                                fit_time, os.path.getsize(featurizer_path)))
+
+    print(f"\n{'Эксперимент':<20}{'MAE':>10}{'RMSE':>10}{'R2':>8}{'Обучение, с':>14}"
+          f"{'transform/с':>14}{'Артефакт, КБ':>15}")
+    for row in results:
+        print(f"{row['name']:<20}{row['mae']:>10.3f}{row['rmse']:>10.3f}{row['r2']:>8.3f}"
+              f"{row['fit_time_s']:>14.2f}{row['transform_per_s']:>14.0f}{row['artifact_kb']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
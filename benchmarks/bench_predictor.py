@@ -0,0 +1,250 @@
+"""Микробенчмарки горячего пути предсказания внутри процесса.
+
+Отдельно меряются стадии:
+    transform      - vectorizer.transform (sklearn)
+    model_predict  - model.predict на готовой матрице (sklearn)
+    engine_predict - NumPy движок scoring_engine (transform + predict)
+    predict        - ModelPredictor.predict, по одному тексту
+    batch_predict  - ModelPredictor.batch_predict
+
+для коротких/средних/длинных текстов и батчей 1, 8, 64, 512, 4096.
+Время считается как в pytest-benchmark: несколько раундов до min_time,
+берутся min/median/mean/stddev. Аллокации - отдельным прогоном под
+tracemalloc (пик и число выделенных блоков), чтобы не искажать время.
+
+Результат сохраняется как baseline и сравнивается с ним; код выхода 1 -
+стадия стала медленнее или прожорливее допуска, 2 - baseline нет (время
+зависит от машины, поэтому baseline снимается на той же машине, где идет
+сравнение, до изменений). Вместе с результатами пишется отпечаток
+артефактов, так что видно, что изменилось - код или модель.
+
+Запуск из корня проекта:
+    python benchmarks/bench_predictor.py --save-baseline
+    python benchmarks/bench_predictor.py                 # сравнение с baseline
+    python benchmarks/bench_predictor.py --batch-sizes 1,64 --lengths short
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import joblib
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SERVICE_DIR = os.path.join(PROJECT_ROOT, "service")
+sys.path.insert(0, SERVICE_DIR)
+
+from predictor import ModelPredictor
+from prediction_cache import artifact_fingerprint
+
+DEFAULT_INPUT = os.path.join(PROJECT_ROOT, "data", "processed", "experiments", "exp1_regress.csv")
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "benchmarks", "baselines", "predictor_hot_path.json")
+DEFAULT_MODEL_PATH = os.path.join(SERVICE_DIR, "models", "best_model.pkl")
+DEFAULT_VECTORIZER_PATH = os.path.join(SERVICE_DIR, "models", "tfidf_vectorizer.pkl")
+DEFAULT_COMPACT_DIR = os.path.join(SERVICE_DIR, "models", "compact")
+
+BATCH_SIZES = (1, 8, 64, 512, 4096)
+# Границы длины processed_text в символах: примерно 10% / 70% / 20% датасета
+LENGTH_BUCKETS = {"short": (0, 100), "medium": (100, 500), "long": (500, None)}
+STAGES = ("transform", "model_predict", "engine_predict", "predict", "batch_predict")
+# predict по одному тексту на больших батчах только повторяет batch 1
+MAX_SINGLE_PREDICT_BATCH = 64
+
+DEFAULT_MIN_TIME_S = 0.2
+DEFAULT_MIN_ROUNDS = 3
+DEFAULT_MAX_ROUNDS = 200
+DEFAULT_TIME_TOLERANCE = 0.2
+DEFAULT_MEMORY_TOLERANCE = 0.2
+EXIT_REGRESSION = 1
+EXIT_NO_BASELINE = 2
+
+
+def load_texts(path: str, column: str) -> Dict[str, List[str]]:
+    texts = pd.read_csv(path, usecols=[column])[column].dropna()
+    lengths = texts.str.len()
+    buckets = {}
+    for name, (low, high) in LENGTH_BUCKETS.items():
+        mask = lengths >= low if high is None else (lengths >= low) & (lengths < high)
+        buckets[name] = texts[mask].tolist()
+    return buckets
+
+
+def make_batch(texts: List[str], size: int) -> List[str]:
+    """Батч нужного размера: тексты по кругу, если их меньше size"""
+    return [texts[i % len(texts)] for i in range(size)]
+
+
+def time_call(fn: Callable[[], Any], min_time_s: float, min_rounds: int, max_rounds: int) -> Dict[str, float]:
+    """Раунды как в pytest-benchmark: не меньше min_rounds и не меньше min_time_s суммарно"""
+    fn()  # прогрев
+    timings = []
+    total = 0.0
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while len(timings) < max_rounds and (len(timings) < min_rounds or total < min_time_s):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            timings.append(elapsed)
+            total += elapsed
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        "rounds": len(timings),
+        "min_ms": min(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "stddev_ms": (statistics.stdev(timings) if len(timings) > 1 else 0.0) * 1000,
+    }
+
+
+def measure_allocations(fn: Callable[[], Any]) -> Dict[str, float]:
+    """Пик памяти Python и число новых блоков за один вызов"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    allocated = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    return {"peak_alloc_kb": peak / 1024, "alloc_blocks": allocated}
+
+
+def build_stages(predictor: ModelPredictor, model, vectorizer, batch: List[str]) -> Dict[str, Callable[[], Any]]:
+    stages = {}
+    features = vectorizer.transform(batch)
+    stages["transform"] = lambda: vectorizer.transform(batch)
+    stages["model_predict"] = lambda: model.predict(features)
+    if predictor.engine is not None:
+        stages["engine_predict"] = lambda: predictor.engine.predict(batch)
+    if len(batch) <= MAX_SINGLE_PREDICT_BATCH:
+        stages["predict"] = lambda: [predictor.predict(text) for text in batch]
+    stages["batch_predict"] = lambda: predictor.batch_predict(batch)
+    return stages
+
+
+def run_suite(args) -> List[Dict[str, Any]]:
+    buckets = load_texts(args.input, args.column)
+    # Без кэша и предобработки: меряем саму модель, а не попадания в кэш
+    predictor = ModelPredictor(args.model, args.vectorizer, cache=None, preprocessor=None,
+                               compact_dir=args.compact_dir)
+    model = joblib.load(args.model)
+    vectorizer = joblib.load(args.vectorizer)
+
+    results = []
+    for length in args.lengths:
+        for batch_size in args.batch_sizes:
+            batch = make_batch(buckets[length], batch_size)
+            for stage, fn in build_stages(predictor, model, vectorizer, batch).items():
+                if stage not in args.stages:
+                    continue
+                row = {"benchmark": f"{stage}/{length}/{batch_size}", "stage": stage,
+                       "length": length, "batch_size": batch_size}
+                row.update(time_call(fn, args.min_time, DEFAULT_MIN_ROUNDS, DEFAULT_MAX_ROUNDS))
+                row.update(measure_allocations(fn))
+                row["per_text_us"] = row["median_ms"] * 1000 / batch_size
+                results.append({k: round(v, 4) if isinstance(v, float) else v for k, v in row.items()})
+                print(f"   {row['benchmark']:<30} median {row['median_ms']:>9.3f} мс "
+                      f"({row['per_text_us']:>8.1f} мкс/текст)  пик {row['peak_alloc_kb']:>9.1f} КБ")
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any],
+            time_tolerance: float, memory_tolerance: float) -> List[str]:
+    """Регрессии по минимальному времени (меньше всего шумит) и пику аллокаций"""
+    base_rows = {row["benchmark"]: row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        base = base_rows.get(row["benchmark"])
+        if base is None:
+            continue
+        if row["min_ms"] > base["min_ms"] * (1 + time_tolerance):
+            regressions.append(f"{row['benchmark']}: min {base['min_ms']:.3f} -> {row['min_ms']:.3f} мс")
+        if row["peak_alloc_kb"] > base["peak_alloc_kb"] * (1 + memory_tolerance):
+            regressions.append(f"{row['benchmark']}: пик {base['peak_alloc_kb']:.1f} -> {row['peak_alloc_kb']:.1f} КБ")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки ModelPredictor")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="CSV с текстами")
+    parser.add_argument("--column", default="processed_text")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--vectorizer", default=DEFAULT_VECTORIZER_PATH)
+    parser.add_argument("--compact-dir", default=DEFAULT_COMPACT_DIR)
+    parser.add_argument("--batch-sizes", default=",".join(map(str, BATCH_SIZES)),
+                        type=lambda v: [int(x) for x in v.split(",")])
+    parser.add_argument("--lengths", default=",".join(LENGTH_BUCKETS), type=lambda v: v.split(","))
+    parser.add_argument("--stages", default=",".join(STAGES), type=lambda v: v.split(","))
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME_S, help="Секунд на бенчмарк")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Сохранить результат как baseline")
+    parser.add_argument("--time-tolerance", type=float, default=DEFAULT_TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    args = parser.parse_args()
+
+    fingerprint = artifact_fingerprint(args.model, args.vectorizer)
+    print(f"📊 Артефакты: {fingerprint}")
+    results = run_suite(args)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "artifact_fingerprint": fingerprint,
+            "python": sys.version.split()[0],
+        },
+        "results": results
+    }
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Baseline сохранен: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # Без baseline сравнивать не с чем: успешный выход скрыл бы любую регрессию
+        print(f"❌ Baseline не найден: {args.baseline} (создайте через --save-baseline)")
+        return EXIT_NO_BASELINE
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["meta"].get("artifact_fingerprint") != fingerprint:
+        print(f"⚠️ Артефакты изменились с baseline ({baseline['meta'].get('artifact_fingerprint')})")
+
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print(f"❌ Регрессии относительно baseline ({baseline['meta'].get('git_commit')}):")
+        for line in regressions:
+            print(f"   {line}")
+        return EXIT_REGRESSION
+    print(f"✅ Регрессий нет (допуск: время {args.time_tolerance:.0%}, память {args.memory_tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
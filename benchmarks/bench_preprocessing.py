@@ -0,0 +1,89 @@
+"""Сравнение скорости предобработки: версия из ноутбука vs text_preprocessing.
+
+Запуск из корня проекта:
+    python benchmarks/bench_preprocessing.py --input data/raw/df_mosmetro_sample.csv --column text
+"""
+
+import argparse
+import os
+import re
+import string
+import sys
+import time
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from text_preprocessing import TextPreprocessor, MODE_LEMMATIZE, MODE_STEM, SUPPORTED_MODES
+
+DEFAULT_INPUT = os.path.join(PROJECT_ROOT, "data", "processed", "experiments", "exp1_regress.csv")
+
+
+def make_notebook_preprocessor(mode):
+    """Дословная копия функций предобработки из course_mlops.ipynb"""
+    from nltk.corpus import stopwords
+    from nltk.tokenize import word_tokenize
+
+    if mode == MODE_LEMMATIZE:
+        import pymorphy3
+        morph = pymorphy3.MorphAnalyzer()
+        normalize = lambda token: morph.parse(token)[0].normal_form
+    else:
+        from nltk.stem.snowball import SnowballStemmer
+        stemmer = SnowballStemmer("russian")
+        normalize = stemmer.stem
+
+    def preprocess_text(text):
+        if not isinstance(text, str) or not text.strip():
+            return ""
+        text = text.lower().strip()
+        text = re.sub(f'[{re.escape(string.punctuation)}]', ' ', text)
+        text = re.sub(r'[^а-яё\s]', ' ', text)
+        text = re.sub(r'\s+', ' ', text).strip()
+        tokens = word_tokenize(text, language='russian')
+        stop_words = set(stopwords.words('russian'))
+        result = []
+        for token in tokens:
+            if token not in stop_words and len(token) > 2:
+                result.append(normalize(token))
+        return " ".join(result)
+
+    return preprocess_text
+
+
+def run(fn, texts):
+    start = time.perf_counter()
+    outputs = [fn(text) for text in texts]
+    return outputs, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк предобработки текста")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="CSV с текстами")
+    parser.add_argument("--column", default="processed_text", help="Колонка с текстом")
+    parser.add_argument("--mode", default=MODE_LEMMATIZE, choices=SUPPORTED_MODES)
+    parser.add_argument("--limit", type=int, default=2000, help="Сколько текстов взять")
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.input, usecols=[args.column])[args.column].fillna("").tolist()[:args.limit]
+    print(f"📊 Текстов: {len(texts)}, режим: {args.mode}")
+
+    notebook_outputs, notebook_time = run(make_notebook_preprocessor(args.mode), texts)
+    fast = TextPreprocessor(mode=args.mode)
+    fast_outputs, fast_time = run(fast.preprocess, texts)
+    # Второй проход показывает эффект мемоизации на повторяющихся словах
+    _, warm_time = run(fast.preprocess, texts)
+
+    mismatches = sum(a != b for a, b in zip(notebook_outputs, fast_outputs))
+    print(f"   Ноутбук:            {len(texts) / notebook_time:10.1f} текстов/с")
+    print(f"   text_preprocessing: {len(texts) / fast_time:10.1f} текстов/с (x{notebook_time / fast_time:.1f})")
+    print(f"   Повторный проход:   {len(texts) / warm_time:10.1f} текстов/с (x{notebook_time / warm_time:.1f})")
+    print(f"   Memo: {fast.get_memo_info()}")
+    print(f"   Расхождений с ноутбуком: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
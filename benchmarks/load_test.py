@@ -0,0 +1,390 @@
+"""Нагрузочное тестирование FastAPI и BentoML сервисов.
+
+Асинхронная нагрузка двух видов:
+    closed - N клиентов шлют запросы подряд, следующий после ответа
+    open   - запросы приходят пуассоновским потоком с заданной частотой
+             независимо от ответов; задержка считается от запланированного
+             момента отправки, поэтому очередь на сервере не прячется
+
+Тексты берутся из короткой/средней/длинной групп (как в test_metro_apis.py)
+в заданной пропорции. Для каждого сценария пишутся p50/p95/p99, пропускная
+способность и доля ошибок в JSON и CSV. С --baseline результат сравнивается
+с прошлым отчетом и код выхода 1 означает регрессию.
+
+Запуск из корня проекта:
+    python benchmarks/load_test.py --start --duration 20
+    python benchmarks/load_test.py --targets fastapi --mode open --rate 100,400
+    python benchmarks/load_test.py --baseline benchmarks/results/load_test_prev.json
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SERVICE_DIR = os.path.join(PROJECT_ROOT, "service")
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+DEFAULT_FASTAPI_URL = "http://localhost:8000"
+DEFAULT_BENTOML_URL = "http://localhost:3000"
+STARTUP_TIMEOUT_S = 120
+REQUEST_TIMEOUT_S = 30
+
+# Тексты из test_metro_apis.py, разбитые по длине
+TEXTS = {
+    "short": [
+        "Метро работает отлично!",
+        "Плохое расписание метро",
+        "Станции чистые и удобные",
+        "Очень тесно в час пик",
+    ],
+    "medium": [
+        "Сегодня утром в метро было необычно пусто, возможно из-за праздника. Составы ходили по расписанию.",
+        "Ремонт на кольцевой линии создает большие неудобства. Приходится делать пересадки.",
+    ],
+    "long": [
+        "Развитие метрополитена в нашем городе идет быстрыми темпами. Строятся новые станции, "
+        "обновляется подвижной состав, внедряются современные системы оплаты проезда. Это делает "
+        "поездки более комфортными и безопасными для пассажиров.",
+        "К сожалению, в последнее время участились случаи задержек поездов на красной линии. Это "
+        "связано с техническими работами и обновлением сигнального оборудования. Администрация метро "
+        "обещает, что ситуация нормализуется к концу месяца, и просит пассажиров учитывать это при "
+        "планировании поездок.",
+    ],
+}
+DEFAULT_MIX = "short=0.5,medium=0.3,long=0.2"
+
+# Допуски для сравнения с базовым отчетом
+DEFAULT_TOLERANCE = 0.15
+ERROR_RATE_TOLERANCE = 0.01
+
+
+class TextSampler:
+    """Случайные тексты в пропорции mix, воспроизводимо по seed"""
+
+    def __init__(self, mix: Dict[str, float], seed: int):
+        self.groups = [group for group in mix if mix[group] > 0]
+        self.weights = [mix[group] for group in self.groups]
+        self.random = random.Random(seed)
+
+    def sample(self, count: int = 1) -> List[str]:
+        groups = self.random.choices(self.groups, weights=self.weights, k=count)
+        return [self.random.choice(TEXTS[group]) for group in groups]
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        group, weight = part.split("=")
+        if group not in TEXTS:
+            raise argparse.ArgumentTypeError(f"Неизвестная группа текстов: {group}. Доступны: {list(TEXTS)}")
+        mix[group] = float(weight)
+    return mix
+
+
+def parse_numbers(value: str) -> List[float]:
+    return [float(item) for item in value.split(",") if item]
+
+
+# Запросы к сервисам: (путь, тело) по списку текстов
+def fastapi_request(texts: List[str]):
+    if len(texts) == 1:
+        return "/predict", {"text": texts[0]}
+    return "/predict/batch", {"texts": texts}
+
+
+def bentoml_request(texts: List[str]):
+    # predict батчевый (адаптивный батчинг), predict_batch - явный батч
+    if len(texts) == 1:
+        return "/predict", {"texts": texts}
+    return "/predict_batch", {"texts": texts}
+
+
+TARGETS = {
+    "fastapi": {"request": fastapi_request, "health": ("GET", "/ready")},
+    "bentoml": {"request": bentoml_request, "health": ("GET", "/readyz")},
+}
+
+
+def start_services(targets: List[str], fastapi_url: str, bentoml_url: str) -> List[subprocess.Popen]:
+    """Запускает выбранные сервисы из service/ так же, как docker-compose"""
+    commands = {
+        "fastapi": [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1",
+                    "--port", str(httpx.URL(fastapi_url).port)],
+        "bentoml": ["bentoml", "serve", "bentoml_service.py:CommentPredictor", "--host", "127.0.0.1",
+                    "--port", str(httpx.URL(bentoml_url).port)],
+    }
+    processes = []
+    for target in targets:
+        print(f"▶️  Запускаю {target}: {' '.join(commands[target])}")
+        processes.append(subprocess.Popen(commands[target], cwd=SERVICE_DIR,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    return processes
+
+
+def stop_services(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def wait_ready(client: httpx.AsyncClient, target: str, base_url: str, timeout_s: float):
+    method, path = TARGETS[target]["health"]
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            response = await client.request(method, base_url + path)
+            if response.status_code == 200:
+                print(f"✅ {target} готов: {base_url}")
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"{target} не ответил на {path} за {timeout_s} с")
+
+
+async def send(client: httpx.AsyncClient, target: str, base_url: str, texts: List[str]) -> bool:
+    path, payload = TARGETS[target]["request"](texts)
+    try:
+        response = await client.post(base_url + path, json=payload)
+        return response.status_code == 200
+    except httpx.HTTPError:
+        return False
+
+
+async def run_closed_loop(client, target, base_url, sampler, batch_size, concurrency, duration_s):
+    """concurrency клиентов шлют запросы подряд в течение duration_s"""
+    latencies, failures = [], 0
+    deadline = time.perf_counter() + duration_s
+
+    async def worker():
+        nonlocal failures
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            ok = await send(client, target, base_url, sampler.sample(batch_size))
+            latencies.append(time.perf_counter() - start)
+            failures += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, failures, 0, time.perf_counter() - started
+
+
+async def run_open_loop(client, target, base_url, sampler, batch_size, rate, duration_s, max_outstanding, seed):
+    """Пуассоновский поток rate запросов/с; сверх max_outstanding запрос отбрасывается"""
+    latencies, failures, dropped = [], 0, 0
+    outstanding = 0
+    arrivals = random.Random(seed)
+    tasks = []
+
+    async def fire(scheduled: float, texts: List[str]):
+        nonlocal failures, outstanding
+        try:
+            ok = await send(client, target, base_url, texts)
+        finally:
+            outstanding -= 1
+        # Задержка от запланированного момента: учитывает отставание генератора
+        latencies.append(time.perf_counter() - scheduled)
+        failures += not ok
+
+    started = time.perf_counter()
+    scheduled = started
+    while scheduled < started + duration_s:
+        scheduled += arrivals.expovariate(rate)
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if outstanding >= max_outstanding:
+            dropped += 1
+            continue
+        outstanding += 1
+        tasks.append(asyncio.create_task(fire(scheduled, sampler.sample(batch_size))))
+    await asyncio.gather(*tasks)
+    return latencies, failures, dropped, time.perf_counter() - started
+
+
+def summarize(latencies: List[float], failures: int, dropped: int, elapsed_s: float,
+              batch_size: int) -> Dict[str, Any]:
+    """Задержки - по всем завершенным запросам, ошибки - неуспешные и отброшенные"""
+    requests_total = len(latencies) + dropped
+    succeeded = len(latencies) - failures
+    stats = {
+        "requests": requests_total,
+        "errors": failures + dropped,
+        "dropped": dropped,
+        "error_rate": round((failures + dropped) / max(requests_total, 1), 4),
+        "throughput_rps": round(succeeded / elapsed_s, 1) if elapsed_s else 0.0,
+        "texts_per_s": round(succeeded * batch_size / elapsed_s, 1) if elapsed_s else 0.0,
+    }
+    if latencies:
+        values = np.array(latencies) * 1000
+        stats.update({
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2),
+            "mean_ms": round(float(values.mean()), 2),
+            "max_ms": round(float(values.max()), 2),
+        })
+    return stats
+
+
+async def run_suite(args) -> List[Dict[str, Any]]:
+    urls = {"fastapi": args.fastapi_url, "bentoml": args.bentoml_url}
+    limits = httpx.Limits(max_connections=args.max_outstanding, max_keepalive_connections=args.max_outstanding)
+    results = []
+
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT_S, limits=limits) as client:
+        for target in args.targets:
+            await wait_ready(client, target, urls[target], STARTUP_TIMEOUT_S if args.start else 5)
+
+        for target in args.targets:
+            for batch_size in args.batch_sizes:
+                scenarios = []
+                if args.mode in ("closed", "both"):
+                    scenarios += [("closed", int(c)) for c in args.concurrency]
+                if args.mode in ("open", "both"):
+                    scenarios += [("open", r) for r in args.rate]
+
+                for mode, load in scenarios:
+                    sampler = TextSampler(args.mix, args.seed)
+                    # Прогрев: соединения и ленивые структуры сервиса
+                    for _ in range(args.warmup):
+                        await send(client, target, urls[target], sampler.sample(batch_size))
+
+                    if mode == "closed":
+                        latencies, failures, dropped, elapsed = await run_closed_loop(
+                            client, target, urls[target], sampler, batch_size, load, args.duration)
+                    else:
+                        latencies, failures, dropped, elapsed = await run_open_loop(
+                            client, target, urls[target], sampler, batch_size, load, args.duration,
+                            args.max_outstanding, args.seed)
+
+                    row = {
+                        "scenario": f"{target}/{mode}/{load:g}/batch{batch_size}",
+                        "target": target,
+                        "mode": mode,
+                        "load": load,
+                        "batch_size": batch_size,
+                        **summarize(latencies, failures, dropped, elapsed, batch_size)
+                    }
+                    results.append(row)
+                    print(f"   {row['scenario']:<32} {row['throughput_rps']:>8} rps  "
+                          f"p50={row.get('p50_ms')} p95={row.get('p95_ms')} p99={row.get('p99_ms')} мс  "
+                          f"ошибок {row['error_rate']:.2%}")
+    return results
+
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """Регрессии относительно прошлого отчета: p95, пропускная способность, ошибки"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {row["scenario"]: row for row in json.load(f)["results"]}
+
+    regressions = []
+    for row in results:
+        base = baseline.get(row["scenario"])
+        if base is None:
+            continue
+        if "p95_ms" in row and "p95_ms" in base and row["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{row['scenario']}: p95 {base['p95_ms']} -> {row['p95_ms']} мс")
+        if row["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{row['scenario']}: rps {base['throughput_rps']} -> {row['throughput_rps']}")
+        if row["error_rate"] > base["error_rate"] + ERROR_RATE_TOLERANCE:
+            regressions.append(f"{row['scenario']}: ошибки {base['error_rate']:.2%} -> {row['error_rate']:.2%}")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_report(results: List[Dict[str, Any]], args, output_dir: str) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_path = os.path.join(output_dir, f"load_test_{stamp}")
+
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "params": {
+            "targets": args.targets, "mode": args.mode, "concurrency": args.concurrency,
+            "rate": args.rate, "duration_s": args.duration, "batch_sizes": args.batch_sizes,
+            "mix": args.mix, "seed": args.seed, "max_outstanding": args.max_outstanding
+        }
+    }
+    with open(base_path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+
+    fields = sorted({key for row in results for key in row}, key=lambda k: (k != "scenario", k))
+    with open(base_path + ".csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
+    return base_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест FastAPI vs BentoML")
+    parser.add_argument("--targets", default="fastapi,bentoml", type=lambda v: v.split(","))
+    parser.add_argument("--start", action="store_true", help="Запустить сервисы локально из service/")
+    parser.add_argument("--fastapi-url", default=DEFAULT_FASTAPI_URL)
+    parser.add_argument("--bentoml-url", default=DEFAULT_BENTOML_URL)
+    parser.add_argument("--mode", default="both", choices=["closed", "open", "both"])
+    parser.add_argument("--concurrency", default="1,8,32", type=parse_numbers, help="Клиентов в closed loop")
+    parser.add_argument("--rate", default="50,200", type=parse_numbers, help="Запросов/с в open loop")
+    parser.add_argument("--duration", type=float, default=15.0, help="Секунд на сценарий")
+    parser.add_argument("--batch-sizes", default="1", type=lambda v: [int(x) for x in v.split(",")],
+                        help="Текстов в запросе: 1 - /predict, больше - batch эндпоинт")
+    parser.add_argument("--mix", default=DEFAULT_MIX, type=parse_mix, help="Доли коротких/средних/длинных текстов")
+    parser.add_argument("--warmup", type=int, default=20, help="Запросов прогрева перед сценарием")
+    parser.add_argument("--max-outstanding", type=int, default=256, help="Лимит одновременных запросов")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--baseline", default=None, help="Прошлый JSON отчет для поиска регрессий")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"Неизвестные сервисы: {sorted(unknown)}")
+
+    processes = start_services(args.targets, args.fastapi_url, args.bentoml_url) if args.start else []
+    try:
+        results = asyncio.run(run_suite(args))
+    finally:
+        stop_services(processes)
+
+    report_path = save_report(results, args, args.output_dir)
+    print(f"📄 Отчет: {report_path}.json, {report_path}.csv")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"❌ Регрессии относительно {args.baseline}:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"✅ Регрессий относительно {args.baseline} нет (допуск {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,32 @@
 # config_loader.py
 
 import os
-import yaml
-from omegaconf import OmegaConf
-from dotenv import load_dotenv
+from functools import cached_property, lru_cache
 
-# Загружаем переменные окружения
-load_dotenv()
+# yaml, OmegaConf и dotenv импортируются при первом чтении конфига,
+# а не при импорте модуля: сервисы стартуют и форкаются быстрее
+
+# Обязательные секции параметров для каждого типа эксперимента
+EXPERIMENT_TYPE_FIELDS = {
+    "ridge": ['tfidf_params', 'ridge_params'],
+    "random_forest": ['tfidf_params', 'rf_params'],
+    "neural_network": ['tfidf_params', 'nn_params'],
+    "hashing": ['hashing_params'],
+    "sgd": ['hashing_params', 'sgd_params'],
+}
 
 class ConfigLoader:
     """Загрузчик конфигураций"""
     
     def __init__(self):
+        from dotenv import load_dotenv
+        
+        # Загружаем переменные окружения
+        load_dotenv()
+        
         # Определяем путь к папке configs относительно этого файла
         current_dir = os.path.dirname(os.path.abspath(__file__))
+        self.project_dir = current_dir
         self.configs_dir = os.path.join(current_dir, "configs")
         
         print(f"Ищу конфиги в: {self.configs_dir}")
@@ -24,12 +37,20 @@ class ConfigLoader:
             for item in os.listdir(current_dir):
                 print(f"  - {item}")
         
-        # Загружаем конфигурации
-        self.train_config = self._load_config("train_config.yaml")
-        self.inference_config = self._load_config("inference_config.yaml")
+    # Каждый YAML читается при первом обращении: сервису инференса не нужен конфиг обучения
+    @cached_property
+    def train_config(self):
+        return self._load_config("train_config.yaml")
+    
+    @cached_property
+    def inference_config(self):
+        return self._load_config("inference_config.yaml")
     
     def _load_config(self, filename):
         """Загружает YAML конфигурацию"""
+        import yaml
+        from omegaconf import OmegaConf
+        
         filepath = os.path.join(self.configs_dir, filename)
         
         if os.path.exists(filepath):
@@ -46,6 +67,8 @@ class ConfigLoader:
     
     def get_experiment_config(self, exp_num):
         """Получает конфиг эксперимента как словарь Python"""
+        from omegaconf import OmegaConf
+        
         key = f"experiment{exp_num}"
         
         # Проверяем существование эксперимента
@@ -61,6 +84,10 @@ class ConfigLoader:
             if field not in exp_config:
                 raise KeyError(f"Отсутствует обязательное поле '{field}' в эксперименте {exp_num}")
         
+        for field in EXPERIMENT_TYPE_FIELDS.get(exp_config['type'], []):
+            if field not in exp_config:
+                raise KeyError(f"Эксперимент {exp_num} типа '{exp_config['type']}' требует поле '{field}'")
+        
         return exp_config
     
     def get_experiment_config_omegaconf(self, exp_num):
@@ -74,18 +101,62 @@ class ConfigLoader:
     
     def get_dataset_info(self, dataset_name):
         """Получает информацию о датасете"""
+        from omegaconf import OmegaConf
+        
         if dataset_name not in self.train_config.datasets:
             raise KeyError(f"Датасет {dataset_name} не найден в конфиге")
         
         return OmegaConf.to_container(self.train_config.datasets[dataset_name], resolve=True)
     
+    def resolve_path(self, path):
+        """Делает путь из конфига абсолютным относительно корня проекта"""
+        if os.path.isabs(path):
+            return path
+        return os.path.join(self.project_dir, path)
+    
+    def get_dataset_path(self, dataset_name):
+        """Получает локальный путь к CSV датасета"""
+        dataset_info = self.get_dataset_info(dataset_name)
+        data_dir = self.train_config.training.get("data_dir", "data/processed/experiments/")
+        return self.resolve_path(os.path.join(data_dir, dataset_info['file_name']))
+    
     def get_inference_config(self):
         """Получает настройки для инференса"""
         return self.inference_config
     
     def get_training_params(self):
         """Получает общие параметры обучения"""
+        from omegaconf import OmegaConf
+        
         return OmegaConf.to_container(self.train_config.training, resolve=True)
+    
+    def get_sweep_config(self):
+        """Секция sweep (сетки и ресурсы перебора); пустой словарь, если ее нет"""
+        from omegaconf import OmegaConf
+        
+        if "sweep" not in self.train_config:
+            return {}
+        return OmegaConf.to_container(self.train_config.sweep, resolve=True)
+    
+    def get_feature_cache(self):
+        """Кэш признаков экспериментов из training.feature_cache; None, если выключен"""
+        from feature_cache import DEFAULT_MAX_SIZE_MB, FeatureCache
+        
+        training = self.get_training_params()
+        cache_config = training.get("feature_cache") or {}
+        if not cache_config.get("enabled", True):
+            return None
+        cache_dir = cache_config.get("dir") or os.path.join(training.get("artifacts_dir", "artifacts/"), "feature_cache")
+        return FeatureCache(self.resolve_path(cache_dir), cache_config.get("max_size_mb", DEFAULT_MAX_SIZE_MB))
+
+@lru_cache(maxsize=1)
+def get_config() -> ConfigLoader:
+    """Глобальный загрузчик конфигов, создается при первом обращении"""
+    return ConfigLoader()
 
-# Создаем глобальный объект
-config = ConfigLoader()
\ No newline at end of file
+def __getattr__(name):
+    # `from config_loader import config` работает как раньше, но конфиг
+    # создается в момент этого импорта, а не при загрузке модуля
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,173 @@
+# dedupe_corpus.py
+
+"""Дедупликация корпуса постов: точные и почти одинаковые тексты.
+
+В ноутбуке удаляются только точные дубликаты (drop_duplicates по text),
+а репосты и шаблонные объявления с парой измененных слов остаются и
+перевешивают обучение. Здесь используется тот же MinHash/LSH индекс, что
+и в сервисе (near_duplicates.py): MinHash-подписи считает пул процессов
+по чанкам CSV, затем строки проходят индекс по порядку, и остается первая
+строка каждой группы (как keep='first'). Тексты короче min_tokens слов
+сравниваются только точно (по нормализованному тексту).
+
+Рядом с результатом пишется отчет: номер удаленной строки, номер
+оставленной строки, на которую она похожа, и оценка Жаккара.
+
+Пример:
+    python dedupe_corpus.py --input data/raw/all_posts_v1.csv --workers 8
+    python dedupe_corpus.py --input data/processed/experiments/exp1_regress.csv --text-column processed_text --threshold 0.8
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config_loader import config
+from near_duplicates import (
+    MinHasher, NearDuplicateIndex, normalize_text,
+    DEFAULT_THRESHOLD, DEFAULT_NUM_PERM, DEFAULT_SHINGLE_SIZE, DEFAULT_MIN_TOKENS, DEFAULT_SEED
+)
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_TEXT_COLUMN = "text"
+REPORT_COLUMNS = ["row", "duplicate_of", "similarity"]
+
+# MinHasher внутри процесса пула
+_worker_hasher = None
+
+
+def _init_worker(num_perm: int, shingle_size: int, seed: int):
+    global _worker_hasher
+    _worker_hasher = MinHasher(num_perm, shingle_size, seed)
+
+
+def _signatures(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Подписи и число токенов текстов; одинаковый seed дает одинаковые подписи во всех воркерах"""
+    signatures = np.empty((len(texts), _worker_hasher.num_perm), dtype=np.uint32)
+    token_counts = np.empty(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        tokens = normalize_text(text)
+        token_counts[i] = len(tokens)
+        signatures[i] = _worker_hasher.signature(tokens)
+    return signatures, token_counts
+
+
+def _split(items: list, parts: int) -> List[list]:
+    """Делит список на parts примерно равных непрерывных кусков"""
+    size = max(1, -(-len(items) // parts))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def dedupe_corpus(input_path: str, output_path: str = None, text_column: str = DEFAULT_TEXT_COLUMN,
+                  threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                  shingle_size: int = DEFAULT_SHINGLE_SIZE, min_tokens: int = DEFAULT_MIN_TOKENS,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = None) -> dict:
+    """Пишет CSV без точных и почти одинаковых дубликатов и отчет об удаленных строках"""
+    root, ext = os.path.splitext(output_path or input_path)
+    output_path = output_path or f"{root}_dedup{ext or '.csv'}"
+    report_path = os.path.splitext(output_path)[0] + "_duplicates.csv"
+    workers = workers or os.cpu_count() or 1
+    # Офлайн индекс без вытеснения и TTL: сравнение со всем корпусом
+    index = NearDuplicateIndex(threshold=threshold, num_perm=num_perm, shingle_size=shingle_size,
+                               min_tokens=min_tokens, max_size=None, ttl_seconds=None, seed=DEFAULT_SEED)
+
+    print(f"🔄 Дедупликация: {input_path} ({text_column})")
+    print(f"   Выход: {output_path}")
+    print(f"   Порог Жаккара: {threshold}, подпись {num_perm} = {index.bands} полос x {index.rows}")
+    print(f"   Воркеров: {workers}, размер чанка: {chunk_size}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    for path in (output_path, report_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    stats = {"rows_read": 0, "rows_written": 0, "exact_duplicates": 0, "near_duplicates": 0}
+    exact_seen = {}
+    start_time = time.perf_counter()
+    reader = pd.read_csv(input_path, chunksize=chunk_size)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(num_perm, shingle_size, DEFAULT_SEED)) as pool, \
+            open(report_path, "w", encoding="utf-8", newline="") as report_file:
+        report = csv.writer(report_file)
+        report.writerow(REPORT_COLUMNS)
+
+        for chunk_index, chunk in enumerate(reader):
+            offset = stats["rows_read"]
+            texts = chunk[text_column].fillna("").astype(str).tolist()
+            parts = list(pool.map(_signatures, _split(texts, workers)))
+            signatures = np.concatenate([part[0] for part in parts])
+            token_counts = np.concatenate([part[1] for part in parts])
+
+            keep = np.ones(len(texts), dtype=bool)
+            for i, text in enumerate(texts):
+                row = offset + i
+                # Точные дубликаты (после нормализации регистра и пробелов) - для любых длин
+                digest = hashlib.md5(" ".join(normalize_text(text)).encode("utf-8")).digest()
+                first = exact_seen.get(digest)
+                if first is not None:
+                    keep[i] = False
+                    stats["exact_duplicates"] += 1
+                    report.writerow([row, first, 1.0])
+                    continue
+                exact_seen[digest] = row
+
+                if token_counts[i] < min_tokens:
+                    continue
+                match = index.query(signatures[i])
+                if match is not None:
+                    keep[i] = False
+                    stats["near_duplicates"] += 1
+                    report.writerow([row, match[0], round(match[1], 4)])
+                    continue
+                index.add(signatures[i], row)
+
+            result = chunk[keep]
+            result.to_csv(output_path, mode="a", index=False, encoding="utf-8",
+                          header=chunk_index == 0)
+            stats["rows_read"] += len(chunk)
+            stats["rows_written"] += len(result)
+
+            elapsed = time.perf_counter() - start_time
+            print(f"   Чанк {chunk_index}: {stats['rows_read']} строк, удалено "
+                  f"{stats['exact_duplicates']} точных и {stats['near_duplicates']} почти одинаковых, "
+                  f"{stats['rows_read'] / elapsed:.1f} строк/с")
+
+    stats["elapsed_s"] = round(time.perf_counter() - start_time, 2)
+    stats["output"] = output_path
+    stats["report"] = report_path
+    print(f"✅ Готово: {stats['rows_written']} из {stats['rows_read']} строк за {stats['elapsed_s']} с")
+    print(f"   Отчет: {report_path}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Удаление точных и почти одинаковых текстов из корпуса")
+    parser.add_argument("--input", default=None, help="CSV корпуса (по умолчанию training.raw_data_path)")
+    parser.add_argument("--output", default=None, help="Выходной CSV (по умолчанию <input>_dedup.csv)")
+    parser.add_argument("--text-column", default=DEFAULT_TEXT_COLUMN)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Минимальная оценка Жаккара")
+    parser.add_argument("--num-perm", type=int, default=DEFAULT_NUM_PERM)
+    parser.add_argument("--shingle-size", type=int, default=DEFAULT_SHINGLE_SIZE)
+    parser.add_argument("--min-tokens", type=int, default=DEFAULT_MIN_TOKENS)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="Процессов (по умолчанию все ядра)")
+    args = parser.parse_args()
+
+    input_path = args.input or config.resolve_path(config.train_config.training.raw_data_path)
+    dedupe_corpus(
+        input_path, output_path=args.output, text_column=args.text_column,
+        threshold=args.threshold, num_perm=args.num_perm, shingle_size=args.shingle_size,
+        min_tokens=args.min_tokens, chunk_size=args.chunk_size, workers=args.workers
+    )
+
+
+if __name__ == "__main__":
+    main()
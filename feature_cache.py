@@ -0,0 +1,223 @@
+# feature_cache.py
+
+"""Дисковый кэш обученных векторайзеров и матриц признаков экспериментов.
+
+Эксперименты с одним датасетом и одними tfidf_params (а для SVD - еще и
+одними настройками svd) получают одинаковые признаки, поэтому TfidfVectorizer
+и TruncatedSVD достаточно обучить один раз. Запись кэша адресуется хэшем
+описания того, как она получена (id и содержимое датасета, сплит, параметры,
+версия sklearn): при изменении любого из них ключ меняется сам, и
+устаревшая запись просто перестает использоваться.
+
+Запись - каталог с файлами по одному на объект: разреженные матрицы в .npz,
+плотные массивы в .npy (читаются через mmap), остальное через joblib.
+Записи пишутся во временный каталог и публикуются через os.replace, поэтому
+прерванный запуск не оставляет полузаписанных данных. Когда суммарный размер
+превышает max_size_mb, удаляются давно не использованные записи.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Optional
+
+import joblib
+import numpy as np
+from scipy import sparse
+
+DEFAULT_MAX_SIZE_MB = 2048
+# Меняется при несовместимом изменении формата записи
+CACHE_FORMAT_VERSION = 1
+META_FILE = "meta.json"
+TMP_PREFIX = ".tmp-"
+
+KIND_SPARSE = "sparse"
+KIND_ARRAY = "array"
+KIND_JOBLIB = "joblib"
+KIND_EXTENSIONS = {KIND_SPARSE: ".npz", KIND_ARRAY: ".npy", KIND_JOBLIB: ".joblib"}
+
+
+def cache_key(spec: Dict[str, Any]) -> str:
+    """Ключ записи - хэш канонического JSON описания"""
+    payload = json.dumps({"format": CACHE_FORMAT_VERSION, **spec}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+# Хэш содержимого файла по (путь, размер, mtime): один и тот же датасет в процессе читается один раз
+_file_hashes: Dict[tuple, str] = {}
+
+
+def file_digest(path: str) -> str:
+    """sha256 содержимого файла: переименованный или скопированный датасет попадает в кэш"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _file_hashes.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+        digest = _file_hashes[memo_key] = h.hexdigest()
+    return digest
+
+
+def _kind(obj) -> str:
+    if sparse.issparse(obj):
+        return KIND_SPARSE
+    if isinstance(obj, np.ndarray):
+        return KIND_ARRAY
+    return KIND_JOBLIB
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for name in os.listdir(path):
+        file_path = os.path.join(path, name)
+        if os.path.isfile(file_path):
+            total += os.path.getsize(file_path)
+    return total
+
+
+class CacheEntry:
+    """Запись кэша; объекты читаются с диска по требованию"""
+
+    def __init__(self, key: str, path: str, meta: Dict[str, Any]):
+        self.key = key
+        self.path = path
+        self.meta = meta
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.meta["items"]
+
+    def load(self, name: str):
+        kind = self.meta["items"][name]
+        path = os.path.join(self.path, name + KIND_EXTENSIONS[kind])
+        if kind == KIND_SPARSE:
+            return sparse.load_npz(path)
+        if kind == KIND_ARRAY:
+            # Только для чтения: модели обучаются на матрице, не изменяя ее
+            return np.load(path, mmap_mode="r")
+        return joblib.load(path)
+
+    @property
+    def size_bytes(self) -> int:
+        return self.meta.get("size_bytes", 0)
+
+
+class FeatureCache:
+    """Content-addressed кэш признаков с вытеснением по размеру (LRU)"""
+
+    def __init__(self, cache_dir: str, max_size_mb: float = DEFAULT_MAX_SIZE_MB):
+        self.cache_dir = cache_dir
+        self.max_size_mb = float(max_size_mb)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _read_meta(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Запись по ключу или None; попадание обновляет время использования"""
+        path = self._entry_path(key)
+        meta = self._read_meta(path)
+        if meta is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Время использования - mtime meta.json, чтобы не переписывать файл при каждом чтении
+        os.utime(os.path.join(path, META_FILE))
+        return CacheEntry(key, path, meta)
+
+    def put(self, key: str, items: Dict[str, Any], spec: Optional[Dict[str, Any]] = None) -> CacheEntry:
+        """Сохраняет объекты под ключом и вытесняет старые записи при превышении лимита"""
+        tmp_path = os.path.join(self.cache_dir, f"{TMP_PREFIX}{key}-{os.getpid()}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        try:
+            kinds = {}
+            for name, obj in items.items():
+                kind = kinds[name] = _kind(obj)
+                file_path = os.path.join(tmp_path, name + KIND_EXTENSIONS[kind])
+                if kind == KIND_SPARSE:
+                    # Без сжатия: запись и чтение в разы быстрее, место ограничено лимитом кэша
+                    sparse.save_npz(file_path, obj, compressed=False)
+                elif kind == KIND_ARRAY:
+                    np.save(file_path, obj)
+                else:
+                    joblib.dump(obj, file_path)
+            meta = {"key": key, "spec": spec or {}, "items": kinds,
+                    "created": time.time(), "size_bytes": _dir_size(tmp_path)}
+            with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2, default=str)
+
+            path = self._entry_path(key)
+            try:
+                os.replace(tmp_path, path)
+            except OSError:
+                # Параллельный запуск уже записал ту же запись - содержимое одинаковое
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        print(f"💾 Кэш признаков: записано {meta['size_bytes'] / 1024 / 1024:.1f} МБ ({key})")
+        self.evict(keep=key)
+        return CacheEntry(key, path, self._read_meta(path) or meta)
+
+    def _entries(self):
+        """[(время использования, размер, ключ)] опубликованных записей"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = self._entry_path(name)
+            if name.startswith(TMP_PREFIX) or not os.path.isdir(path):
+                continue
+            meta_path = os.path.join(path, META_FILE)
+            if not os.path.exists(meta_path):
+                continue
+            entries.append((os.path.getmtime(meta_path), _dir_size(path), name))
+        return entries
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Удаляет давно не использованные записи, пока кэш не уложится в лимит"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        limit = self.max_size_mb * 1024 * 1024
+        removed = 0
+        for _, size, key in entries:
+            if total <= limit:
+                break
+            if key == keep:
+                # Только что записанная запись остается, даже если одна больше лимита
+                continue
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            total -= size
+            removed += 1
+            print(f"🗑️ Кэш признаков: удалена запись {key} ({size / 1024 / 1024:.1f} МБ)")
+        self.evictions += removed
+        return removed
+
+    def clear(self):
+        for _, _, key in self._entries():
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "size_mb": round(sum(size for _, size, _ in entries) / 1024 / 1024, 1),
+            "max_size_mb": self.max_size_mb,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
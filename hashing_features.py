@@ -0,0 +1,142 @@
+# hashing_features.py
+
+"""Признаки на основе feature hashing для экспериментов и сервиса.
+
+В отличие от TfidfVectorizer, HashingVectorizer не хранит словарь: память
+фиксирована n_features, а для сервиса достаточно параметров хэширования и
+(опционально) вектора IDF. IDF накапливается потоково через partial_fit,
+поэтому признаки можно строить по чанкам CSV без загрузки датасета целиком.
+"""
+
+import json
+from typing import Any, Dict, Iterator, Optional, Sequence, TYPE_CHECKING
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_N_FEATURES = 2 ** 18
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class HashingTfidfFeaturizer:
+    """HashingVectorizer + потоковый IDF с тем же API, что у TfidfVectorizer"""
+
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES, ngram_range=(1, 1),
+                 alternate_sign: bool = False, use_idf: bool = True,
+                 smooth_idf: bool = True, sublinear_tf: bool = False, norm: Optional[str] = "l2"):
+        self.n_features = int(n_features)
+        self.ngram_range = tuple(ngram_range)
+        self.alternate_sign = bool(alternate_sign)
+        self.use_idf = bool(use_idf)
+        self.smooth_idf = bool(smooth_idf)
+        self.sublinear_tf = bool(sublinear_tf)
+        self.norm = norm
+
+        # Нормировку делаем сами после IDF, поэтому хэшер отдает сырые счетчики
+        self.hasher = HashingVectorizer(
+            n_features=self.n_features,
+            ngram_range=self.ngram_range,
+            alternate_sign=self.alternate_sign,
+            norm=None
+        )
+        self.document_frequency = np.zeros(self.n_features, dtype=np.int64)
+        self.n_documents = 0
+        self.idf_ = None
+
+    @classmethod
+    def from_config(cls, exp_config: Dict[str, Any]) -> "HashingTfidfFeaturizer":
+        """Строит признаки из hashing_params и idf секций эксперимента"""
+        hashing_params = dict(exp_config["hashing_params"])
+        idf_params = dict(exp_config.get("idf", {}))
+        return cls(
+            n_features=hashing_params.get("n_features", DEFAULT_N_FEATURES),
+            ngram_range=hashing_params.get("ngram_range", (1, 1)),
+            alternate_sign=hashing_params.get("alternate_sign", False),
+            use_idf=idf_params.get("enabled", True),
+            smooth_idf=idf_params.get("smooth_idf", True),
+            sublinear_tf=idf_params.get("sublinear_tf", False),
+            norm=hashing_params.get("norm", "l2")
+        )
+
+    def partial_fit(self, texts: Sequence[str]) -> "HashingTfidfFeaturizer":
+        """Добавляет чанк в статистику документных частот"""
+        if self.use_idf:
+            counts = self.hasher.transform(texts)
+            counts.eliminate_zeros()
+            self.document_frequency += np.bincount(counts.indices, minlength=self.n_features)
+            self.n_documents += counts.shape[0]
+            self._update_idf()
+        return self
+
+    def fit(self, texts: Sequence[str]) -> "HashingTfidfFeaturizer":
+        self.document_frequency[:] = 0
+        self.n_documents = 0
+        return self.partial_fit(texts)
+
+    def _update_idf(self):
+        # Та же формула, что в sklearn TfidfTransformer
+        smooth = int(self.smooth_idf)
+        self.idf_ = np.log((self.n_documents + smooth) / (self.document_frequency + smooth)) + 1
+
+    def transform(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        features = self.hasher.transform(texts).astype(np.float64)
+        if self.sublinear_tf:
+            np.log(features.data, features.data)
+            features.data += 1
+        if self.use_idf:
+            if self.idf_ is None:
+                raise ValueError("IDF не обучен: вызовите fit или partial_fit")
+            features = features @ sparse.diags(self.idf_)
+        if self.norm is not None:
+            features = normalize(features, norm=self.norm, copy=False)
+        return features.tocsr()
+
+    def fit_transform(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        return self.fit(texts).transform(texts)
+
+    def get_params(self) -> Dict[str, Any]:
+        return {
+            "n_features": self.n_features,
+            "ngram_range": list(self.ngram_range),
+            "alternate_sign": self.alternate_sign,
+            "use_idf": self.use_idf,
+            "smooth_idf": self.smooth_idf,
+            "sublinear_tf": self.sublinear_tf,
+            "norm": self.norm
+        }
+
+    def save(self, path: str):
+        """Сохраняет параметры и IDF в .npz - словаря нет, файл фиксированного размера"""
+        np.savez_compressed(
+            path,
+            params=np.array(json.dumps(self.get_params())),
+            document_frequency=self.document_frequency,
+            n_documents=np.array(self.n_documents)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "HashingTfidfFeaturizer":
+        with np.load(path) as data:
+            featurizer = cls(**json.loads(str(data["params"])))
+            featurizer.document_frequency = data["document_frequency"].astype(np.int64)
+            featurizer.n_documents = int(data["n_documents"])
+        if featurizer.use_idf and featurizer.n_documents:
+            featurizer._update_idf()
+        return featurizer
+
+
+def iter_csv_chunks(path: str, text_column: str, target_column: str = "comments_count",
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator["pd.DataFrame"]:
+    """Читает датасет эксперимента чанками, пропуская пустые тексты"""
+    # pandas нужен только обучению, сервис загружает этот модуль без него
+    import pandas as pd
+
+    for chunk in pd.read_csv(path, usecols=[text_column, target_column], chunksize=chunk_size):
+        chunk = chunk.dropna(subset=[text_column, target_column])
+        if len(chunk):
+            yield chunk
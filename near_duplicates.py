@@ -0,0 +1,270 @@
+# near_duplicates.py
+
+"""Поиск почти одинаковых текстов через MinHash и LSH.
+
+Репосты и шаблонные объявления в ленте метро отличаются парой слов, поэтому
+точный кэш по тексту их не ловит. Текст раскладывается на словесные
+шинглы (n-граммы слов нормализованного текста), MinHash-подпись из
+num_perm минимумов хэшей приближает коэффициент Жаккара между множествами
+шинглов, а LSH (подпись режется на bands полос по rows значений) находит
+кандидатов без сравнения со всеми текстами индекса. Кандидат принимается,
+только если оценка Жаккара по полным подписям не ниже threshold.
+
+Один и тот же индекс используется в сервисе (недавно посчитанные тексты,
+ограничение размера и TTL) и офлайн для дедупликации корпусов
+(dedupe_corpus.py, без ограничений).
+"""
+
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 3
+# Короче этого тексты в индекс не попадают: у пары слов Жаккар ничего не говорит о смысле
+DEFAULT_MIN_TOKENS = 8
+DEFAULT_INDEX_MAX_SIZE = 10000
+DEFAULT_INDEX_TTL_SECONDS = 3600
+DEFAULT_SEED = 1
+
+# Простое число меньше 2^32: a * x + b помещается в uint64 без переполнения
+_PRIME = np.uint64(4294967291)
+
+
+def normalize_text(text: str) -> List[str]:
+    """Токены для шинглов: регистр и пробелы не важны, как у ключа кэша предсказаний"""
+    return text.lower().split()
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) с минимумом средних вероятностей ложного кандидата и пропуска.
+
+    Вероятность стать кандидатом при Жаккаре s равна 1 - (1 - s^rows)^bands;
+    перебираются разбиения num_perm = bands * rows. Средние берутся по своим
+    диапазонам s, иначе широкий [0, threshold) перевешивает и страдает
+    полнота. Ложные кандидаты все равно отсекаются сравнением подписей.
+    """
+    similarities = np.linspace(0.0, 1.0, 201)
+    below = similarities < threshold
+    best, best_error = (num_perm, 1), float("inf")
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        candidate = 1.0 - (1.0 - similarities ** rows) ** bands
+        error = candidate[below].mean() + (1.0 - candidate[~below]).mean()
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    """MinHash-подписи словесных шинглов; одинаковы во всех процессах при одном seed"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, shingle_size: int = DEFAULT_SHINGLE_SIZE,
+                 seed: int = DEFAULT_SEED):
+        self.num_perm = int(num_perm)
+        self.shingle_size = max(1, int(shingle_size))
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        # Перестановки h(x) = (a * x + b) mod p, a != 0
+        self._a = rng.integers(1, int(_PRIME), size=(self.num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=(self.num_perm, 1), dtype=np.uint64)
+
+    def shingles(self, tokens: Sequence[str]) -> np.ndarray:
+        """uint64 хэши n-грамм слов; crc32 стабилен между процессами, в отличие от hash()"""
+        k = min(self.shingle_size, len(tokens))
+        return np.fromiter(
+            (zlib.crc32(" ".join(tokens[i:i + k]).encode("utf-8")) for i in range(len(tokens) - k + 1)),
+            dtype=np.uint64
+        )
+
+    def signature(self, tokens: Sequence[str]) -> np.ndarray:
+        hashes = np.unique(self.shingles(tokens))
+        if not len(hashes):
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """Подписи пачки текстов, (len(texts), num_perm)"""
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for i, text in enumerate(texts):
+            result[i] = self.signature(normalize_text(text))
+        return result
+
+
+class NearDuplicateIndex:
+    """Потокобезопасный LSH-индекс MinHash-подписей со значениями.
+
+    В сервисе значение - результат модели, и индекс ограничен max_size
+    (вытесняются старые записи) и ttl_seconds. Офлайн оба ограничения
+    отключаются (None), значение - номер строки корпуса. namespace
+    разделяет записи разных моделей в общем индексе, как отпечаток
+    в ключе кэша предсказаний.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                 shingle_size: int = DEFAULT_SHINGLE_SIZE, min_tokens: int = DEFAULT_MIN_TOKENS,
+                 max_size: Optional[int] = DEFAULT_INDEX_MAX_SIZE,
+                 ttl_seconds: Optional[float] = DEFAULT_INDEX_TTL_SECONDS,
+                 bands: Optional[int] = None, seed: int = DEFAULT_SEED):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = float(threshold)
+        self.min_tokens = int(min_tokens)
+        self.max_size = int(max_size) if max_size else None
+        self.ttl_seconds = float(ttl_seconds) if ttl_seconds else None
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        if bands is None:
+            self.bands, self.rows = lsh_params(self.threshold, self.hasher.num_perm)
+        else:
+            if self.hasher.num_perm % bands:
+                raise ValueError(f"num_perm={num_perm} is not divisible by bands={bands}")
+            self.bands, self.rows = int(bands), self.hasher.num_perm // int(bands)
+
+        # Полоса -> {хэш полосы: id записей}; запись: (namespace, подпись, хэши полос, expires_at, значение)
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.inserts = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.lookup_seconds = 0.0
+        # Сколько времени модели сэкономили попадания (по времени исходного предсказания)
+        self.saved_ms = 0.0
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Подпись текста или None, если он слишком короткий для сравнения"""
+        tokens = normalize_text(text)
+        if len(tokens) < self.min_tokens:
+            return None
+        return self.hasher.signature(tokens)
+
+    def _band_hashes(self, namespace: str, signature: np.ndarray) -> List[int]:
+        bands = signature.reshape(self.bands, self.rows)
+        return [hash((namespace, band.tobytes())) for band in bands]
+
+    def query(self, signature: Optional[np.ndarray], namespace: str = "") -> Optional[Tuple[Any, float]]:
+        """(значение, оценка Жаккара) самого похожего текста не ниже threshold или None"""
+        start = time.perf_counter()
+        try:
+            if signature is None:
+                with self._lock:
+                    self.skipped += 1
+                return None
+            band_hashes = self._band_hashes(namespace, signature)
+            now = time.monotonic()
+            with self._lock:
+                candidates = set()
+                for table, band_hash in zip(self._tables, band_hashes):
+                    candidates.update(table.get(band_hash, ()))
+
+                best, best_similarity, expired = None, self.threshold, []
+                for entry_id in candidates:
+                    entry_namespace, entry_signature, _, expires_at, value = self._entries[entry_id]
+                    if expires_at is not None and expires_at <= now:
+                        expired.append(entry_id)
+                        continue
+                    if entry_namespace != namespace:
+                        continue
+                    similarity = float(np.count_nonzero(entry_signature == signature)) / len(signature)
+                    if similarity >= best_similarity:
+                        best, best_similarity = (entry_id, value), similarity
+                for entry_id in expired:
+                    self._remove(entry_id)
+                    self.expirations += 1
+
+                if best is None:
+                    self.misses += 1
+                    return None
+                self._entries.move_to_end(best[0])
+                self.hits += 1
+                return best[1], best_similarity
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.lookup_seconds += elapsed
+
+    def add(self, signature: Optional[np.ndarray], value: Any, namespace: str = "") -> Optional[int]:
+        """Добавляет подпись; возвращает id записи (None для коротких текстов)"""
+        if signature is None:
+            return None
+        band_hashes = self._band_hashes(namespace, signature)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (namespace, signature, band_hashes, expires_at, value)
+            for table, band_hash in zip(self._tables, band_hashes):
+                table.setdefault(band_hash, []).append(entry_id)
+            self.inserts += 1
+            while self.max_size is not None and len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry_id
+
+    def _remove(self, entry_id: int):
+        """Удаляет запись из всех полос; вызывается под self._lock"""
+        _, _, band_hashes, _, _ = self._entries.pop(entry_id)
+        for table, band_hash in zip(self._tables, band_hashes):
+            ids = table.get(band_hash)
+            if ids is None:
+                continue
+            ids.remove(entry_id)
+            if not ids:
+                del table[band_hash]
+
+    def record_saving(self, saved_ms: float):
+        """Учитывает время модели, которое не пришлось тратить на попадание"""
+        with self._lock:
+            self.saved_ms += max(0.0, saved_ms)
+
+    def clear(self, namespace: Optional[str] = None):
+        """Сбрасывает записи namespace (например, после перезагрузки модели); None - все"""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                for table in self._tables:
+                    table.clear()
+            else:
+                for entry_id in [entry_id for entry_id, entry in self._entries.items() if entry[0] == namespace]:
+                    self._remove(entry_id)
+            self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "threshold": self.threshold,
+                "num_perm": self.hasher.num_perm,
+                "bands": self.bands,
+                "rows": self.rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "skipped_short": self.skipped,
+                "inserts": self.inserts,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "avg_lookup_ms": round(self.lookup_seconds * 1000 / (lookups + self.skipped), 4)
+                if lookups + self.skipped else 0.0,
+                "saved_ms": round(self.saved_ms, 2)
+            }
@@ -0,0 +1,194 @@
+# preprocess_corpus.py
+
+"""Параллельная предобработка корпуса для датасетов экспериментов.
+
+Сырой CSV читается чанками, лемматизация/стемминг раздаются пулу процессов
+(у каждого воркера свой MorphAnalyzer/SnowballStemmer), результат дописывается
+во временный <output>.partial после каждого чанка. Прогресс сохраняется рядом
+с выходным файлом, поэтому прерванный запуск продолжается с --resume; готовый
+файл публикуется через os.replace только в конце.
+
+По умолчанию результат пишется в <датасет>_preprocessed.csv рядом с датасетом
+из конфига, а не поверх него: датасеты экспериментов лежат в репозитории.
+Заменить существующий файл можно только явно, с --overwrite.
+
+Пример:
+    python preprocess_corpus.py basic_lemmas --workers 8
+    python preprocess_corpus.py basic_stemming --input data/raw/all_posts_v1.csv --resume
+    python preprocess_corpus.py basic_lemmas --output data/processed/experiments/exp1_regress.csv --overwrite
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import pandas as pd
+
+from config_loader import config
+from text_preprocessing import TextPreprocessor, DEFAULT_MEMO_SIZE
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_TEXT_COLUMN = "text"
+DEFAULT_TARGET_COLUMN = "comments_count"
+# Как в ноутбуке: слишком короткие тексты после предобработки отбрасываются
+MIN_PROCESSED_LENGTH = 20
+OUTPUT_SUFFIX = "_preprocessed"
+PARTIAL_SUFFIX = ".partial"
+
+# Предобработчик внутри процесса пула
+_worker_preprocessor = None
+
+
+def _init_worker(mode: str, memo_size: int):
+    global _worker_preprocessor
+    _worker_preprocessor = TextPreprocessor(mode=mode, memo_size=memo_size)
+
+
+def _preprocess_batch(texts: List[str]) -> List[str]:
+    return _worker_preprocessor.preprocess_batch(texts)
+
+
+def _split(items: list, parts: int) -> List[list]:
+    """Делит список на parts примерно равных непрерывных кусков"""
+    size = max(1, -(-len(items) // parts))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _load_progress(progress_path: str) -> dict:
+    with open(progress_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_progress(progress_path: str, progress: dict):
+    # Пишем через временный файл, чтобы прерывание не оставило битый JSON
+    tmp_path = progress_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(progress, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, progress_path)
+
+
+def default_output_path(dataset_name: str) -> str:
+    """<датасет>_preprocessed.csv рядом с датасетом из конфига"""
+    root, ext = os.path.splitext(config.get_dataset_path(dataset_name))
+    return f"{root}{OUTPUT_SUFFIX}{ext or '.csv'}"
+
+
+def preprocess_corpus(dataset_name: str, input_path: str, output_path: str = None,
+                      text_column: str = DEFAULT_TEXT_COLUMN,
+                      target_column: str = DEFAULT_TARGET_COLUMN,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = None,
+                      memo_size: int = DEFAULT_MEMO_SIZE, resume: bool = False,
+                      overwrite: bool = False) -> dict:
+    """Строит CSV датасета dataset_name из сырого CSV input_path"""
+    dataset_info = config.get_dataset_info(dataset_name)
+    mode = dataset_info.get("preprocessing", "lemmatize")
+    output_column = dataset_info.get("text_column", "processed_text")
+    output_path = output_path or default_output_path(dataset_name)
+    if os.path.exists(output_path) and not overwrite:
+        raise FileExistsError(f"{output_path} уже существует; чтобы заменить его, укажите --overwrite")
+    partial_path = output_path + PARTIAL_SUFFIX
+    progress_path = output_path + ".progress.json"
+    workers = workers or os.cpu_count() or 1
+
+    # chunks_done считается в чанках этого размера и по этим колонкам: при других
+    # значениях продолжение пропустило бы или повторило часть строк
+    run_params = {"chunk_size": chunk_size, "text_column": text_column, "target_column": target_column}
+    progress = {"dataset": dataset_name, "input": os.path.abspath(input_path), **run_params,
+                "chunks_done": 0, "rows_read": 0, "rows_written": 0, "output_bytes": 0}
+    if resume and os.path.exists(progress_path) and os.path.exists(partial_path):
+        saved = _load_progress(progress_path)
+        if (saved.get("dataset"), saved.get("input")) != (dataset_name, progress["input"]):
+            raise ValueError(f"Прогресс относится к другому запуску: {saved.get('dataset')}, {saved.get('input')}")
+        mismatched = {name: saved.get(name) for name, value in run_params.items() if saved.get(name) != value}
+        if mismatched:
+            raise ValueError(f"Прогресс записан с другими параметрами {mismatched}; "
+                             f"продолжите с ними или запустите без --resume")
+        progress = saved
+        # Отрезаем строки чанка, который успел записаться, но не попал в прогресс
+        with open(partial_path, "r+b") as f:
+            f.truncate(progress["output_bytes"])
+        print(f"▶️  Продолжаем с чанка {progress['chunks_done']} ({progress['rows_read']} строк уже обработано)")
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        # Существующий output_path не трогаем до конца: прерванный запуск его не теряет
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    print(f"🔄 Датасет: {dataset_name} ({mode} -> {output_column})")
+    print(f"   Вход: {input_path}")
+    print(f"   Выход: {output_path}")
+    print(f"   Воркеров: {workers}, размер чанка: {chunk_size}")
+
+    start_time = time.perf_counter()
+    rows_this_run = 0
+    reader = pd.read_csv(input_path, usecols=[text_column, target_column], chunksize=chunk_size)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(mode, memo_size)) as pool:
+        for chunk_index, chunk in enumerate(reader):
+            if chunk_index < progress["chunks_done"]:
+                continue
+
+            texts = chunk[text_column].tolist()
+            processed = []
+            for part in pool.map(_preprocess_batch, _split(texts, workers)):
+                processed.extend(part)
+
+            result = pd.DataFrame({output_column: processed,
+                                   target_column: chunk[target_column].values})
+            result = result[result[output_column].str.len() > MIN_PROCESSED_LENGTH]
+
+            result.to_csv(partial_path, mode="a", index=False, encoding="utf-8",
+                          header=progress["output_bytes"] == 0)
+
+            progress["chunks_done"] = chunk_index + 1
+            progress["rows_read"] += len(chunk)
+            progress["rows_written"] += len(result)
+            progress["output_bytes"] = os.path.getsize(partial_path)
+            _save_progress(progress_path, progress)
+
+            rows_this_run += len(chunk)
+            elapsed = time.perf_counter() - start_time
+            print(f"   Чанк {chunk_index}: {progress['rows_read']} строк, "
+                  f"{rows_this_run / elapsed:.1f} строк/с")
+
+    if not os.path.exists(partial_path):
+        # Пустой вход: заголовок не был записан
+        pd.DataFrame(columns=[output_column, target_column]).to_csv(partial_path, index=False, encoding="utf-8")
+    os.replace(partial_path, output_path)
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    elapsed = time.perf_counter() - start_time
+    print(f"✅ Готово: {progress['rows_written']} из {progress['rows_read']} строк записано за {elapsed:.1f} с")
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Параллельная предобработка корпуса для экспериментов")
+    parser.add_argument("dataset", help="Имя датасета из секции datasets в train_config.yaml")
+    parser.add_argument("--input", default=None, help="Сырой CSV (по умолчанию training.raw_data_path)")
+    parser.add_argument("--output", default=None,
+                        help="Выходной CSV (по умолчанию <датасет из конфига>_preprocessed.csv)")
+    parser.add_argument("--text-column", default=DEFAULT_TEXT_COLUMN)
+    parser.add_argument("--target-column", default=DEFAULT_TARGET_COLUMN)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="Процессов (по умолчанию все ядра)")
+    parser.add_argument("--memo-size", type=int, default=DEFAULT_MEMO_SIZE)
+    parser.add_argument("--resume", action="store_true", help="Продолжить прерванный запуск")
+    parser.add_argument("--overwrite", action="store_true", help="Заменить существующий выходной файл")
+    args = parser.parse_args()
+
+    input_path = args.input or config.resolve_path(config.train_config.training.raw_data_path)
+    preprocess_corpus(
+        args.dataset, input_path, output_path=args.output,
+        text_column=args.text_column, target_column=args.target_column,
+        chunk_size=args.chunk_size, workers=args.workers,
+        memo_size=args.memo_size, resume=args.resume, overwrite=args.overwrite
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,19 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import time
+
+# Время импорта модуля (FastAPI, pydantic и легкие модули сервиса) - в /ready и /metrics
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, HTTPException, Request, Depends, Header
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional, List
+import asyncio
 import uvicorn
+import json
 import os
+import secrets
 import sys
 
 # Добавляем путь к конфигам
@@ -10,66 +21,50 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 configs_dir = os.path.join(current_dir, "..", "configs")
 sys.path.insert(0, configs_dir)
 
-# Пытаемся загрузить конфигурацию
-try:
-    from config_loader import config
-    HAS_CONFIG = True
-except ImportError:
-    HAS_CONFIG = False
-    print("⚠️ config_loader не найден, используем значения по умолчанию")
-
-# Инициализируем предиктор
-from predictor import ModelPredictor
-
-# Создаем FastAPI приложение
-app = FastAPI(
-    title="NLP MLOps API",
-    description="API для предсказания количества комментариев по тексту поста",
-    version="1.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc"
+# Конфиг, модель и предобработка загружаются при старте приложения (app_state.py),
+# а не при импорте: воркеры форкаются быстро, /live отвечает сразу
+from app_state import InferenceService, STATUS_READY, STATUS_FAILED
+from executors import QueueFullError
+from metrics import REGISTRY, BATCH_SIZE, PROMETHEUS_CONTENT_TYPE, observe_stage
+from model_registry import ModelNotFoundError, ModelTooLargeError, ModelUnavailableError
+from wire_format import (
+    FORMAT_JSON, UnsupportedMediaTypeError, negotiate, response_formats, request_formats,
+    decode_body, dumps_json, encode_predictions
+)
+from streaming import (
+    LineTooLongError, detect_format, spool_body, iter_file_blocks, iter_lines,
+    iter_ndjson_records, iter_csv_records, score_stream, FORMAT_CSV,
+    DEFAULT_STREAM_CHUNK_SIZE, DEFAULT_MAX_LINE_BYTES, DEFAULT_TEXT_FIELD, DEFAULT_SPOOL_MAX_MEMORY_BYTES
 )
 
-# Пути к моделям по умолчанию
-DEFAULT_MODEL_PATH = os.path.join(current_dir, "models", "best_model.pkl")
-DEFAULT_VECTORIZER_PATH = os.path.join(current_dir, "models", "tfidf_vectorizer.pkl")
+# Метрики HTTP: время и число запросов по эндпоинтам
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Время обработки HTTP запроса (до первого байта ответа)",
+    labelnames=("endpoint", "method")
+)
+REQUESTS_TOTAL = REGISTRY.counter(
+    "http_requests_total", "Число HTTP запросов", labelnames=("endpoint", "method", "status")
+)
 
-# Получаем пути из конфига или используем значения по умолчанию
-if HAS_CONFIG:
+async def record_request_metrics(request: Request, call_next):
+    """Время и статус каждого запроса по шаблону пути эндпоинта"""
+    start = time.perf_counter()
+    status = 500
     try:
-        inference_config = config.get_inference_config()
-        model_path = inference_config.model.model_path
-        vectorizer_path = inference_config.model.vectorizer_path
-        print(f"📁 Используем пути из конфига:")
-        print(f"   Модель: {model_path}")
-        print(f"   Векторайзер: {vectorizer_path}")
-    except Exception as e:
-        print(f"⚠️ Ошибка загрузки конфига: {e}")
-        model_path = DEFAULT_MODEL_PATH
-        vectorizer_path = DEFAULT_VECTORIZER_PATH
-else:
-    model_path = DEFAULT_MODEL_PATH
-    vectorizer_path = DEFAULT_VECTORIZER_PATH
-    print(f"📁 Используем пути по умолчанию:")
-    print(f"   Модель: {model_path}")
-    print(f"   Векторайзер: {vectorizer_path}")
-
-# Проверяем существование файлов
-print(f"🔍 Проверяем наличие файлов моделей:")
-print(f"   Модель существует: {os.path.exists(model_path)}")
-print(f"   Векторайзер существует: {os.path.exists(vectorizer_path)}")
-
-# Инициализируем предиктор
-predictor = ModelPredictor(
-    model_path=model_path,
-    vectorizer_path=vectorizer_path
-)
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method)
+        REQUESTS_TOTAL.inc(endpoint=endpoint, method=request.method, status=str(status))
 
 # Модели данных (Pydantic схемы)
 class PredictRequest(BaseModel):
     """Запрос для предсказания"""
     text: str
-    model_type: Optional[str] = "ridge"
+    model_type: Optional[str] = Field(None, description="Модель из реестра (/models); не указана - основная")
 
 class PredictResponse(BaseModel):
     """Ответ с предсказанием"""
@@ -77,10 +72,26 @@ class PredictResponse(BaseModel):
     processing_time_ms: float
     features_count: Optional[int] = None
     error: Optional[str] = None
+    cached: bool = False
+    approximate: bool = Field(False, description="Предсказание почти одинакового текста из индекса MinHash/LSH")
+    similarity: Optional[float] = Field(None, description="Оценка Жаккара с этим текстом (для approximate)")
 
 class BatchPredictRequest(BaseModel):
     """Запрос для batch предсказаний"""
     texts: List[str]
+    model_type: Optional[str] = Field(None, description="Модель из реестра (/models); не указана - основная")
+
+class ProfilerStartRequest(BaseModel):
+    """Параметры сессии профилирования"""
+    sample_rate: float = Field(1.0, gt=0.0, le=1.0, description="Доля профилируемых запросов")
+    duration_s: Optional[float] = Field(None, gt=0.0, description="Длительность окна (не больше max_duration_s)")
+    interval_ms: Optional[float] = Field(None, gt=0.0, description="Период снятия стеков")
+
+class ModelReloadRequest(BaseModel):
+    """Новая пара модель + векторайзер; не указанные пути остаются текущими"""
+    model_path: Optional[str] = None
+    vectorizer_path: Optional[str] = None
+    compact_dir: Optional[str] = Field(None, description="Пустая строка - без компактных артефактов")
 
 class HealthResponse(BaseModel):
     """Ответ для health check"""
@@ -88,8 +99,39 @@ class HealthResponse(BaseModel):
     model_loaded: bool
     model_type: Optional[str] = None
 
-# Эндпоинты (оставляем без изменений)
-@app.get("/", tags=["Root"])
+def get_service(request: Request) -> InferenceService:
+    return request.app.state.service
+
+def get_ready_service(request: Request) -> InferenceService:
+    """Сервис, готовый к предсказаниям; до окончания старта - 503"""
+    service = request.app.state.service
+    if not service.ready:
+        raise HTTPException(status_code=503, detail=f"Service is not ready: {service.status}")
+    return service
+
+def require_admin(service: InferenceService = Depends(get_service),
+                  x_admin_token: Optional[str] = Header(None)):
+    """Проверка токена администратора из заголовка X-Admin-Token"""
+    if not service.admin_token:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, service.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+async def resolve_predictor(service: InferenceService, model_type: Optional[str]):
+    """Предиктор для model_type; None - основная модель (микробатчер, пул процессов)"""
+    if service.is_default_model(model_type):
+        return None
+    try:
+        return await service.get_predictor(model_type)
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=400, detail=e.args[0])
+    except (ModelTooLargeError, ModelUnavailableError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+router = APIRouter()
+
+# Эндпоинты
+@router.get("/", tags=["Root"])
 async def root():
     """Корневой эндпоинт"""
     return {
@@ -98,47 +140,269 @@ async def root():
         "endpoints": {
             "documentation": "/docs",
             "health_check": "/health",
+            "liveness": "/live",
+            "readiness": "/ready",
             "single_prediction": "/predict",
-            "batch_prediction": "/predict/batch"
+            "batch_prediction": "/predict/batch",
+            "stream_prediction": "/predict/stream",
+            "models": "/models",
+            "metrics": "/metrics"
         }
     }
 
-@app.get("/health", response_model=HealthResponse, tags=["Health"])
-async def health_check():
+@router.get("/live", tags=["Health"])
+async def liveness():
+    """Процесс жив и event loop отвечает (модель может еще загружаться)"""
+    return {"status": "alive"}
+
+@router.get("/ready", tags=["Health"])
+async def readiness(service: InferenceService = Depends(get_service)):
+    """Модель загружена и прогрета, пулы запущены - можно слать трафик"""
+    return JSONResponse(status_code=200 if service.ready else 503, content=service.get_status())
+
+@router.get("/health", response_model=HealthResponse, tags=["Health"])
+async def health_check(service: InferenceService = Depends(get_service)):
     """Проверка здоровья сервиса"""
-    info = predictor.get_model_info()
+    if service.status not in (STATUS_READY, STATUS_FAILED):
+        return JSONResponse(status_code=503, content=HealthResponse(status="starting", model_loaded=False).model_dump())
+    info = service.predictor.get_model_info() if service.predictor is not None else {"is_loaded": False}
     return HealthResponse(
         status="healthy" if info["is_loaded"] else "degraded",
         model_loaded=info["is_loaded"],
         model_type=info.get("model_type")
     )
 
-@app.post("/predict", response_model=PredictResponse, tags=["Prediction"])
-async def predict_single(request: PredictRequest):
+@router.post("/predict", response_model=PredictResponse, tags=["Prediction"])
+async def predict_single(request: PredictRequest, service: InferenceService = Depends(get_ready_service)):
     """Предсказание для одного текста"""
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
-    
-    result = predictor.predict(request.text)
-    
+
+    predictor = await resolve_predictor(service, request.model_type)
+    try:
+        if predictor is not None:
+            result = await service.executor.run_predict(request.text, predictor)
+        elif service.batcher is not None and service.batcher.is_running:
+            result = await service.batcher.submit(request.text)
+        else:
+            result = await service.executor.run_predict(request.text)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
     if result["error"]:
         raise HTTPException(status_code=500, detail=result["error"])
-    
-    return PredictResponse(**result)
 
-@app.post("/predict/batch", tags=["Prediction"])
-async def predict_batch(request: BatchPredictRequest):
-    """Предсказание для нескольких текстов"""
-    if not request.texts:
+    with observe_stage("serialize"):
+        body = PredictResponse(**result).model_dump_json()
+    return Response(content=body, media_type="application/json")
+
+async def parse_batch_request(request: Request) -> BatchPredictRequest:
+    """Тело /predict/batch в JSON или MessagePack по Content-Type"""
+    try:
+        data = decode_body(await request.body(), request.headers.get("content-type"))
+    except UnsupportedMediaTypeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed request body: {e}")
+    try:
+        return BatchPredictRequest.model_validate(data)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+BATCH_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {media_type: {"schema": BatchPredictRequest.model_json_schema()} for media_type in request_formats()}
+    }
+}
+
+@router.post("/predict/batch", tags=["Prediction"], openapi_extra=BATCH_OPENAPI)
+async def predict_batch(request: Request, service: InferenceService = Depends(get_ready_service)):
+    """Предсказание для нескольких текстов.
+
+    Тело - JSON или MessagePack (Content-Type). Ответ по Accept: JSON
+    (по умолчанию, как раньше), MessagePack {"predictions", "errors"} или
+    application/x-float32 - сырой массив float32, ошибки - NaN.
+    """
+    response_format = negotiate(request.headers.get("accept"))
+    if response_format is None:
+        raise HTTPException(status_code=406, detail=f"Supported response formats: {', '.join(response_formats())}")
+    payload = await parse_batch_request(request)
+    if not payload.texts:
         raise HTTPException(status_code=400, detail="Texts list cannot be empty")
-    
-    results = predictor.batch_predict(request.texts)
-    return {"predictions": results}
 
-@app.get("/model/info", tags=["Model"])
-async def model_info():
+    predictor = await resolve_predictor(service, payload.model_type)
+    BATCH_SIZE.observe(len(payload.texts), source="batch")
+    try:
+        if response_format == FORMAT_JSON:
+            results = await service.executor.run_batch(payload.texts, predictor)
+        else:
+            # Бинарным клиентам словари на каждый текст не нужны - сразу массив
+            predictions, errors = await service.executor.run_batch_array(payload.texts, predictor)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    with observe_stage("serialize"):
+        if response_format == FORMAT_JSON:
+            body, headers = dumps_json({"predictions": results}), None
+        else:
+            body, headers = encode_predictions(predictions, errors, response_format)
+    return Response(content=body, media_type=response_format, headers=headers)
+
+@router.post("/predict/stream", tags=["Prediction"])
+async def predict_stream(request: Request, text_field: str = DEFAULT_TEXT_FIELD,
+                         chunk_size: Optional[int] = None, model_type: Optional[str] = None,
+                         service: InferenceService = Depends(get_ready_service)):
+    """Потоковый скоринг: NDJSON или CSV (Content-Type: text/csv) на входе, NDJSON на выходе.
+
+    Тело сохраняется во временный файл (большое - на диск), затем читается
+    построчно и скорится чанками; результаты отдаются по мере готовности,
+    так что память не зависит от размера выгрузки.
+    """
+    streaming_config = service.streaming_config
+    max_chunk_size = streaming_config.get("max_chunk_size", service.batch_chunk_size)
+    chunk_size = min(chunk_size or streaming_config.get("chunk_size", DEFAULT_STREAM_CHUNK_SIZE), max_chunk_size)
+    if chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
+    max_line_bytes = streaming_config.get("max_line_bytes", DEFAULT_MAX_LINE_BYTES)
+    predictor = await resolve_predictor(service, model_type)
+
+    spool = await spool_body(
+        request.stream(),
+        max_memory_bytes=streaming_config.get("spool_max_memory_bytes", DEFAULT_SPOOL_MAX_MEMORY_BYTES)
+    )
+    lines = iter_lines(iter_file_blocks(spool), max_line_bytes=max_line_bytes)
+    if detect_format(request.headers.get("content-type")) == FORMAT_CSV:
+        records = iter_csv_records(lines, text_field=text_field, max_line_bytes=max_line_bytes)
+    else:
+        records = iter_ndjson_records(lines, text_field=text_field)
+
+    async def score_chunk(texts):
+        BATCH_SIZE.observe(len(texts), source="stream")
+        return await service.executor.run_batch(texts, predictor)
+
+    async def body():
+        try:
+            async for line in score_stream(records, score_chunk, chunk_size=chunk_size):
+                yield line
+        except (LineTooLongError, ValueError) as e:
+            # Статус уже отправлен - сообщаем об ошибке последней строкой
+            yield (json.dumps({"error": str(e)}, ensure_ascii=False) + "\n").encode("utf-8")
+        finally:
+            spool.close()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@router.get("/metrics", tags=["Health"])
+async def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return Response(content=REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@router.get("/model/info", tags=["Model"])
+async def model_info(service: InferenceService = Depends(get_service)):
     """Информация о загруженной модели"""
-    return predictor.get_model_info()
+    info = service.predictor.get_model_info() if service.predictor is not None else {"is_loaded": False}
+    if service.batcher is not None:
+        info["batching"] = service.batcher.get_stats()
+    if service.executor is not None:
+        info["executor"] = service.executor.get_stats()
+    if service.model_watcher is not None:
+        info["model_watcher"] = service.model_watcher.get_stats()
+    if service.registry is not None:
+        info["registry"] = service.registry.get_stats()
+    info["service"] = service.get_status()
+    return info
+
+@router.get("/models", tags=["Model"])
+async def list_models(service: InferenceService = Depends(get_ready_service)):
+    """Модели реестра: какие загружены, оценка памяти, выгрузки по LRU"""
+    return {"default_model": service.default_model, **service.registry.get_stats()}
+
+@router.post("/admin/profiler/start", tags=["Admin"], dependencies=[Depends(require_admin)])
+async def profiler_start(request: ProfilerStartRequest, service: InferenceService = Depends(get_service)):
+    """Профилирование доли запросов /predict и /predict/batch в течение окна.
+
+    Большие батчи из пула процессов не профилируются: у воркеров свой предиктор.
+    """
+    return service.profiler.start(
+        sample_rate=request.sample_rate,
+        duration_s=request.duration_s,
+        interval_ms=request.interval_ms
+    )
+
+@router.post("/admin/profiler/stop", tags=["Admin"], dependencies=[Depends(require_admin)])
+async def profiler_stop(service: InferenceService = Depends(get_service)):
+    """Досрочная остановка профилирования; стеки остаются до следующего start"""
+    return service.profiler.stop()
+
+@router.get("/admin/profiler", tags=["Admin"], dependencies=[Depends(require_admin)])
+async def profiler_status(service: InferenceService = Depends(get_service)):
+    """Состояние текущей или последней сессии профилирования"""
+    return service.profiler.get_status()
+
+@router.get("/admin/profiler/flamegraph", tags=["Admin"], dependencies=[Depends(require_admin)])
+async def profiler_flamegraph(service: InferenceService = Depends(get_service)):
+    """Стеки в collapsed формате для flamegraph.pl / speedscope / inferno"""
+    return Response(
+        content=service.profiler.collapsed(),
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="predictor_profile.folded"'}
+    )
+
+@router.post("/admin/model/reload", tags=["Admin"], dependencies=[Depends(require_admin)])
+async def model_reload(request: Optional[ModelReloadRequest] = None,
+                       service: InferenceService = Depends(get_service)):
+    """Перезагрузка модели без простоя: текущие запросы дорабатывают на старой"""
+    from predictor import ReloadInProgressError
+
+    if service.predictor is None or service.executor is None:
+        raise HTTPException(status_code=503, detail=f"Service is not started: {service.status}")
+    request = request or ModelReloadRequest()
+    try:
+        return await service.reload_model(request.model_path, request.vectorizer_path, request.compact_dir)
+    except ReloadInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, previous model is still serving: {e}")
+
+def create_app(inference_config=None, background_startup: bool = True) -> FastAPI:
+    """Создает приложение; модель загружается при старте (lifespan), не здесь.
+
+    background_startup=True - lifespan не ждет загрузки модели: сервер сразу
+    принимает соединения, /live отвечает 200, /ready - 503 до готовности.
+    False - старт завершается только после загрузки (удобно в тестах и скриптах).
+    """
+    service = InferenceService(inference_config, import_seconds=IMPORT_SECONDS)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        """Запуск и остановка сервиса"""
+        startup = asyncio.create_task(service.start())
+        if not background_startup:
+            await startup
+        yield
+        if not startup.done():
+            # Загрузку в потоке не прервать - дожидаемся ее и останавливаем пулы
+            await startup
+        await service.stop()
+
+    app = FastAPI(
+        title="NLP MLOps API",
+        description="API для предсказания количества комментариев по тексту поста",
+        version="1.0.0",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        lifespan=lifespan
+    )
+    app.state.service = service
+    app.middleware("http")(record_request_metrics)
+    app.include_router(router)
+    return app
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+# Приложение для `uvicorn api:app`
+app = create_app()
 
 # Запуск сервера
 if __name__ == "__main__":
@@ -147,4 +411,4 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=False
-    )
\ No newline at end of file
+    )
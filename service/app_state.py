@@ -0,0 +1,394 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+from batching import MicroBatcher, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS, DEFAULT_MAX_QUEUE_SIZE
+from executors import (
+    InferenceExecutor,
+    DEFAULT_THREAD_WORKERS, DEFAULT_PROCESS_WORKERS,
+    DEFAULT_PROCESS_BATCH_THRESHOLD, DEFAULT_MAX_QUEUE_DEPTH
+)
+from metrics import REGISTRY
+from model_registry import ModelRegistry, ModelSpec, SharedArtifacts, DEFAULT_MAX_MEMORY_MB
+from model_reload import ModelFileWatcher, DEFAULT_POLL_INTERVAL_S
+from prediction_cache import PredictionCache, DEFAULT_CACHE_MAX_SIZE, DEFAULT_CACHE_TTL_SECONDS
+from profiling import SamplingProfiler, DEFAULT_INTERVAL_MS, DEFAULT_MAX_DURATION_S, DEFAULT_MAX_STACKS
+
+# predictor (joblib, numpy, sklearn) и text_preprocessing (pymorphy3, nltk)
+# импортируются в build(), чтобы импорт api.py оставался быстрым
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Пути к моделям по умолчанию
+DEFAULT_MODEL_PATH = os.path.join(current_dir, "models", "best_model.pkl")
+DEFAULT_VECTORIZER_PATH = os.path.join(current_dir, "models", "tfidf_vectorizer.pkl")
+DEFAULT_COMPACT_DIR = os.path.join(current_dir, "models", "compact")
+DEFAULT_BATCH_CHUNK_SIZE = 1024
+DEFAULT_ENGINE_MAX_BATCH = 256
+DEFAULT_ADMIN_TOKEN_ENV = "ADMIN_TOKEN"
+DEFAULT_WARMUP_ROUNDS = 3
+# Имя основной модели в реестре, если не задано ни registry.default_model, ни model.type
+DEFAULT_MODEL_NAME = "ridge"
+# Значение registry.models.<имя>.preprocessing для модели без предобработки
+PREPROCESSING_NONE = "none"
+
+# Состояния сервиса для /ready
+STATUS_CREATED = "created"
+STATUS_LOADING = "loading"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+def read_inference_config():
+    """Конфиг инференса из config_loader или {} (значения по умолчанию)"""
+    try:
+        from config_loader import get_config
+    except ImportError:
+        print("⚠️ config_loader не найден, используем значения по умолчанию")
+        return {}
+    try:
+        return get_config().get_inference_config()
+    except Exception as e:
+        print(f"⚠️ Ошибка загрузки конфига: {e}")
+        return {}
+
+
+class InferenceService:
+    """Компоненты сервиса инференса, создаваемые при старте приложения.
+
+    Конструктор ничего не загружает. Конфиг, модель и пулы создаются
+    в start(): блокирующая часть (build) идет в отдельном потоке, так что
+    event loop уже отвечает на /live, а /ready переходит в 200 только
+    после загрузки и прогрева модели. Время каждого этапа - в timings.
+    """
+
+    def __init__(self, inference_config=None, import_seconds: Optional[float] = None):
+        # None - конфиг читается через config_loader при старте
+        self.inference_config = inference_config
+        self.status = STATUS_CREATED
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        if import_seconds is not None:
+            self.timings["import_s"] = round(import_seconds, 3)
+
+        self.predictor = None
+        self.registry: Optional[ModelRegistry] = None
+        self.default_model = DEFAULT_MODEL_NAME
+        self.executor: Optional[InferenceExecutor] = None
+        self.batcher: Optional[MicroBatcher] = None
+        self.cache: Optional[PredictionCache] = None
+        self.near_duplicates = None
+        # Общий пул векторайзеров и SVD основной модели и моделей реестра
+        self.artifact_pool = SharedArtifacts()
+        self.profiler: Optional[SamplingProfiler] = None
+        self.model_watcher: Optional[ModelFileWatcher] = None
+        self.admin_token: Optional[str] = None
+        self.batch_chunk_size = DEFAULT_BATCH_CHUNK_SIZE
+        self.streaming_config: Dict[str, Any] = {}
+        self.reload_config: Dict[str, Any] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.status == STATUS_READY
+
+    def _timed(self, name: str, start: float):
+        self.timings[name] = round(time.perf_counter() - start, 3)
+
+    def build(self):
+        """Чтение конфига, загрузка и прогрев модели (блокирующая часть старта)"""
+        start = time.perf_counter()
+        config = self.inference_config if self.inference_config is not None else read_inference_config()
+        model_config = config.get("model", {})
+        model_path = model_config.get("model_path", DEFAULT_MODEL_PATH)
+        vectorizer_path = model_config.get("vectorizer_path", DEFAULT_VECTORIZER_PATH)
+        # Без конфига берем компактные артефакты рядом с моделью по умолчанию
+        compact_dir = model_config.get("compact_dir", None if config else DEFAULT_COMPACT_DIR)
+        self.batch_chunk_size = config.get("batch", {}).get("chunk_size", DEFAULT_BATCH_CHUNK_SIZE)
+        batching_config = config.get("batching", {})
+        executor_config = config.get("executor", {})
+        cache_config = config.get("cache", {})
+        near_duplicate_config = config.get("near_duplicates", {})
+        preprocessing_config = config.get("preprocessing", {})
+        profiling_config = config.get("profiling", {})
+        self.streaming_config = config.get("streaming", {})
+        self.reload_config = config.get("reload", {})
+        self._timed("config_s", start)
+
+        # Кэш предсказаний для повторяющихся текстов
+        if cache_config.get("enabled", True):
+            self.cache = PredictionCache(
+                max_size=cache_config.get("max_size", DEFAULT_CACHE_MAX_SIZE),
+                ttl_seconds=cache_config.get("ttl_seconds", DEFAULT_CACHE_TTL_SECONDS)
+            )
+
+        # Почти одинаковые тексты (репосты, шаблонные объявления) - приближенный ответ без модели
+        if near_duplicate_config.get("enabled", False):
+            try:
+                from near_duplicates import (
+                    NearDuplicateIndex, DEFAULT_THRESHOLD, DEFAULT_NUM_PERM, DEFAULT_SHINGLE_SIZE,
+                    DEFAULT_MIN_TOKENS, DEFAULT_INDEX_MAX_SIZE, DEFAULT_INDEX_TTL_SECONDS
+                )
+            except ImportError:
+                print("⚠️ near_duplicates не найден, поиск почти одинаковых текстов отключен")
+            else:
+                self.near_duplicates = NearDuplicateIndex(
+                    threshold=near_duplicate_config.get("threshold", DEFAULT_THRESHOLD),
+                    num_perm=near_duplicate_config.get("num_perm", DEFAULT_NUM_PERM),
+                    shingle_size=near_duplicate_config.get("shingle_size", DEFAULT_SHINGLE_SIZE),
+                    min_tokens=near_duplicate_config.get("min_tokens", DEFAULT_MIN_TOKENS),
+                    max_size=near_duplicate_config.get("max_size", DEFAULT_INDEX_MAX_SIZE),
+                    ttl_seconds=near_duplicate_config.get("ttl_seconds", DEFAULT_INDEX_TTL_SECONDS),
+                    bands=near_duplicate_config.get("bands")
+                )
+
+        # Предобработка: лемматизация как у processed_text, на котором обучена модель
+        text_preprocessor = None
+        if preprocessing_config.get("enabled", True):
+            try:
+                from text_preprocessing import TextPreprocessor, MODE_LEMMATIZE, DEFAULT_MEMO_SIZE
+            except ImportError:
+                print("⚠️ text_preprocessing не найден, тексты идут в векторайзер без предобработки")
+            else:
+                text_preprocessor = TextPreprocessor(
+                    mode=preprocessing_config.get("mode", MODE_LEMMATIZE),
+                    memo_size=preprocessing_config.get("memo_size", DEFAULT_MEMO_SIZE)
+                )
+
+        # Профилер запросов выключен, пока его не включат через /admin/profiler/start
+        self.profiler = SamplingProfiler(
+            interval_ms=profiling_config.get("interval_ms", DEFAULT_INTERVAL_MS),
+            max_duration_s=profiling_config.get("max_duration_s", DEFAULT_MAX_DURATION_S),
+            max_stacks=profiling_config.get("max_stacks", DEFAULT_MAX_STACKS)
+        )
+        # Токен админских эндпоинтов берем из окружения, не из конфига
+        self.admin_token = os.environ.get(profiling_config.get("admin_token_env", DEFAULT_ADMIN_TOKEN_ENV))
+        if not self.admin_token:
+            print("⚠️ Токен администратора не задан, /admin/* отключены")
+
+        start = time.perf_counter()
+        from predictor import ModelPredictor
+        self._timed("predictor_import_s", start)
+
+        start = time.perf_counter()
+        self.predictor = ModelPredictor(
+            model_path=model_path,
+            vectorizer_path=vectorizer_path,
+            batch_chunk_size=self.batch_chunk_size,
+            cache=self.cache,
+            preprocessor=text_preprocessor,
+            compact_dir=compact_dir,
+            use_engine=model_config.get("use_engine", True),
+            profiler=self.profiler,
+            artifact_pool=self.artifact_pool,
+            near_duplicates=self.near_duplicates,
+            engine_max_batch=model_config.get("engine_max_batch", DEFAULT_ENGINE_MAX_BATCH)
+        )
+        self._timed("model_load_s", start)
+
+        # Первый запрос не должен платить за ленивую инициализацию (pymorphy3, BLAS)
+        start = time.perf_counter()
+        self.predictor.warmup(self.reload_config.get("warmup_rounds", DEFAULT_WARMUP_ROUNDS))
+        self._timed("warmup_s", start)
+
+        # Остальные модели загружаются по первому запросу с их model_type
+        self.registry = self._build_registry(config, text_preprocessor)
+
+        # Инференс выполняется в пулах, чтобы не блокировать event loop
+        self.executor = InferenceExecutor(
+            self.predictor,
+            thread_workers=executor_config.get("thread_workers", DEFAULT_THREAD_WORKERS),
+            process_workers=executor_config.get("process_workers", DEFAULT_PROCESS_WORKERS),
+            process_batch_threshold=executor_config.get("process_batch_threshold", DEFAULT_PROCESS_BATCH_THRESHOLD),
+            max_queue_depth=executor_config.get("max_queue_depth", DEFAULT_MAX_QUEUE_DEPTH)
+        )
+
+        # Микробатчер склеивает одновременные запросы /predict в один вызов модели
+        if batching_config.get("enabled", True):
+            self.batcher = MicroBatcher(
+                self.executor.run_batch,
+                max_batch_size=batching_config.get("max_batch_size", DEFAULT_MAX_BATCH_SIZE),
+                max_wait_ms=batching_config.get("max_wait_ms", DEFAULT_MAX_WAIT_MS),
+                max_queue_size=batching_config.get("max_queue_size", DEFAULT_MAX_QUEUE_SIZE)
+            )
+
+        # Перезагрузка при изменении файлов модели (например, после docker cp новой модели)
+        if self.reload_config.get("watch", False):
+            self.model_watcher = ModelFileWatcher(
+                lambda: [self.predictor.model_path, self.predictor.vectorizer_path],
+                self.reload_model,
+                poll_interval_s=self.reload_config.get("poll_interval_s", DEFAULT_POLL_INTERVAL_S)
+            )
+
+        self._register_metrics()
+
+    def _build_registry(self, config, text_preprocessor) -> ModelRegistry:
+        """Реестр моделей: основная закреплена, остальные из registry.models"""
+        from predictor import ModelPredictor
+
+        registry_config = config.get("registry", {})
+        preprocessing_config = config.get("preprocessing", {})
+        self.default_model = registry_config.get(
+            "default_model", config.get("model", {}).get("type", DEFAULT_MODEL_NAME)
+        )
+        specs = {
+            name: ModelSpec.from_config(name, spec_config)
+            for name, spec_config in (registry_config.get("models") or {}).items()
+        }
+        specs[self.default_model] = ModelSpec(
+            self.default_model, self.predictor.model_path, self.predictor.vectorizer_path,
+            compact_dir=self.predictor.compact_dir
+        )
+        # Один TextPreprocessor (и его memo) на режим для всех моделей
+        preprocessors = {}
+        if text_preprocessor is not None:
+            preprocessors[text_preprocessor.mode] = text_preprocessor
+        warmup_rounds = self.reload_config.get("warmup_rounds", DEFAULT_WARMUP_ROUNDS)
+
+        def make_predictor(spec: ModelSpec):
+            preprocessor = text_preprocessor
+            if spec.preprocessing == PREPROCESSING_NONE or not preprocessing_config.get("enabled", True):
+                preprocessor = None
+            elif spec.preprocessing is not None:
+                if spec.preprocessing not in preprocessors:
+                    from text_preprocessing import TextPreprocessor, DEFAULT_MEMO_SIZE
+                    preprocessors[spec.preprocessing] = TextPreprocessor(
+                        mode=spec.preprocessing,
+                        memo_size=preprocessing_config.get("memo_size", DEFAULT_MEMO_SIZE)
+                    )
+                preprocessor = preprocessors[spec.preprocessing]
+            predictor = ModelPredictor(
+                model_path=spec.model_path,
+                vectorizer_path=spec.vectorizer_path,
+                batch_chunk_size=self.batch_chunk_size,
+                cache=self.cache,
+                preprocessor=preprocessor,
+                compact_dir=spec.compact_dir,
+                use_engine=spec.use_engine,
+                profiler=self.profiler,
+                artifact_pool=self.artifact_pool,
+                near_duplicates=self.near_duplicates,
+                engine_max_batch=self.predictor.engine_max_batch
+            )
+            predictor.warmup(warmup_rounds)
+            return predictor
+
+        return ModelRegistry(
+            specs, make_predictor,
+            pinned={self.default_model: self.predictor},
+            max_memory_mb=registry_config.get("max_memory_mb", DEFAULT_MAX_MEMORY_MB),
+            artifact_pool=self.artifact_pool
+        )
+
+    def _register_metrics(self):
+        """Состояние очередей, кэша и старта сервиса в /metrics.
+
+        Накопленные итоги (попадания, промахи, отказы) - счетчики *_total,
+        чтобы в Prometheus работал rate(); долю попаданий по всем воркерам
+        считает запрос, например rate(prediction_cache_hits_total[5m]) /
+        (rate(prediction_cache_hits_total[5m]) + rate(prediction_cache_misses_total[5m])).
+        """
+        REGISTRY.gauge("inference_queue_depth", "Задач в пулах инференса",
+                       lambda: self.executor.queue_depth)
+        REGISTRY.counter("inference_rejected_total", "Запросов, отклоненных с 503 из-за очереди инференса",
+                         callback=lambda: self.executor.rejected)
+        if self.batcher is not None:
+            REGISTRY.gauge("batcher_queue_depth", "Запросов в очереди микробатчера",
+                           lambda: self.batcher.queue_depth)
+        if self.cache is not None:
+            REGISTRY.counter("prediction_cache_hits_total", "Попаданий в кэш предсказаний",
+                             callback=lambda: self.cache.hits)
+            REGISTRY.counter("prediction_cache_misses_total", "Промахов кэша предсказаний",
+                             callback=lambda: self.cache.misses)
+        if self.near_duplicates is not None:
+            REGISTRY.counter("near_duplicate_hits_total", "Ответов по почти одинаковому тексту без модели",
+                             callback=lambda: self.near_duplicates.hits)
+            REGISTRY.counter("near_duplicate_misses_total", "Промахов индекса почти одинаковых текстов",
+                             callback=lambda: self.near_duplicates.misses)
+            REGISTRY.gauge("near_duplicate_lookup_ms", "Среднее время поиска в индексе почти одинаковых текстов",
+                           lambda: self.near_duplicates.get_stats()["avg_lookup_ms"])
+            REGISTRY.counter("near_duplicate_saved_ms_total", "Время модели, сэкономленное попаданиями в индекс",
+                             callback=lambda: self.near_duplicates.saved_ms)
+        REGISTRY.gauge("model_registry_loaded", "Загруженных по запросу моделей реестра",
+                       lambda: self.registry.loaded_count)
+        REGISTRY.counter("model_registry_evictions_total", "Моделей, выгруженных из реестра по LRU",
+                         callback=lambda: self.registry.evictions)
+        REGISTRY.gauge("service_import_seconds", "Время импорта модуля приложения",
+                       lambda: self.timings.get("import_s", 0.0))
+        REGISTRY.gauge("service_startup_seconds", "Время от старта приложения до готовности",
+                       lambda: self.timings.get("startup_s", 0.0))
+
+    async def start(self):
+        """Полный старт: build в отдельном потоке, затем пулы и фоновые задачи"""
+        self.status = STATUS_LOADING
+        start = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.build)
+            self.executor.start()
+            if self.batcher is not None:
+                await self.batcher.start()
+            if self.model_watcher is not None:
+                await self.model_watcher.start()
+        except Exception as e:
+            self.status = STATUS_FAILED
+            self.error = str(e)
+            print(f"❌ Сервис не запустился: {e}")
+            return
+        self._timed("startup_s", start)
+
+        if not self.predictor.is_loaded:
+            # Как и раньше, сервис работает в режиме degraded: модель можно загрузить через reload
+            self.status = STATUS_FAILED
+            self.error = "Model not loaded"
+            return
+        self.status = STATUS_READY
+        print(f"🚀 Сервис готов за {self.timings['startup_s']:.2f} с "
+              f"(импорт {self.timings.get('import_s', 0.0):.2f} с, модель {self.timings['model_load_s']:.2f} с)")
+
+    async def stop(self):
+        if self.model_watcher is not None:
+            await self.model_watcher.stop()
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.batcher is not None:
+            await self.batcher.stop()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    async def reload_model(self, model_path: Optional[str] = None, vectorizer_path: Optional[str] = None,
+                           compact_dir: Optional[str] = None) -> dict:
+        """Загрузка, прогрев и подмена модели без остановки сервиса.
+
+        Загрузка идет в отдельном потоке (не в пуле инференса), запросы
+        в это время обслуживает старая модель. Затем под новую модель
+        пересоздается пул процессов.
+        """
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            None, lambda: self.predictor.reload(
+                model_path, vectorizer_path, compact_dir,
+                warmup_rounds=self.reload_config.get("warmup_rounds", DEFAULT_WARMUP_ROUNDS)
+            )
+        )
+        await loop.run_in_executor(None, self.executor.restart_process_pool)
+        # Сервис, стартовавший без модели, после успешной загрузки готов
+        if self.status == STATUS_FAILED and self.predictor.is_loaded:
+            self.status = STATUS_READY
+            self.error = None
+        return result
+
+    def is_default_model(self, model_type: Optional[str]) -> bool:
+        return model_type is None or model_type == self.default_model
+
+    async def get_predictor(self, model_type: Optional[str]):
+        """Предиктор модели model_type; загрузка из реестра идет в отдельном потоке"""
+        if self.is_default_model(model_type):
+            return self.predictor
+        return await asyncio.get_running_loop().run_in_executor(None, self.registry.get, model_type)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "error": self.error,
+            "timings": self.timings
+        }
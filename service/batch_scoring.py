@@ -0,0 +1,205 @@
+"""Офлайн скоринг CSV/Parquet без HTTP.
+
+Файл читается чанками, чанки раздаются пулу процессов, где каждый воркер
+один раз загружает ModelPredictor. Предсказания дописываются в выходной
+файл в исходном порядке строк по мере готовности, так что в памяти
+находится не больше нескольких чанков на воркер.
+
+Пример:
+    python batch_scoring.py ../data/processed/experiments/exp1_regress.csv predictions.csv
+    python batch_scoring.py posts.parquet predictions.parquet --column text --preprocess lemmatize
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+# text_preprocessing.py лежит в корне проекта (в Docker-образе - рядом)
+sys.path.insert(0, os.path.join(current_dir, ".."))
+
+DEFAULT_MODEL_PATH = os.path.join(current_dir, "models", "best_model.pkl")
+DEFAULT_VECTORIZER_PATH = os.path.join(current_dir, "models", "tfidf_vectorizer.pkl")
+DEFAULT_COMPACT_DIR = os.path.join(current_dir, "models", "compact")
+DEFAULT_CHUNK_SIZE = 10_000
+DEFAULT_TEXT_COLUMN = "processed_text"
+DEFAULT_KEEP_COLUMNS = ("comments_count",)
+# Сколько чанков на воркер держим в работе одновременно
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+PREPROCESS_NONE = "none"
+
+# Предиктор внутри процесса пула: загружается один раз на воркер
+_worker_predictor = None
+
+
+def _init_worker(model_path: str, vectorizer_path: str, compact_dir: Optional[str],
+                 use_engine: bool, preprocess: str):
+    global _worker_predictor
+    from predictor import ModelPredictor
+
+    preprocessor = None
+    if preprocess != PREPROCESS_NONE:
+        from text_preprocessing import TextPreprocessor
+        preprocessor = TextPreprocessor(mode=preprocess)
+    # Кэш не нужен: при перескоринге файла тексты почти не повторяются
+    _worker_predictor = ModelPredictor(
+        model_path, vectorizer_path, cache=None, preprocessor=preprocessor,
+        compact_dir=compact_dir, use_engine=use_engine
+    )
+
+
+def _score_chunk(texts: List[Any]) -> Dict[str, np.ndarray]:
+    results = _worker_predictor.batch_predict(texts)
+    return {
+        "prediction": np.array([r["prediction"] if not r["error"] else np.nan for r in results]),
+        "error": np.array([r["error"] for r in results], dtype=object)
+    }
+
+
+def iter_input_chunks(path: str, columns: List[str], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Чанки CSV или Parquet (по расширению) только с нужными колонками"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        available = set(parquet_file.schema_arrow.names)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size,
+                                               columns=[c for c in columns if c in available]):
+            yield batch.to_pandas()
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        yield from pd.read_csv(path, usecols=[c for c in columns if c in header], chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Дописывает результат чанками в CSV или Parquet"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows_written = 0
+        self._parquet_writer = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, frame: pd.DataFrame):
+        if self.path.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a", index=False, header=self.rows_written == 0, encoding="utf-8")
+        self.rows_written += len(frame)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def score_file(input_path: str, output_path: str, text_column: str = DEFAULT_TEXT_COLUMN,
+               keep_columns=DEFAULT_KEEP_COLUMNS, model_path: str = DEFAULT_MODEL_PATH,
+               vectorizer_path: str = DEFAULT_VECTORIZER_PATH, compact_dir: Optional[str] = DEFAULT_COMPACT_DIR,
+               use_engine: bool = True, preprocess: str = PREPROCESS_NONE,
+               chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = None) -> Dict[str, Any]:
+    """Скорит input_path и пишет row / keep_columns / prediction / error в output_path"""
+    workers = workers or os.cpu_count() or 1
+    keep_columns = [c for c in keep_columns if c != text_column]
+
+    print(f"🔄 Скоринг: {input_path} -> {output_path}")
+    print(f"   Колонка: {text_column}, предобработка: {preprocess}")
+    print(f"   Воркеров: {workers}, размер чанка: {chunk_size}")
+
+    writer = ChunkWriter(output_path)
+    start_time = time.perf_counter()
+    rows_read = 0
+    errors = 0
+    pending = deque()
+
+    def write_ready(max_pending: int):
+        nonlocal errors
+        # Пишем строго по порядку; если в работе больше max_pending чанков,
+        # ждем самый старый
+        while pending and (len(pending) > max_pending or pending[0][2].done()):
+            chunk, first_row, future = pending.popleft()
+            scored = future.result()
+            result = chunk[[c for c in keep_columns if c in chunk.columns]].copy()
+            result.insert(0, "row", np.arange(first_row, first_row + len(chunk)))
+            result["prediction"] = scored["prediction"]
+            result["error"] = scored["error"]
+            writer.write(result)
+            errors += int(pd.notna(scored["error"]).sum())
+
+            elapsed = time.perf_counter() - start_time
+            print(f"   {writer.rows_written} строк, {writer.rows_written / elapsed:.0f} строк/с")
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        # Офлайн запуск: пул создается из главного потока до других потоков,
+        # поэтому fork безопасен и не перезапускает модуль в каждом воркере
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_worker,
+        initargs=(model_path, vectorizer_path, compact_dir, use_engine, preprocess)
+    ) as pool:
+        try:
+            for chunk in iter_input_chunks(input_path, [text_column, *keep_columns], chunk_size):
+                if text_column not in chunk.columns:
+                    raise KeyError(f"Колонка {text_column} не найдена в {input_path}")
+                pending.append((chunk, rows_read, pool.submit(_score_chunk, chunk[text_column].tolist())))
+                rows_read += len(chunk)
+                write_ready(max_pending=workers * CHUNKS_IN_FLIGHT_PER_WORKER)
+            write_ready(max_pending=0)
+        finally:
+            writer.close()
+
+    elapsed = time.perf_counter() - start_time
+    stats = {
+        "rows": rows_read,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(rows_read / elapsed, 1) if elapsed else None,
+        "workers": workers
+    }
+    print(f"✅ Готово: {rows_read} строк за {stats['elapsed_s']} с ({stats['rows_per_s']} строк/с), ошибок: {errors}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн скоринг CSV/Parquet через ModelPredictor")
+    parser.add_argument("input", help="CSV или .parquet")
+    parser.add_argument("output", help="CSV или .parquet для предсказаний")
+    parser.add_argument("--column", default=DEFAULT_TEXT_COLUMN,
+                        help="Колонка с текстом (processed_text, processed_text_stemmed, text)")
+    parser.add_argument("--keep-columns", nargs="*", default=list(DEFAULT_KEEP_COLUMNS),
+                        help="Колонки входа, которые копируются в выход (если есть)")
+    parser.add_argument("--preprocess", default=PREPROCESS_NONE, choices=[PREPROCESS_NONE, "lemmatize", "stem"],
+                        help="Для processed_* колонок не нужна, для сырого текста - lemmatize")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--vectorizer", default=DEFAULT_VECTORIZER_PATH)
+    parser.add_argument("--compact-dir", default=DEFAULT_COMPACT_DIR)
+    parser.add_argument("--no-engine", action="store_true", help="Скоринг через sklearn вместо NumPy движка")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="Процессов (по умолчанию все ядра)")
+    args = parser.parse_args()
+
+    score_file(
+        args.input, args.output, text_column=args.column, keep_columns=args.keep_columns,
+        model_path=args.model, vectorizer_path=args.vectorizer, compact_dir=args.compact_dir or None,
+        use_engine=not args.no_engine, preprocess=args.preprocess,
+        chunk_size=args.chunk_size, workers=args.workers
+    )
+
+
+if __name__ == "__main__":
+    main()
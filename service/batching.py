@@ -0,0 +1,143 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from executors import QueueFullError
+from metrics import BATCH_SIZE
+
+# Значения по умолчанию для окна микробатчинга
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_MAX_QUEUE_SIZE = 1024
+
+
+class MicroBatcher:
+    """Динамический микробатчинг одиночных запросов.
+
+    Запросы, пришедшие в пределах окна max_wait_ms (но не больше
+    max_batch_size штук), склеиваются в один вызов batch_predict -
+    один transform и один predict на всю пачку. Каждый вызывающий
+    получает свой результат через собственный future.
+
+    batch_fn может быть как обычной функцией, так и корутиной
+    (например, InferenceExecutor.run_batch, чтобы не блокировать loop).
+    """
+
+    def __init__(self, batch_fn: Callable[[List[str]], Any],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.max_queue_size = max(1, int(max_queue_size))
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Простая статистика для мониторинга
+        self.batches_processed = 0
+        self.items_processed = 0
+
+    async def start(self):
+        """Запускает фоновую задачу, которая собирает батчи"""
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую задачу и отменяет ожидающие запросы"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, text: str) -> Dict[str, Any]:
+        """Ставит текст в очередь и ждет результат своего батча"""
+        if not self.is_running:
+            raise RuntimeError("MicroBatcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((text, future))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Batching queue is full ({self.max_queue_size})")
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Ждет первый запрос, затем добирает батч до лимита или конца окна"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Окно закрыто, но то, что уже лежит в очереди, забираем без ожидания
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Запросы, которые уже отменили (клиент отключился), не считаем
+            batch = [(text, future) for text, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            BATCH_SIZE.observe(len(texts), source="microbatch")
+            try:
+                results = await self._execute(texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches_processed += 1
+            self.items_processed += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def _execute(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Выполняет батч синхронной функцией или корутиной"""
+        result = self.batch_fn(texts)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": self.queue_depth,
+            "batches_processed": self.batches_processed,
+            "items_processed": self.items_processed,
+            "avg_batch_size": round(self.items_processed / self.batches_processed, 2)
+            if self.batches_processed else 0.0
+        }
@@ -1,52 +1,213 @@
 import bentoml
 import joblib
 import os
+import time
 import numpy as np
 from typing import List, Dict, Any
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+from prediction_cache import (
+    PredictionCache, artifact_fingerprint,
+    DEFAULT_CACHE_MAX_SIZE, DEFAULT_CACHE_TTL_SECONDS
+)
+from wire_format import (
+    FORMAT_JSON, UnsupportedMediaTypeError, negotiate, response_formats,
+    decode_body, dumps_json, encode_predictions
+)
 
 # Пути к моделям
 current_dir = os.path.dirname(os.path.abspath(__file__))
 model_path = os.path.join(current_dir, "models", "best_model.pkl")
 vectorizer_path = os.path.join(current_dir, "models", "tfidf_vectorizer.pkl")
 
+# Значения по умолчанию для адаптивного батчинга и воркеров BentoML
+DEFAULT_WORKERS = 1
+DEFAULT_THREADS = 4
+DEFAULT_MAX_CONCURRENCY = 64
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_LATENCY_MS = 20
+DEFAULT_WARMUP_ROUNDS = 3
+WARMUP_TEXTS = [
+    "Метро работает отлично!",
+    "Новая станция метро откроется в следующем году",
+    "На кольцевой линии ремонт, пассажиров просят заранее планировать пересадки",
+]
+
+# Настройки кэша и предобработки берем из того же конфига, что и FastAPI.
+# Параметры декораторов нужны при импорте, поэтому читается только YAML инференса
+try:
+    from config_loader import get_config
+    inference_config = get_config().get_inference_config()
+    cache_config = inference_config.get("cache", {})
+    preprocessing_config = inference_config.get("preprocessing", {})
+    bentoml_config = inference_config.get("bentoml", {})
+except Exception:
+    cache_config = {}
+    preprocessing_config = {}
+    bentoml_config = {}
+
+# Параметры декораторов читаются при импорте, поэтому конфиг нужен до класса
+batching_config = bentoml_config.get("batching", {})
+warmup_config = bentoml_config.get("warmup", {})
+BATCHING_ENABLED = batching_config.get("enabled", True)
+
+# Метрики попадают на встроенный /metrics BentoML (формат Prometheus)
+from metrics import LATENCY_BUCKETS, BATCH_SIZE_BUCKETS
+
+STAGE_SECONDS = bentoml.metrics.Histogram(
+    name="predictor_stage_duration_seconds",
+    documentation="Время стадий предсказания: preprocess, vectorize, predict, serialize",
+    labelnames=["stage"],
+    buckets=LATENCY_BUCKETS
+)
+BATCH_SIZE = bentoml.metrics.Histogram(
+    name="predictor_batch_size",
+    documentation="Размер батча, переданного в модель, по эндпоинту",
+    labelnames=["source"],
+    buckets=BATCH_SIZE_BUCKETS
+)
+# Счетчики суммируются по воркерам; долю попаданий считает запрос Prometheus по rate()
+CACHE_HITS = bentoml.metrics.Counter(
+    name="prediction_cache_hits_total",
+    documentation="Попаданий в кэш предсказаний"
+)
+CACHE_MISSES = bentoml.metrics.Counter(
+    name="prediction_cache_misses_total",
+    documentation="Промахов кэша предсказаний"
+)
+
+# Ответ @bentoml.api BentoML сериализует сам, поэтому batch с форматами
+# по Accept (MessagePack, float32, быстрый JSON) - в смонтированном приложении /wire
+wire_app = FastAPI(title="comment_predictor_batch wire formats")
+
 @bentoml.service(
     name="comment_predictor_batch",
-    version="1.0.0"
+    version="1.0.0",
+    workers=bentoml_config.get("workers", DEFAULT_WORKERS),
+    threads=bentoml_config.get("threads", DEFAULT_THREADS),
+    traffic={"concurrency": bentoml_config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)}
 )
+@bentoml.asgi_app(wire_app, path="/wire")
 class CommentPredictor:
     def __init__(self):
-        # Загружаем модели в конструкторе
+        # Модели и предобработка загружаются в воркере, а не при импорте модуля
+        start = time.perf_counter()
         self.model = joblib.load(model_path)
         self.vectorizer = joblib.load(vectorizer_path)
 
-    @bentoml.api
-    def predict(self, text: str) -> dict:
-        """Предсказание для одного текста"""
+        # Тот же кэш, что и в FastAPI сервисе
+        self.fingerprint = artifact_fingerprint(model_path, vectorizer_path)
+        self.cache = None
+        if cache_config.get("enabled", True):
+            self.cache = PredictionCache(
+                max_size=cache_config.get("max_size", DEFAULT_CACHE_MAX_SIZE),
+                ttl_seconds=cache_config.get("ttl_seconds", DEFAULT_CACHE_TTL_SECONDS)
+            )
+
+        self.preprocessor = None
+        if preprocessing_config.get("enabled", True):
+            try:
+                from text_preprocessing import TextPreprocessor, MODE_LEMMATIZE, DEFAULT_MEMO_SIZE
+            except ImportError:
+                print("⚠️ text_preprocessing не найден, тексты идут в векторайзер без предобработки")
+            else:
+                self.preprocessor = TextPreprocessor(
+                    mode=preprocessing_config.get("mode", MODE_LEMMATIZE),
+                    memo_size=preprocessing_config.get("memo_size", DEFAULT_MEMO_SIZE)
+                )
+        self.startup_timings = {"model_load_s": round(time.perf_counter() - start, 3)}
+
+        if warmup_config.get("enabled", True):
+            start = time.perf_counter()
+            self._warmup(warmup_config.get("rounds", DEFAULT_WARMUP_ROUNDS))
+            self.startup_timings["warmup_s"] = round(time.perf_counter() - start, 3)
+
+    def _warmup(self, rounds: int):
+        """Прогрев воркера до приема запросов (sklearn, pymorphy3, memo предобработки)"""
+        # Кэш предсказаний не трогаем, чтобы прогрев не влиял на его статистику
+        start = time.perf_counter()
+        for _ in range(max(0, int(rounds))):
+            self.model.predict(self._transform(WARMUP_TEXTS))
+        print(f"🔥 BentoML воркер прогрет за {(time.perf_counter() - start) * 1000:.1f} мс")
+
+    def _transform(self, texts: List[str]):
+        """Предобработка (как при обучении) и TF-IDF"""
+        if self.preprocessor is not None:
+            start = time.perf_counter()
+            texts = self.preprocessor.preprocess_batch(texts)
+            STAGE_SECONDS.labels(stage="preprocess").observe(time.perf_counter() - start)
+        start = time.perf_counter()
+        features = self.vectorizer.transform(texts)
+        STAGE_SECONDS.labels(stage="vectorize").observe(time.perf_counter() - start)
+        return features
+
+    def _model_predict(self, features) -> np.ndarray:
+        start = time.perf_counter()
+        predictions = self.model.predict(features)
+        STAGE_SECONDS.labels(stage="predict").observe(time.perf_counter() - start)
+        return predictions
+
+    def _predict_cached(self, texts: List[str]) -> np.ndarray:
+        """Предсказания с кэшем: модель вызывается только для промахов"""
+        if self.cache is None:
+            return self._model_predict(self._transform(texts))
+
+        predictions = np.zeros(len(texts), dtype=float)
+        keys = [self.cache.make_key(text, self.fingerprint) for text in texts]
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                predictions[i] = cached["prediction"]
+
+        if missing:
+            features = self._transform([texts[i] for i in missing])
+            for i, prediction in zip(missing, self._model_predict(features)):
+                predictions[i] = prediction
+                self.cache.put(keys[i], {"prediction": float(prediction)})
+        CACHE_HITS.inc(len(texts) - len(missing))
+        CACHE_MISSES.inc(len(missing))
+        return predictions
+
+    @bentoml.api(
+        batchable=BATCHING_ENABLED,
+        batch_dim=0,
+        max_batch_size=batching_config.get("max_batch_size", DEFAULT_MAX_BATCH_SIZE),
+        max_latency_ms=batching_config.get("max_latency_ms", DEFAULT_MAX_LATENCY_MS)
+    )
+    def predict(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Предсказание для текстов запроса: {"texts": ["..."]} -> [{...}].
+
+        BentoML адаптивно склеивает одновременные запросы в один вызов -
+        один transform и один predict на всю пачку в пределах max_latency_ms.
+        """
+        BATCH_SIZE.labels(source="predict").observe(len(texts))
         try:
-            features = self.vectorizer.transform([text])
-            prediction = self.model.predict(features)
-            return {
-                "prediction": float(prediction[0]),
-                "status": "success",
-                "type": "single"
-            }
+            predictions = self._predict_cached(texts)
+            start = time.perf_counter()
+            results = [
+                {"prediction": float(prediction), "status": "success", "type": "single"}
+                for prediction in predictions
+            ]
+            STAGE_SECONDS.labels(stage="serialize").observe(time.perf_counter() - start)
+            return results
         except Exception as e:
-            return {
-                "prediction": 0.0,
-                "error": str(e),
-                "status": "error",
-                "type": "single"
-            }
+            return [
+                {"prediction": 0.0, "error": str(e), "status": "error", "type": "single"}
+                for _ in texts
+            ]
 
     @bentoml.api
     def predict_batch(self, texts: List[str]) -> Dict[str, Any]:
         """Batch предсказание для списка текстов"""
+        BATCH_SIZE.labels(source="predict_batch").observe(len(texts))
         try:
-            # Преобразуем все тексты в фичи
-            features = self.vectorizer.transform(texts)
-
-            # Получаем предсказания для всего батча
-            predictions = self.model.predict(features)
+            # Получаем предсказания для всего батча (промахи кэша - одним transform)
+            predictions = self._predict_cached(texts)
 
             return {
                 "status": "success",
@@ -68,12 +229,45 @@ class CommentPredictor:
                 "predictions": []
             }
 
+    @wire_app.post("/predict_batch")
+    async def predict_batch_wire(self, request: Request):
+        """predict_batch с телом JSON / MessagePack и ответом по Accept.
+
+        JSON - {"predictions": [...]} через orjson, MessagePack -
+        {"predictions", "errors"}, application/x-float32 - сырой массив.
+        """
+        response_format = negotiate(request.headers.get("accept"))
+        if response_format is None:
+            raise HTTPException(status_code=406, detail=f"Supported response formats: {', '.join(response_formats())}")
+        try:
+            data = decode_body(await request.body(), request.headers.get("content-type"))
+        except UnsupportedMediaTypeError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Malformed request body: {e}")
+        texts = data.get("texts") if isinstance(data, dict) else None
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            raise HTTPException(status_code=400, detail="Expected {\"texts\": [str, ...]}")
+
+        BATCH_SIZE.labels(source="predict_batch").observe(len(texts))
+        predictions = await run_in_threadpool(self._predict_cached, texts)
+        start = time.perf_counter()
+        if response_format == FORMAT_JSON:
+            body, headers = dumps_json({"predictions": np.asarray(predictions, dtype=float).tolist()}), None
+        else:
+            body, headers = encode_predictions(predictions, {}, response_format)
+        STAGE_SECONDS.labels(stage="serialize").observe(time.perf_counter() - start)
+        return Response(content=body, media_type=response_format, headers=headers)
+
     @bentoml.api
     def health(self) -> dict:
         return {
             "status": "healthy",
             "model_loaded": True,
-            "supports_batch": True
+            "supports_batch": True,
+            "adaptive_batching": BATCHING_ENABLED,
+            "startup_timings": self.startup_timings,
+            "cache": self.cache.get_stats() if self.cache is not None else None
         }
 
 # Собираем сервис
@@ -0,0 +1,257 @@
+"""Компактный формат артефактов TF-IDF + линейной модели.
+
+Вместо pickle со словарем Python артефакты хранятся массивами NumPy:
+
+    meta.json    - параметры векторайзера, intercept, версия формата
+    terms.npy    - отсортированные термины (UTF-8, фиксированная ширина)
+    columns.npy  - номер колонки признака для каждого термина из terms.npy
+    idf.npy      - вектор IDF по колонкам
+    coef.npy     - коэффициенты линейной модели по колонкам
+
+Файлы .npy открываются через mmap, поэтому несколько воркеров uvicorn/BentoML
+на одной машине делят одни и те же страницы памяти, а старт не требует
+распаковки словаря и импорта sklearn.
+
+Экспорт и замер старта:
+    python compact_artifacts.py export --model models/best_model.pkl \\
+        --vectorizer models/tfidf_vectorizer.pkl --out models/compact
+    python compact_artifacts.py measure --model models/best_model.pkl \\
+        --vectorizer models/tfidf_vectorizer.pkl --compact-dir models/compact
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+ARRAY_FILES = ("terms", "columns", "idf", "coef")
+
+# Параметры TfidfVectorizer, которые влияют только на обучение и при
+# инференсе игнорируются; все остальные должны иметь значения по умолчанию
+_DEFAULT_TRANSFORM_PARAMS = {
+    "input": "content",
+    "encoding": "utf-8",
+    "decode_error": "strict",
+    "strip_accents": None,
+    "preprocessor": None,
+    "tokenizer": None,
+    "analyzer": "word",
+    "stop_words": None,
+    "binary": False,
+}
+
+
+def check_exportable(model, vectorizer):
+    """Проверяет, что пару можно без потерь перенести в компактный формат"""
+    if not hasattr(vectorizer, "vocabulary_") or not hasattr(vectorizer, "idf_"):
+        raise ValueError("Векторайзер должен быть обученным TfidfVectorizer")
+
+    params = vectorizer.get_params()
+    for name, expected in _DEFAULT_TRANSFORM_PARAMS.items():
+        if params.get(name, expected) != expected:
+            raise ValueError(f"Параметр векторайзера {name}={params[name]!r} не поддерживается")
+    if params.get("norm") not in (None, "l1", "l2"):
+        raise ValueError(f"Нормировка {params.get('norm')!r} не поддерживается")
+
+    coef = getattr(model, "coef_", None)
+    if coef is None or (np.ndim(coef) != 1 and np.shape(coef)[0] != 1):
+        raise ValueError(f"Модель {type(model).__name__} не является линейной регрессией с одним выходом")
+    if np.size(coef) != len(vectorizer.vocabulary_):
+        raise ValueError("Размерность модели не совпадает с размером словаря")
+
+
+def build_compact_arrays(model, vectorizer) -> tuple:
+    """Переводит обученную пару векторайзер + линейная модель в (meta, arrays)"""
+    check_exportable(model, vectorizer)
+    params = vectorizer.get_params()
+
+    # Сортируем по UTF-8 байтам - в том же порядке их сравнивает searchsorted
+    items = sorted((term.encode("utf-8"), column) for term, column in vectorizer.vocabulary_.items())
+    arrays = {
+        "terms": np.array([term for term, _ in items], dtype=np.bytes_),
+        "columns": np.array([column for _, column in items], dtype=np.int32),
+        "idf": np.asarray(vectorizer.idf_, dtype=np.float64),
+        "coef": np.ravel(model.coef_).astype(np.float64),
+    }
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "model_type": type(model).__name__,
+        "vectorizer_type": type(vectorizer).__name__,
+        "n_features": int(len(items)),
+        "intercept": float(np.ravel(getattr(model, "intercept_", 0.0))[0]),
+        "vectorizer": {
+            "lowercase": bool(params["lowercase"]),
+            "token_pattern": params["token_pattern"],
+            "ngram_range": list(params["ngram_range"]),
+            "norm": params["norm"],
+            "use_idf": bool(params["use_idf"]),
+            "sublinear_tf": bool(params["sublinear_tf"]),
+        },
+    }
+    return meta, arrays
+
+
+def export_compact_artifacts(model, vectorizer, out_dir: str,
+                             source_fingerprint: Optional[str] = None) -> Dict[str, Any]:
+    """Сохраняет обученную пару векторайзер + линейная модель в out_dir.
+
+    source_fingerprint - отпечаток исходных pickle: по нему загрузчик
+    понимает, что экспорт устарел после замены моделей.
+    """
+    meta, arrays = build_compact_arrays(model, vectorizer)
+    meta["source_fingerprint"] = source_fingerprint
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name in ARRAY_FILES:
+        np.save(os.path.join(out_dir, f"{name}.npy"), arrays[name])
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+class CompactArtifacts:
+    """Артефакты компактного формата, открытые через mmap"""
+
+    def __init__(self, path: str, meta: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.path = path
+        self.meta = meta
+        self.terms = arrays["terms"]
+        self.columns = arrays["columns"]
+        self.idf = arrays["idf"]
+        self.coef = arrays["coef"]
+        self.intercept = float(meta["intercept"])
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompactArtifacts":
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия формата: {meta.get('format_version')}")
+
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in ARRAY_FILES
+        }
+        return cls(path, meta, arrays)
+
+    @classmethod
+    def from_sklearn(cls, model, vectorizer) -> "CompactArtifacts":
+        """Те же массивы в памяти - без экспорта на диск"""
+        meta, arrays = build_compact_arrays(model, vectorizer)
+        return cls(None, meta, arrays)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return bool(path) and os.path.exists(os.path.join(path, META_FILE))
+
+    @property
+    def n_features(self) -> int:
+        return int(self.meta["n_features"])
+
+    @property
+    def vectorizer_params(self) -> Dict[str, Any]:
+        return self.meta["vectorizer"]
+
+    def lookup(self, terms: List[str]) -> np.ndarray:
+        """Номера колонок для терминов; -1 для терминов вне словаря"""
+        if not terms:
+            return np.empty(0, dtype=np.int64)
+
+        # В батче термины сильно повторяются - ищем каждый уникальный один раз
+        index: Dict[str, int] = {}
+        inverse = np.fromiter((index.setdefault(term, len(index)) for term in terms),
+                              dtype=np.int64, count=len(terms))
+        encoded = [term.encode("utf-8") for term in index]
+
+        # Термины длиннее самого длинного в словаре точно отсутствуют,
+        # а при приведении к dtype словаря они бы обрезались и могли совпасть
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        fits = lengths <= self.terms.dtype.itemsize
+        keys = np.array(encoded, dtype=self.terms.dtype)
+
+        positions = np.searchsorted(self.terms, keys)
+        positions = np.minimum(positions, len(self.terms) - 1)
+        found = fits & (self.terms[positions] == keys)
+        unique_columns = np.where(found, self.columns[positions], -1).astype(np.int64)
+        return unique_columns[inverse]
+
+
+def _measure_in_subprocess(code: str) -> Dict[str, Any]:
+    """Запускает загрузку в чистом процессе и возвращает время и пиковый RSS"""
+    script = (
+        "import json, resource, time\n"
+        "start = time.perf_counter()\n"
+        f"{code}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024\n"
+        "print(json.dumps({'load_time_ms': round(elapsed * 1000, 1), 'peak_rss_mb': round(rss_mb, 1)}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_startup(model_path: str, vectorizer_path: str, compact_dir: str) -> Dict[str, Any]:
+    """Сравнивает холодный старт pickle и компактного формата"""
+    pickle_stats = _measure_in_subprocess(
+        "import joblib\n"
+        f"model = joblib.load({os.path.abspath(model_path)!r})\n"
+        f"vectorizer = joblib.load({os.path.abspath(vectorizer_path)!r})"
+    )
+    compact_stats = _measure_in_subprocess(
+        "from compact_artifacts import CompactArtifacts\n"
+        f"artifacts = CompactArtifacts.load({os.path.abspath(compact_dir)!r})"
+    )
+    return {"pickle": pickle_stats, "compact": compact_stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Компактные артефакты модели")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Экспорт pickle -> компактный формат")
+    export_parser.add_argument("--model", required=True)
+    export_parser.add_argument("--vectorizer", required=True)
+    export_parser.add_argument("--out", required=True)
+
+    measure_parser = subparsers.add_parser("measure", help="Сравнение старта pickle и компактного формата")
+    measure_parser.add_argument("--model", required=True)
+    measure_parser.add_argument("--vectorizer", required=True)
+    measure_parser.add_argument("--compact-dir", required=True)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        import joblib
+        from prediction_cache import artifact_fingerprint
+        from scoring_engine import LinearTfidfEngine, check_parity
+
+        model = joblib.load(args.model)
+        vectorizer = joblib.load(args.vectorizer)
+        meta = export_compact_artifacts(
+            model, vectorizer, args.out,
+            source_fingerprint=artifact_fingerprint(args.model, args.vectorizer)
+        )
+        print(f"✅ Экспортировано в {args.out}: {meta['n_features']} признаков, модель {meta['model_type']}")
+
+        # Экспорт без проверки паритета с sklearn в сервис не пускаем
+        engine = LinearTfidfEngine(CompactArtifacts.load(args.out))
+        max_diff = check_parity(engine, model, vectorizer)
+        print(f"✅ Паритет с sklearn: max |Δ| = {max_diff:.2e}")
+    else:
+        stats = measure_startup(args.model, args.vectorizer, args.compact_dir)
+        print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+# Значения по умолчанию для пулов инференса
+DEFAULT_THREAD_WORKERS = 4
+DEFAULT_PROCESS_WORKERS = 0
+DEFAULT_PROCESS_BATCH_THRESHOLD = 256
+DEFAULT_MAX_QUEUE_DEPTH = 64
+
+# Пул процессов создается из работающего многопоточного процесса: модель
+# загружается в потоке, а после reload пул пересоздается под нагрузкой, когда
+# блокировки кэша, индекса почти одинаковых текстов и BLAS могут быть
+# захвачены другими потоками. Дочерний процесс после fork унаследовал бы их
+# и мог зависнуть, поэтому воркеры порождаются forkserver (из чистого
+# однопоточного процесса, модуль приложения импортируется в нем один раз).
+PROCESS_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class QueueFullError(Exception):
+    """Очередь инференса переполнена - запрос нужно отклонить (HTTP 503)"""
+
+
+# Предиктор внутри процесса пула: загружается один раз на воркер
+_worker_predictor = None
+
+
+def _init_process_worker(model_path: str, vectorizer_path: str, predictor_kwargs: Dict[str, Any],
+                         cache_settings: Optional[Dict[str, Any]] = None,
+                         near_duplicate_settings: Optional[Dict[str, Any]] = None):
+    global _worker_predictor
+    from predictor import ModelPredictor
+    from prediction_cache import PredictionCache
+    if cache_settings is not None:
+        # У каждого воркера свой кэш: блокировки между процессами не передаются
+        predictor_kwargs = {**predictor_kwargs, "cache": PredictionCache(**cache_settings)}
+    if near_duplicate_settings is not None:
+        from near_duplicates import NearDuplicateIndex
+        predictor_kwargs = {**predictor_kwargs, "near_duplicates": NearDuplicateIndex(**near_duplicate_settings)}
+    _worker_predictor = ModelPredictor(model_path, vectorizer_path, **predictor_kwargs)
+
+
+def _process_batch_predict(texts: List[str]) -> List[Dict[str, Any]]:
+    return _worker_predictor.batch_predict(texts)
+
+
+def _process_batch_predict_array(texts: List[str]):
+    return _worker_predictor.batch_predict_array(texts)
+
+
+def _process_worker_ready() -> int:
+    return os.getpid()
+
+
+class InferenceExecutor:
+    """Выполняет CPU-bound инференс вне event loop.
+
+    Небольшие запросы идут в пул потоков с общим предиктором, большие
+    батчи - в пул процессов, где каждый воркер держит свою копию модели.
+    Количество одновременно принятых задач ограничено max_queue_depth:
+    сверх лимита бросается QueueFullError.
+    """
+
+    def __init__(self, predictor, thread_workers: int = DEFAULT_THREAD_WORKERS,
+                 process_workers: int = DEFAULT_PROCESS_WORKERS,
+                 process_batch_threshold: int = DEFAULT_PROCESS_BATCH_THRESHOLD,
+                 max_queue_depth: int = DEFAULT_MAX_QUEUE_DEPTH):
+        self.predictor = predictor
+        self.thread_workers = max(1, int(thread_workers))
+        self.process_workers = max(0, int(process_workers))
+        self.process_batch_threshold = max(1, int(process_batch_threshold))
+        self.max_queue_depth = max(1, int(max_queue_depth))
+
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self.rejected = 0
+
+    def start(self):
+        """Создает пулы; пул процессов сразу прогревается, чтобы модель загрузилась заранее"""
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.thread_workers, thread_name_prefix="inference"
+            )
+        if self.process_workers and self._process_pool is None:
+            self._process_pool = self._create_process_pool()
+            for _ in range(self.process_workers):
+                self._process_pool.submit(_process_worker_ready)
+
+    def _create_process_pool(self) -> ProcessPoolExecutor:
+        cache = self.predictor.cache
+        cache_settings = None
+        if cache is not None:
+            cache_settings = {"max_size": cache.max_size, "ttl_seconds": cache.ttl_seconds}
+        index = self.predictor.near_duplicates
+        near_duplicate_settings = None
+        if index is not None:
+            near_duplicate_settings = {
+                "threshold": index.threshold, "num_perm": index.hasher.num_perm,
+                "shingle_size": index.hasher.shingle_size, "min_tokens": index.min_tokens,
+                "max_size": index.max_size, "ttl_seconds": index.ttl_seconds,
+                "bands": index.bands, "seed": index.hasher.seed
+            }
+        return ProcessPoolExecutor(
+            max_workers=self.process_workers,
+            mp_context=multiprocessing.get_context(PROCESS_START_METHOD),
+            initializer=_init_process_worker,
+            initargs=(
+                self.predictor.model_path,
+                self.predictor.vectorizer_path,
+                {
+                    "batch_chunk_size": self.predictor.batch_chunk_size,
+                    "preprocessor": self.predictor.preprocessor,
+                    "compact_dir": self.predictor.compact_dir,
+                    "use_engine": self.predictor.use_engine,
+                    "engine_max_batch": self.predictor.engine_max_batch
+                },
+                cache_settings,
+                near_duplicate_settings,
+            ),
+        )
+
+    def restart_process_pool(self):
+        """Пересоздает пул процессов под текущую модель предиктора (после reload).
+
+        Новый пул загружает модель до подмены; задачи в старом пуле
+        дорабатывают на старой модели, после чего его процессы завершаются.
+        Блокирует вызывающий поток, из event loop вызывать через executor.
+        """
+        if self._process_pool is None:
+            return
+        new_pool = self._create_process_pool()
+        ready = [new_pool.submit(_process_worker_ready) for _ in range(self.process_workers)]
+        for future in ready:
+            future.result()
+        old_pool, self._process_pool = self._process_pool, new_pool
+        old_pool.shutdown(wait=False)
+
+    def shutdown(self):
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._in_flight
+
+    def _acquire(self):
+        # Вызывается только из event loop, поэтому блокировка не нужна
+        if self._in_flight >= self.max_queue_depth:
+            self.rejected += 1
+            raise QueueFullError(
+                f"Inference queue is full ({self._in_flight}/{self.max_queue_depth})"
+            )
+        self._in_flight += 1
+
+    def _release(self):
+        self._in_flight -= 1
+
+    async def run_predict(self, text: str, predictor=None) -> Dict[str, Any]:
+        """Предсказание для одного текста в пуле потоков.
+
+        predictor - другая модель реестра; по умолчанию основная.
+        """
+        if self._thread_pool is None:
+            self.start()
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._thread_pool, (predictor or self.predictor).predict, text)
+        finally:
+            self._release()
+
+    async def run_batch(self, texts: List[str], predictor=None) -> List[Dict[str, Any]]:
+        """Batch предсказание: большие батчи основной модели уходят в пул процессов"""
+        return await self._run_batch(texts, predictor, "batch_predict", _process_batch_predict)
+
+    async def run_batch_array(self, texts: List[str], predictor=None) -> Tuple[Any, Dict[int, str]]:
+        """Batch предсказание массивом и ошибками по индексам (для бинарных ответов)"""
+        return await self._run_batch(texts, predictor, "batch_predict_array", _process_batch_predict_array)
+
+    async def _run_batch(self, texts: List[str], predictor, method: str, process_fn):
+        if self._thread_pool is None:
+            self.start()
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            if predictor is not None and predictor is not self.predictor:
+                # В воркерах пула процессов только основная модель
+                return await loop.run_in_executor(self._thread_pool, getattr(predictor, method), texts)
+            if self._process_pool is not None and len(texts) >= self.process_batch_threshold:
+                return await loop.run_in_executor(self._process_pool, process_fn, texts)
+            return await loop.run_in_executor(self._thread_pool, getattr(self.predictor, method), texts)
+        finally:
+            self._release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "thread_workers": self.thread_workers,
+            "process_workers": self.process_workers,
+            "process_batch_threshold": self.process_batch_threshold,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_depth": self._in_flight,
+            "rejected": self.rejected
+        }
@@ -1,59 +1,17 @@
 import gradio as gr
-import requests
-import time
-import json
-
-class MLServiceClient:
-    def __init__(self):
-        self.fastapi_url = "http://localhost:8000"
-        self.bentoml_url = "http://localhost:3000"
-
-    def predict_fastapi_single(self, text):
-        try:
-            start = time.time()
-            response = requests.post(f"{self.fastapi_url}/predict", json={"text": text}, timeout=5)
-            latency = round((time.time() - start) * 1000, 1)
-            return {**response.json(), "service": "FastAPI", "type": "single", "latency_ms": latency} if response.status_code == 200 else {"error": f"HTTP {response.status_code}", "service": "FastAPI"}
-        except Exception as e:
-            return {"error": str(e), "service": "FastAPI"}
-
-    def predict_bentoml_single(self, text):
-        try:
-            start = time.time()
-            response = requests.post(f"{self.bentoml_url}/predict", data=text, headers={"Content-Type": "text/plain"}, timeout=5)
-            if response.status_code != 200:
-                response = requests.post(f"{self.bentoml_url}/predict", json={"text": text}, timeout=5)
-            latency = round((time.time() - start) * 1000, 1)
-            return {**response.json(), "latency_ms": latency, "service": "BentoML"} if response.status_code == 200 else {"error": f"HTTP {response.status_code}: {response.text[:100]}", "service": "BentoML"}
-        except Exception as e:
-            return {"error": str(e), "service": "BentoML"}
-
-    def predict_fastapi_batch(self, texts):
-        try:
-            start = time.time()
-            response = requests.post(f"{self.fastapi_url}/predict/batch", json={"texts": texts}, timeout=10)
-            latency = round((time.time() - start) * 1000, 1)
-            return {**response.json(), "service": "FastAPI", "type": "batch", "latency_ms": latency, "texts_count": len(texts)} if response.status_code == 200 else {"error": f"HTTP {response.status_code}", "service": "FastAPI"}
-        except Exception as e:
-            return {"error": str(e), "service": "FastAPI"}
-
-    def predict_bentoml_batch(self, texts):
-        try:
-            start = time.time()
-            response = requests.post(f"{self.bentoml_url}/predict_batch", json={"texts": texts}, timeout=10)
-            latency = round((time.time() - start) * 1000, 1)
-            return {**response.json(), "service": "BentoML", "type": "batch", "latency_ms": latency, "texts_count": len(texts)} if response.status_code == 200 else {"error": f"HTTP {response.status_code}", "service": "BentoML"}
-        except Exception as e:
-            return {"error": str(e), "service": "BentoML"}
-
-client = MLServiceClient()
+
+from ml_client import MLClient, ServiceError, SERVICE_FASTAPI, SERVICE_BENTOML
+
+# Один клиент на все обработчики: соединения с сервисами переиспользуются
+client = MLClient(timeout_s=10)
 
 def test_single_prediction(text):
     if not text.strip():
         return {}, {}, {}
 
-    fastapi_result = client.predict_fastapi_single(text)
-    bentoml_result = client.predict_bentoml_single(text)
+    # Оба сервиса опрашиваются одновременно
+    results = client.predict_all(text)
+    fastapi_result, bentoml_result = results[SERVICE_FASTAPI], results[SERVICE_BENTOML]
 
     fast_lat = fastapi_result.get("latency_ms", float('inf'))
     bento_lat = bentoml_result.get("latency_ms", float('inf'))
@@ -76,8 +34,8 @@ def test_batch_prediction(texts_input):
     if len(texts) < 2:
         return {"error": "Нужно минимум 2 текста"}, {"error": "Нужно минимум 2 текста"}, {}
 
-    fastapi_result = client.predict_fastapi_batch(texts)
-    bentoml_result = client.predict_bentoml_batch(texts)
+    results = client.predict_batch_all(texts)
+    fastapi_result, bentoml_result = results[SERVICE_FASTAPI], results[SERVICE_BENTOML]
 
     fast_lat = fastapi_result.get("latency_ms", 0)
     bento_lat = bentoml_result.get("latency_ms", 0)
@@ -173,26 +131,19 @@ with gr.Blocks(title="ML Services Comparison") as demo:
             gr.Markdown("## 🩺 Проверка сервисов")
 
             def check_services():
-                results = {"FastAPI": {"status": "❌ Недоступен"}, "BentoML": {"status": "🔧 Проверяется при запросах", "urls": {"single_predict": "POST http://localhost:3000/predict", "batch_predict": "POST http://localhost:3000/predict_batch"}}}
-
-                try:
-                    resp = requests.get("http://localhost:8000/health", timeout=3)
-                    results["FastAPI"] = {"status": "✅ Доступен" if resp.status_code == 200 else "❌ Ошибка", "code": resp.status_code, "docs": "http://localhost:8000/docs"}
-                except:
-                    pass
-
-                try:
-                    import socket
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(2)
-                    result = sock.connect_ex(('localhost', 3000))
-                    sock.close()
-                    results["BentoML"]["port_check"] = "✅ Порт 3000 открыт" if result == 0 else "❌ Порт 3000 закрыт"
-                except:
-                    results["BentoML"]["port_check"] = "⚠️ Не удалось проверить порт"
-
+                results = {}
+                for service, name in ((SERVICE_FASTAPI, "FastAPI"), (SERVICE_BENTOML, "BentoML")):
+                    try:
+                        results[name] = {"status": "✅ Доступен", "health": client.health(service)}
+                    except ServiceError as e:
+                        results[name] = {"status": "❌ Недоступен", "error": str(e)}
+                results["BentoML"]["bentoml_format"] = client.bentoml_format or "определится при первом запросе"
                 return results
 
+            check_btn = gr.Button("🩺 Проверить сервисы")
+            check_result = gr.JSON(label="Состояние сервисов")
+            check_btn.click(check_services, outputs=check_result)
+
             gr.Markdown("### 📋 Примеры batch запросов:")
             gr.Markdown("""
             ```bash
@@ -206,10 +157,10 @@ with gr.Blocks(title="ML Services Comparison") as demo:
               -H "Content-Type: application/json" \\
               -d '{"texts": ["Текст 1", "Текст 2", "Текст 3"]}'
 
-            # BentoML single (text/plain)
+            # BentoML single (адаптивный батчинг на сервере)
             curl -X POST http://localhost:3000/predict \\
-              -H "Content-Type: text/plain" \\
-              -d "Текст для предсказания"
+              -H "Content-Type: application/json" \\
+              -d '{"texts": ["Текст для предсказания"]}'
             ```
             """)
 
@@ -0,0 +1,388 @@
+"""Клиент сервисов предсказания комментариев (FastAPI и BentoML).
+
+Синхронный MLClient и асинхронный AsyncMLClient с одинаковым API:
+    - соединения держатся в пуле httpx (keep-alive) на все время жизни клиента
+    - формат тела BentoML /predict определяется первым запросом и запоминается
+    - predict_all / predict_batch_all опрашивают несколько сервисов одновременно
+    - predict_batch режет большие батчи на чанки и шлет их параллельно
+    - batch_format выбирает формат ответов batch: JSON, MessagePack или float32
+
+С batch_format MessagePack или float32 predictions в ответе predict_batch -
+список чисел, а ошибки - отдельно в errors {индекс: текст}.
+
+Пример:
+    with MLClient() as client:
+        client.predict("Метро работает отлично!")
+        client.predict_batch(texts, service=SERVICE_BENTOML)
+        client.predict_all("Метро работает отлично!")  # {"fastapi": {...}, "bentoml": {...}}
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+from wire_format import FORMAT_JSON, FORMAT_MSGPACK, dumps_json, encode_body, decode_predictions
+
+DEFAULT_FASTAPI_URL = "http://localhost:8000"
+DEFAULT_BENTOML_URL = "http://localhost:3000"
+DEFAULT_TIMEOUT_S = 10.0
+DEFAULT_MAX_CONNECTIONS = 20
+# Текстов в одном запросе batch (как batch.chunk_size в inference_config.yaml)
+DEFAULT_MAX_BATCH_SIZE = 1024
+# Чанков одного batch в полете одновременно
+DEFAULT_MAX_CONCURRENCY = 4
+
+SERVICE_FASTAPI = "fastapi"
+SERVICE_BENTOML = "bentoml"
+SERVICES = (SERVICE_FASTAPI, SERVICE_BENTOML)
+SERVICE_NAMES = {SERVICE_FASTAPI: "FastAPI", SERVICE_BENTOML: "BentoML"}
+
+# Форматы тела BentoML /predict: текущий батчевый {"texts": [...]} -> [{...}]
+# и старый {"text": "..."} -> {...} (сервисы, собранные до адаптивного батчинга)
+BENTOML_FORMAT_TEXTS = "texts"
+BENTOML_FORMAT_TEXT = "text"
+BENTOML_FORMATS = (BENTOML_FORMAT_TEXTS, BENTOML_FORMAT_TEXT)
+# Так BentoML и FastAPI отвечают на тело не той схемы
+FORMAT_MISMATCH_STATUSES = (400, 422)
+
+
+class ServiceError(Exception):
+    """Сервис ответил ошибкой или недоступен"""
+
+    def __init__(self, service: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"{SERVICE_NAMES.get(service, service)}: {message}")
+        self.service = service
+        self.status_code = status_code
+
+
+def chunked(items: Sequence, size: int) -> List[Sequence]:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+class _BaseClient:
+    """Общая часть клиентов: адреса, запросы и разбор ответов без I/O"""
+
+    def __init__(self, fastapi_url: str = DEFAULT_FASTAPI_URL, bentoml_url: str = DEFAULT_BENTOML_URL,
+                 timeout_s: float = DEFAULT_TIMEOUT_S, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 batch_format: str = FORMAT_JSON):
+        self.urls = {SERVICE_FASTAPI: fastapi_url.rstrip("/"), SERVICE_BENTOML: bentoml_url.rstrip("/")}
+        self.timeout_s = timeout_s
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.batch_format = batch_format
+        # Формат BentoML /predict после первого удачного запроса; None - еще не известен
+        self.bentoml_format: Optional[str] = None
+
+    def _url(self, service: str, path: str) -> str:
+        if service not in self.urls:
+            raise ValueError(f"Unknown service '{service}', expected one of {SERVICES}")
+        return self.urls[service] + path
+
+    def _bentoml_formats(self) -> Sequence[str]:
+        return (self.bentoml_format,) if self.bentoml_format else BENTOML_FORMATS
+
+    @staticmethod
+    def _single_request(service: str, text: str, model_type: Optional[str], bentoml_format: str):
+        """Путь и тело запроса одного предсказания"""
+        if service == SERVICE_BENTOML:
+            body = {"texts": [text]} if bentoml_format == BENTOML_FORMAT_TEXTS else {"text": text}
+            return "/predict", body
+        body = {"text": text}
+        if model_type is not None:
+            body["model_type"] = model_type
+        return "/predict", body
+
+    def _batch_request(self, service: str, texts: List[str], model_type: Optional[str]):
+        """Путь и параметры httpx запроса batch в формате batch_format"""
+        body = {"texts": list(texts)}
+        if service == SERVICE_FASTAPI and model_type is not None:
+            body["model_type"] = model_type
+        if self.batch_format == FORMAT_JSON:
+            path = "/predict_batch" if service == SERVICE_BENTOML else "/predict/batch"
+            return path, {"content": dumps_json(body), "headers": {"Content-Type": FORMAT_JSON}}
+        # Бинарные ответы BentoML отдает смонтированное приложение /wire
+        path = "/wire/predict_batch" if service == SERVICE_BENTOML else "/predict/batch"
+        request_format = FORMAT_MSGPACK if self.batch_format == FORMAT_MSGPACK else FORMAT_JSON
+        return path, {
+            "content": encode_body(body, request_format),
+            "headers": {"Content-Type": request_format, "Accept": self.batch_format}
+        }
+
+    @staticmethod
+    def _check(service: str, response: httpx.Response):
+        if response.status_code != 200:
+            raise ServiceError(service, f"HTTP {response.status_code}: {response.text[:200]}", response.status_code)
+
+    @staticmethod
+    def _parse_single(service: str, data, bentoml_format: str) -> Dict[str, Any]:
+        if service == SERVICE_BENTOML and bentoml_format == BENTOML_FORMAT_TEXTS:
+            data = data[0]
+        if data.get("error"):
+            raise ServiceError(service, data["error"])
+        return data
+
+    def _parse_batch(self, service: str, response: httpx.Response):
+        """Предсказания чанка и ошибки по индексам.
+
+        JSON - список {'prediction': ..., ...} в одном виде для обоих
+        сервисов, бинарные форматы - список чисел и словарь ошибок.
+        """
+        if self.batch_format != FORMAT_JSON:
+            return decode_predictions(response.content, self.batch_format)
+        data = response.json()
+        if data.get("status") == "error":
+            raise ServiceError(service, data.get("error", "batch failed"))
+        predictions = data["predictions"]
+        if service == SERVICE_BENTOML:
+            return [{"prediction": float(prediction)} for prediction in predictions], {}
+        return predictions, {}
+
+    def _merge_chunks(self, service: str, results, chunks: int, start: float) -> Dict[str, Any]:
+        predictions, errors = [], {}
+        for chunk_predictions, chunk_errors in results:
+            errors.update((len(predictions) + i, error) for i, error in chunk_errors.items())
+            predictions.extend(chunk_predictions)
+        result = self._batch_result(service, predictions, chunks, start)
+        if self.batch_format != FORMAT_JSON:
+            result["errors"] = errors
+        return result
+
+    @staticmethod
+    def _single_result(service: str, result: Dict[str, Any], start: float) -> Dict[str, Any]:
+        return {
+            **result,
+            "service": SERVICE_NAMES[service],
+            "type": "single",
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    @staticmethod
+    def _batch_result(service: str, predictions: List[Dict[str, Any]], chunks: int, start: float) -> Dict[str, Any]:
+        return {
+            "predictions": predictions,
+            "service": SERVICE_NAMES[service],
+            "type": "batch",
+            "texts_count": len(predictions),
+            "chunks": chunks,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    @staticmethod
+    def _error_result(service: str, error: Exception) -> Dict[str, Any]:
+        return {"error": str(error), "service": SERVICE_NAMES.get(service, service)}
+
+
+class MLClient(_BaseClient):
+    """Синхронный клиент; потокобезопасен, один экземпляр на приложение"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._http = httpx.Client(timeout=self.timeout_s, limits=self.limits)
+        # Отдельные пулы: запрос к сервису ждет своих чанков и не должен занимать их потоки
+        self._services_pool = ThreadPoolExecutor(max_workers=len(SERVICES) * self.max_concurrency,
+                                                 thread_name_prefix="ml-client")
+        self._chunks_pool = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                               thread_name_prefix="ml-client-chunk")
+        self._format_lock = threading.Lock()
+
+    def close(self):
+        self._services_pool.shutdown(wait=False)
+        self._chunks_pool.shutdown(wait=False)
+        self._http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _send(self, service: str, path: str, request: Dict[str, Any]) -> httpx.Response:
+        try:
+            response = self._http.post(self._url(service, path), **request)
+        except httpx.HTTPError as e:
+            raise ServiceError(service, str(e)) from e
+        self._check(service, response)
+        return response
+
+    def _post(self, service: str, path: str, body: Dict[str, Any]):
+        return self._send(service, path, {"json": body}).json()
+
+    def _post_single(self, service: str, text: str, model_type: Optional[str]):
+        if service != SERVICE_BENTOML or self.bentoml_format:
+            bentoml_format = self.bentoml_format
+            path, body = self._single_request(service, text, model_type, bentoml_format)
+            return self._parse_single(service, self._post(service, path, body), bentoml_format)
+
+        # Формат определяется один раз: параллельные первые запросы ждут первого
+        with self._format_lock:
+            error = None
+            for bentoml_format in self._bentoml_formats():
+                path, body = self._single_request(service, text, model_type, bentoml_format)
+                try:
+                    data = self._post(service, path, body)
+                except ServiceError as e:
+                    if e.status_code not in FORMAT_MISMATCH_STATUSES:
+                        raise
+                    error = e
+                    continue
+                self.bentoml_format = bentoml_format
+                return self._parse_single(service, data, bentoml_format)
+            raise error
+
+    def predict(self, text: str, service: str = SERVICE_FASTAPI, model_type: Optional[str] = None) -> Dict[str, Any]:
+        """Предсказание для одного текста; ошибки - ServiceError"""
+        start = time.perf_counter()
+        return self._single_result(service, self._post_single(service, text, model_type), start)
+
+    def predict_batch(self, texts: List[str], service: str = SERVICE_FASTAPI,
+                      model_type: Optional[str] = None) -> Dict[str, Any]:
+        """Batch предсказание; больше max_batch_size текстов - несколько запросов параллельно"""
+        start = time.perf_counter()
+        chunks = chunked(list(texts), self.max_batch_size)
+
+        def post_chunk(chunk):
+            path, request = self._batch_request(service, chunk, model_type)
+            return self._parse_batch(service, self._send(service, path, request))
+
+        if len(chunks) == 1:
+            results = [post_chunk(chunks[0])]
+        else:
+            results = list(self._chunks_pool.map(post_chunk, chunks))
+        return self._merge_chunks(service, results, len(chunks), start)
+
+    def predict_all(self, text: str, services: Sequence[str] = SERVICES,
+                    model_type: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Один текст во все сервисы одновременно; ошибка сервиса - {'error': ...} в его ответе"""
+        return self._fan_out(services, lambda service: self.predict(text, service, model_type))
+
+    def predict_batch_all(self, texts: List[str], services: Sequence[str] = SERVICES,
+                          model_type: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        return self._fan_out(services, lambda service: self.predict_batch(texts, service, model_type))
+
+    def _fan_out(self, services: Sequence[str], call) -> Dict[str, Dict[str, Any]]:
+        futures = {service: self._services_pool.submit(call, service) for service in services}
+        results = {}
+        for service, future in futures.items():
+            try:
+                results[service] = future.result()
+            except ServiceError as e:
+                results[service] = self._error_result(service, e)
+        return results
+
+    def health(self, service: str = SERVICE_FASTAPI) -> Dict[str, Any]:
+        """Состояние сервиса (у BentoML health - это POST API)"""
+        try:
+            if service == SERVICE_BENTOML:
+                response = self._http.post(self._url(service, "/health"), json={})
+            else:
+                response = self._http.get(self._url(service, "/health"))
+        except httpx.HTTPError as e:
+            raise ServiceError(service, str(e)) from e
+        self._check(service, response)
+        return response.json()
+
+
+class AsyncMLClient(_BaseClient):
+    """Асинхронный клиент для asyncio; один экземпляр на event loop"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._http = httpx.AsyncClient(timeout=self.timeout_s, limits=self.limits)
+        self._format_lock = asyncio.Lock()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _send(self, service: str, path: str, request: Dict[str, Any]) -> httpx.Response:
+        try:
+            response = await self._http.post(self._url(service, path), **request)
+        except httpx.HTTPError as e:
+            raise ServiceError(service, str(e)) from e
+        self._check(service, response)
+        return response
+
+    async def _post(self, service: str, path: str, body: Dict[str, Any]):
+        return (await self._send(service, path, {"json": body})).json()
+
+    async def _post_single(self, service: str, text: str, model_type: Optional[str]):
+        if service != SERVICE_BENTOML or self.bentoml_format:
+            bentoml_format = self.bentoml_format
+            path, body = self._single_request(service, text, model_type, bentoml_format)
+            return self._parse_single(service, await self._post(service, path, body), bentoml_format)
+
+        async with self._format_lock:
+            error = None
+            for bentoml_format in self._bentoml_formats():
+                path, body = self._single_request(service, text, model_type, bentoml_format)
+                try:
+                    data = await self._post(service, path, body)
+                except ServiceError as e:
+                    if e.status_code not in FORMAT_MISMATCH_STATUSES:
+                        raise
+                    error = e
+                    continue
+                self.bentoml_format = bentoml_format
+                return self._parse_single(service, data, bentoml_format)
+            raise error
+
+    async def predict(self, text: str, service: str = SERVICE_FASTAPI,
+                      model_type: Optional[str] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        return self._single_result(service, await self._post_single(service, text, model_type), start)
+
+    async def predict_batch(self, texts: List[str], service: str = SERVICE_FASTAPI,
+                            model_type: Optional[str] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        chunks = chunked(list(texts), self.max_batch_size)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def post_chunk(chunk):
+            async with semaphore:
+                path, request = self._batch_request(service, chunk, model_type)
+                return self._parse_batch(service, await self._send(service, path, request))
+
+        results = await asyncio.gather(*(post_chunk(chunk) for chunk in chunks))
+        return self._merge_chunks(service, results, len(chunks), start)
+
+    async def predict_all(self, text: str, services: Sequence[str] = SERVICES,
+                          model_type: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        return await self._fan_out(services, lambda service: self.predict(text, service, model_type))
+
+    async def predict_batch_all(self, texts: List[str], services: Sequence[str] = SERVICES,
+                                model_type: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        return await self._fan_out(services, lambda service: self.predict_batch(texts, service, model_type))
+
+    async def _fan_out(self, services: Sequence[str], call) -> Dict[str, Dict[str, Any]]:
+        outcomes = await asyncio.gather(*(call(service) for service in services), return_exceptions=True)
+        results = {}
+        for service, outcome in zip(services, outcomes):
+            if isinstance(outcome, ServiceError):
+                results[service] = self._error_result(service, outcome)
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results[service] = outcome
+        return results
+
+    async def health(self, service: str = SERVICE_FASTAPI) -> Dict[str, Any]:
+        try:
+            if service == SERVICE_BENTOML:
+                response = await self._http.post(self._url(service, "/health"), json={})
+            else:
+                response = await self._http.get(self._url(service, "/health"))
+        except httpx.HTTPError as e:
+            raise ServiceError(service, str(e)) from e
+        self._check(service, response)
+        return response.json()
@@ -0,0 +1,231 @@
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# Значения по умолчанию для реестра моделей
+DEFAULT_MAX_MEMORY_MB = 2048
+
+
+class ModelNotFoundError(KeyError):
+    """Модели с таким именем нет в реестре (HTTP 400)"""
+
+
+class ModelTooLargeError(Exception):
+    """Модель не помещается в лимит памяти (HTTP 503)"""
+
+
+class ModelUnavailableError(Exception):
+    """Модель не удалось загрузить (HTTP 503)"""
+
+
+class SharedArtifacts:
+    """Пул одинаковых векторайзеров и SVD между моделями реестра.
+
+    Ключ - joblib.hash содержимого, поэтому одинаковые векторайзеры из
+    разных файлов (ridge_vectorizer.pkl и tfidf_vectorizer.pkl) хранятся
+    в памяти один раз. Ссылки слабые: артефакт живет, пока его держит
+    хотя бы одна загруженная модель.
+    """
+
+    def __init__(self):
+        self._artifacts = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def share(self, artifact):
+        import joblib
+        key = f"{type(artifact).__name__}:{joblib.hash(artifact)}"
+        with self._lock:
+            existing = self._artifacts.get(key)
+            if existing is not None:
+                self.shared += 1
+                print(f"♻️ {type(artifact).__name__} уже загружен другой моделью, используем общий")
+                return existing
+            self._artifacts[key] = artifact
+            return artifact
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"artifacts": len(self._artifacts), "shared": self.shared}
+
+
+class ModelSpec:
+    """Описание модели реестра из секции registry.models конфига"""
+
+    def __init__(self, name: str, model_path: str, vectorizer_path: Optional[str] = None,
+                 compact_dir: Optional[str] = None, preprocessing: Optional[str] = None,
+                 max_memory_mb: Optional[float] = None, use_engine: bool = True):
+        self.name = name
+        self.model_path = model_path
+        # None - векторайзер внутри pickle модели ({'vectorizer', 'svd', 'model'})
+        self.vectorizer_path = vectorizer_path
+        self.compact_dir = compact_dir
+        # Режим TextPreprocessor (lemmatize/stem), "none" - без предобработки, None - как у основной модели
+        self.preprocessing = preprocessing
+        self.max_memory_mb = max_memory_mb
+        self.use_engine = use_engine
+
+    @classmethod
+    def from_config(cls, name: str, config: Dict[str, Any]) -> "ModelSpec":
+        return cls(
+            name=name,
+            model_path=config["model_path"],
+            vectorizer_path=config.get("vectorizer_path"),
+            compact_dir=config.get("compact_dir"),
+            preprocessing=config.get("preprocessing"),
+            max_memory_mb=config.get("max_memory_mb"),
+            use_engine=config.get("use_engine", True)
+        )
+
+    def estimate_bytes(self) -> int:
+        """Оценка памяти модели по размеру файлов артефактов.
+
+        Оценка грубая (pickle в памяти обычно больше файла), но позволяет
+        отказать в загрузке до того, как модель окажется в памяти.
+        Общие векторайзеры считаются у каждой модели - с запасом.
+        """
+        total = 0
+        for path in (self.model_path, self.vectorizer_path):
+            if path and os.path.exists(path):
+                total += os.path.getsize(path)
+        return total
+
+
+class ModelRegistry:
+    """Несколько моделей в одном процессе с ленивой загрузкой и LRU выгрузкой.
+
+    Закрепленные модели (основная модель сервиса) загружены всегда.
+    Остальные загружаются при первом запросе через predictor_factory
+    и выгружаются в порядке давности использования, когда сумма оценок
+    памяти превышает max_memory_mb. Загрузка блокирует вызывающий поток,
+    из event loop get() вызывать через executor.
+    """
+
+    def __init__(self, specs: Dict[str, ModelSpec], predictor_factory: Callable[[ModelSpec], Any],
+                 pinned: Optional[Dict[str, Any]] = None, max_memory_mb: float = DEFAULT_MAX_MEMORY_MB,
+                 artifact_pool: Optional[SharedArtifacts] = None):
+        self.specs = dict(specs)
+        self.predictor_factory = predictor_factory
+        self.pinned = dict(pinned or {})
+        self.max_memory_mb = float(max_memory_mb)
+        self.artifact_pool = artifact_pool
+
+        # Имя -> предиктор; порядок - от давно использованных к недавним
+        self._loaded: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # Загрузки идут по одной, но попадания в уже загруженные модели не ждут их
+        self._load_lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.load_errors = 0
+
+    @property
+    def names(self):
+        return sorted(set(self.pinned) | set(self.specs))
+
+    @property
+    def loaded_count(self) -> int:
+        return len(self._loaded)
+
+    def _pinned_bytes(self) -> int:
+        return sum(self.specs[name].estimate_bytes() for name in self.pinned if name in self.specs)
+
+    def _lookup(self, name: str):
+        with self._lock:
+            predictor = self._loaded.get(name)
+            if predictor is not None:
+                self._loaded.move_to_end(name)
+                self._last_used[name] = time.time()
+            return predictor
+
+    def get(self, name: str):
+        """Предиктор модели; незагруженная модель загружается в текущем потоке"""
+        predictor = self.pinned.get(name)
+        if predictor is not None:
+            return predictor
+        predictor = self._lookup(name)
+        if predictor is not None:
+            return predictor
+
+        spec = self.specs.get(name)
+        if spec is None:
+            raise ModelNotFoundError(f"Unknown model '{name}', available: {', '.join(self.names)}")
+
+        with self._load_lock:
+            # Пока ждали, модель мог загрузить другой запрос
+            predictor = self._lookup(name)
+            if predictor is not None:
+                return predictor
+
+            size = spec.estimate_bytes()
+            if spec.max_memory_mb is not None and size > spec.max_memory_mb * 1024 * 1024:
+                raise ModelTooLargeError(
+                    f"Model '{name}' needs ~{size / 1024 / 1024:.0f} MB, limit {spec.max_memory_mb} MB"
+                )
+            self._evict_for(name, size)
+
+            print(f"📦 Загружаю модель '{name}' по запросу")
+            try:
+                predictor = self.predictor_factory(spec)
+            except Exception as e:
+                self.load_errors += 1
+                raise ModelUnavailableError(f"Model '{name}' failed to load: {e}") from e
+            if not predictor.is_loaded:
+                self.load_errors += 1
+                raise ModelUnavailableError(f"Model '{name}' failed to load")
+
+            with self._lock:
+                self._loaded[name] = predictor
+                self._sizes[name] = size
+                self._last_used[name] = time.time()
+                self.loads += 1
+            return predictor
+
+    def _evict_for(self, name: str, size: int):
+        """Выгружает давно неиспользуемые модели, пока новая не поместится"""
+        budget = self.max_memory_mb * 1024 * 1024 - self._pinned_bytes()
+        if size > budget:
+            # Не поместится, даже если выгрузить все - остальные модели не трогаем
+            raise ModelTooLargeError(
+                f"Model '{name}' needs ~{size / 1024 / 1024:.0f} MB, "
+                f"registry limit {self.max_memory_mb:.0f} MB"
+            )
+        with self._lock:
+            while self._loaded and sum(self._sizes.values()) + size > budget:
+                evicted, _ = self._loaded.popitem(last=False)
+                self._sizes.pop(evicted, None)
+                self._last_used.pop(evicted, None)
+                self.evictions += 1
+                print(f"🗑️ Выгружаю модель '{evicted}' (давно не использовалась)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = set(self._loaded)
+            sizes = dict(self._sizes)
+            last_used = dict(self._last_used)
+        models = {}
+        for name in self.names:
+            spec = self.specs.get(name)
+            pinned = self.pinned.get(name)
+            models[name] = {
+                "loaded": name in loaded or (pinned is not None and pinned.is_loaded),
+                "pinned": pinned is not None,
+                "estimated_mb": round((sizes.get(name) or (spec.estimate_bytes() if spec else 0)) / 1024 / 1024, 1),
+                "last_used": last_used.get(name)
+            }
+        stats = {
+            "models": models,
+            "memory_used_mb": round((sum(sizes.values()) + self._pinned_bytes()) / 1024 / 1024, 1),
+            "max_memory_mb": self.max_memory_mb,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "load_errors": self.load_errors
+        }
+        if self.artifact_pool is not None:
+            stats["shared_artifacts"] = self.artifact_pool.get_stats()
+        return stats
@@ -0,0 +1,89 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Значения по умолчанию для отслеживания файлов модели
+DEFAULT_POLL_INTERVAL_S = 5.0
+
+FileState = Tuple[Tuple[str, Optional[int], Optional[int]], ...]
+
+
+def file_state(paths: List[str]) -> FileState:
+    """mtime и размер файлов; отсутствующий файл - (None, None)"""
+    state = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            state.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            state.append((path, None, None))
+    return tuple(state)
+
+
+class ModelFileWatcher:
+    """Следит за файлами модели и вызывает перезагрузку при их изменении.
+
+    Файлы опрашиваются раз в poll_interval_s. Перезагрузка запускается,
+    только когда изменившиеся файлы не менялись еще один интервал - так
+    недописанный pickle (docker cp, rsync) не попадет в загрузку.
+    Отсутствующие файлы перезагрузку не запускают.
+    """
+
+    def __init__(self, paths_fn: Callable[[], List[str]], reload_fn: Callable[[], Awaitable[Any]],
+                 poll_interval_s: float = DEFAULT_POLL_INTERVAL_S):
+        # Пути берутся на каждом опросе: после reload с новыми путями следим за ними
+        self.paths_fn = paths_fn
+        self.reload_fn = reload_fn
+        self.poll_interval_s = max(0.1, float(poll_interval_s))
+        self._worker: Optional[asyncio.Task] = None
+        self.reloads_triggered = 0
+        self.last_error: Optional[str] = None
+
+    async def start(self):
+        if self._worker is not None:
+            return
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def _run(self):
+        current = file_state(self.paths_fn())
+        pending = None
+        while True:
+            await asyncio.sleep(self.poll_interval_s)
+            state = file_state(self.paths_fn())
+            if state == current or any(mtime is None for _, mtime, _ in state):
+                pending = None
+                continue
+            if state != pending:
+                # Файлы изменились - ждем, пока запись закончится
+                pending = state
+                continue
+
+            pending = None
+            self.reloads_triggered += 1
+            print(f"👀 Файлы модели изменились, перезагружаю")
+            try:
+                await self.reload_fn()
+                self.last_error = None
+            except Exception as e:
+                # Старая модель продолжает работать; повторим при следующем изменении
+                self.last_error = str(e)
+                print(f"❌ Перезагрузка не удалась: {e}")
+            current = file_state(self.paths_fn())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._worker is not None and not self._worker.done(),
+            "poll_interval_s": self.poll_interval_s,
+            "reloads_triggered": self.reloads_triggered,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Значения по умолчанию для кэша предсказаний
+DEFAULT_CACHE_MAX_SIZE = 10000
+DEFAULT_CACHE_TTL_SECONDS = 3600
+
+
+def normalize_text(text: str) -> str:
+    """Нормализует текст для ключа кэша: регистр и пробелы не влияют на TF-IDF"""
+    return " ".join(text.lower().split())
+
+
+def artifact_fingerprint(*paths: str) -> str:
+    """Отпечаток файлов модели: меняется при любой подмене артефактов"""
+    digest = hashlib.md5()
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Потокобезопасный LRU кэш предсказаний с TTL.
+
+    Ключ - хэш нормализованного текста вместе с отпечатком модели, поэтому
+    после смены артефактов старые записи не могут быть выданы. Кэш общий
+    для моделей реестра: namespace записи (отпечаток модели) позволяет
+    сбросить записи одной модели, не трогая остальные.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_MAX_SIZE,
+                 ttl_seconds: Optional[float] = DEFAULT_CACHE_TTL_SECONDS):
+        self.max_size = max(1, int(max_size))
+        self.ttl_seconds = float(ttl_seconds) if ttl_seconds else None
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(text: str, fingerprint: str) -> str:
+        payload = f"{fingerprint}\x00{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Dict[str, Any], namespace: Optional[str] = None):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (expires_at, value, namespace)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, namespace: Optional[str] = None):
+        """Сбрасывает записи namespace (например, после перезагрузки модели); None - все"""
+        with self._lock:
+            if namespace is None:
+                self._data.clear()
+            else:
+                for key in [key for key, entry in self._data.items() if entry[2] == namespace]:
+                    del self._data[key]
+            self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
@@ -1,16 +1,162 @@
 import joblib
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional, Tuple
 import time
 import os
+import threading
+from contextlib import nullcontext
+
+from metrics import observe_stage
+from profiling import SamplingProfiler
+from prediction_cache import PredictionCache, artifact_fingerprint
+from compact_artifacts import CompactArtifacts, check_exportable
+from scoring_engine import LinearTfidfEngine
+
+# Размер чанка для batch предсказаний по умолчанию
+DEFAULT_BATCH_CHUNK_SIZE = 1024
+# Батчи больше этого считает sklearn, если pickle доступны: движок держит все
+# термины батча в памяти, и на длинных текстах vectorizer.transform обгоняет
+# его уже с нескольких сотен текстов (benchmarks/bench_predictor.py)
+DEFAULT_ENGINE_MAX_BATCH = 256
+# Прогрев новой модели перед подменой
+DEFAULT_WARMUP_ROUNDS = 3
+WARMUP_TEXTS = [
+    "Метро работает отлично!",
+    "Новая станция метро откроется в следующем году",
+    "На кольцевой линии ремонт, пассажиров просят заранее планировать пересадки",
+]
+
+
+class ReloadInProgressError(Exception):
+    """Перезагрузка модели уже идет - вторую параллельно не запускаем"""
+
+
+class LoadedModel:
+    """Загруженная пара модель + векторайзер (или NumPy движок).
+
+    Между векторайзером и моделью может стоять SVD (RandomForest и
+    нейросеть из ноутбука). Запрос берет ссылку на объект один раз и
+    работает с ней до конца, поэтому подмена модели в ModelPredictor
+    не затрагивает запросы в работе.
+
+    Если есть и движок, и sklearn, батчи до engine_max_batch текстов идут
+    в движок, большие - в sklearn. Модель из компактных артефактов читает
+    pickle через sklearn_loader при первом большом батче; без pickle
+    большие батчи считает движок порциями по engine_max_batch.
+    """
+
+    def __init__(self, model_path: str, vectorizer_path: Optional[str], compact_dir: Optional[str],
+                 fingerprint: str, model=None, vectorizer=None,
+                 engine: Optional[LinearTfidfEngine] = None, svd=None,
+                 engine_max_batch: int = DEFAULT_ENGINE_MAX_BATCH,
+                 sklearn_loader: Optional[Callable[[], Tuple[Any, Any]]] = None):
+        self.model_path = model_path
+        self.vectorizer_path = vectorizer_path
+        self.compact_dir = compact_dir
+        self.fingerprint = fingerprint
+        self.model = model
+        self.vectorizer = vectorizer
+        self.engine = engine
+        self.svd = svd
+        self.engine_max_batch = max(1, int(engine_max_batch))
+        self._sklearn_loader = sklearn_loader
+        self._sklearn_lock = threading.Lock()
+        # Keras возвращает (n, 1) и без verbose=0 печатает прогресс на каждый вызов
+        self.is_keras = type(model).__module__.startswith(("keras", "tensorflow"))
+
+    @property
+    def model_type(self) -> Optional[str]:
+        if self.engine is not None:
+            return self.engine.artifacts.meta["model_type"]
+        return type(self.model).__name__ if self.model is not None else None
+
+    @property
+    def n_features(self) -> Optional[int]:
+        if self.engine is not None:
+            return self.engine.n_features
+        if hasattr(self.vectorizer, 'vocabulary_'):
+            return len(self.vectorizer.vocabulary_)
+        return getattr(self.vectorizer, 'n_features', None)
+
+    @property
+    def has_sklearn(self) -> bool:
+        return self.model is not None and self.vectorizer is not None
+
+    def _ensure_sklearn(self) -> bool:
+        """Загружает pickle для больших батчей (один раз); False - их нет"""
+        if self.has_sklearn or self._sklearn_loader is None:
+            return self.has_sklearn
+        with self._sklearn_lock:
+            if self._sklearn_loader is not None:
+                try:
+                    model, vectorizer = self._sklearn_loader()
+                    self.vectorizer, self.model = vectorizer, model
+                    print(f"✅ Для батчей больше {self.engine_max_batch} текстов загружен sklearn")
+                except Exception as e:
+                    print(f"⚠️ sklearn для больших батчей недоступен, считает движок: {e}")
+                self._sklearn_loader = None
+        return self.has_sklearn
+
+    def uses_engine(self, n_texts: int) -> bool:
+        """Движок для небольших батчей, sklearn - для больших, если он есть"""
+        if self.engine is None:
+            return False
+        return n_texts <= self.engine_max_batch or not self._ensure_sklearn()
+
+    def vectorize(self, texts: List[str]):
+        if self.uses_engine(len(texts)):
+            return self.engine.vectorize(texts)
+        features = self.vectorizer.transform(texts)
+        if self.svd is not None:
+            features = self.svd.transform(features)
+        return features
+
+    def predict_features(self, features, n_texts: int) -> np.ndarray:
+        if isinstance(features, tuple):
+            # (doc, column, value) из engine.vectorize
+            return self.engine.score(features, n_texts)
+        if self.is_keras:
+            return np.asarray(self.model.predict(features, verbose=0)).reshape(-1)
+        return self.model.predict(features)
+
+    def score(self, texts: List[str]) -> np.ndarray:
+        return self.predict_features(self.vectorize(texts), len(texts))
+
 
 class ModelPredictor:
-    def __init__(self, model_path: str, vectorizer_path: str):
+    def __init__(self, model_path: str, vectorizer_path: Optional[str],
+                 batch_chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE,
+                 cache: Optional[PredictionCache] = None,
+                 preprocessor=None,
+                 compact_dir: Optional[str] = None,
+                 use_engine: bool = True,
+                 profiler: Optional[SamplingProfiler] = None,
+                 artifact_pool=None,
+                 near_duplicates=None,
+                 engine_max_batch: int = DEFAULT_ENGINE_MAX_BATCH):
         self.model_path = model_path
         self.vectorizer_path = vectorizer_path
-        self.model = None
-        self.vectorizer = None
-        self.is_loaded = False
+        # NumPy движок вместо sklearn для пар TF-IDF + линейная модель
+        self.compact_dir = compact_dir
+        self.use_engine = use_engine
+        # Батчи больше этого считает sklearn (см. LoadedModel)
+        self.engine_max_batch = max(1, int(engine_max_batch))
+        self.batch_chunk_size = max(1, int(batch_chunk_size))
+        self.cache = cache
+        # Предобработка как при обучении (processed_text); None - текст идет в векторайзер как есть
+        self.preprocessor = preprocessor
+        # Семплирующий профилер живых запросов; включается через /admin/profiler
+        self.profiler = profiler
+        # Общий пул векторайзеров и SVD реестра моделей (model_registry.SharedArtifacts)
+        self.artifact_pool = artifact_pool
+        # MinHash/LSH индекс недавних текстов (near_duplicates.NearDuplicateIndex): почти
+        # одинаковый текст получает сохраненное предсказание с флагом approximate
+        self.near_duplicates = near_duplicates
+        # Текущая модель; подменяется целиком одним присваиванием в reload()
+        self._loaded: Optional[LoadedModel] = None
+        self._reload_lock = threading.Lock()
+        self.reloads = 0
+        self.last_reload: Optional[Dict[str, Any]] = None
         
         print(f"🔄 Инициализация предиктора:")
         print(f"   Путь к модели: {model_path}")
@@ -21,51 +167,309 @@ class ModelPredictor:
     def load(self) -> bool:
         """Загружает модель и векторайзер"""
         try:
-            print(f"🔍 Загружаю модель...")
-            self.model = joblib.load(self.model_path)
-            print(f"✅ Модель загружена")
+            previous = self._loaded
+            self._loaded = self._load_artifacts(self.model_path, self.vectorizer_path, self.compact_dir)
             
-            print(f"🔍 Загружаю векторайзер...")
-            self.vectorizer = joblib.load(self.vectorizer_path)
-            print(f"✅ Векторайзер загружен")
+            # Новые артефакты - новый отпечаток, старые записи кэша больше не валидны.
+            # Кэш может быть общим с другими моделями реестра, поэтому сбрасываются
+            # только записи прежнего отпечатка
+            if previous is not None and previous.fingerprint != self._loaded.fingerprint:
+                self._invalidate(previous.fingerprint)
             
-            self.is_loaded = True
             print(f"🎯 Модель готова к работе!")
-            print(f"   Тип модели: {type(self.model).__name__}")
-            print(f"   Размер словаря: {len(self.vectorizer.vocabulary_) if hasattr(self.vectorizer, 'vocabulary_') else 'N/A'}")
+            print(f"   Тип модели: {self.model_type}")
+            print(f"   Движок: {'numpy' if self.engine is not None else 'sklearn'}")
+            print(f"   Размер словаря: {self.n_features}")
             return True
         except Exception as e:
             print(f"❌ Ошибка загрузки модели: {e}")
-            self.is_loaded = False
+            self._loaded = None
             return False
     
+    def reload(self, model_path: Optional[str] = None, vectorizer_path: Optional[str] = None,
+               compact_dir: Optional[str] = None, warmup_rounds: int = DEFAULT_WARMUP_ROUNDS) -> Dict[str, Any]:
+        """Загружает новую пару в текущем потоке и подменяет ею текущую.
+
+        Пока идет загрузка и прогрев, запросы обслуживает старая модель.
+        Подмена - одно присваивание ссылки: запросы в работе дорабатывают
+        на старой модели, новые сразу идут в новую. При ошибке загрузки
+        или прогрева исключение пробрасывается, старая модель остается.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgressError("Model reload is already in progress")
+        try:
+            model_path = model_path or self.model_path
+            vectorizer_path = vectorizer_path or self.vectorizer_path
+            for path in (model_path, vectorizer_path):
+                if path and not os.path.exists(path):
+                    raise FileNotFoundError(f"Model artifact not found: {path}")
+            if compact_dir is None:
+                compact_dir = self._inherited_compact_dir(model_path, vectorizer_path)
+            else:
+                compact_dir = compact_dir or None
+            start_time = time.perf_counter()
+            
+            print(f"🔄 Перезагрузка модели: {model_path}")
+            loaded = self._load_artifacts(model_path, vectorizer_path, compact_dir)
+            self._warmup(loaded, warmup_rounds)
+            
+            previous = self._loaded
+            self._loaded = loaded
+            self.model_path, self.vectorizer_path, self.compact_dir = model_path, vectorizer_path, compact_dir
+            # Ключи кэша содержат отпечаток, старые записи только занимают место;
+            # записи других моделей реестра в общем кэше остаются
+            if previous is not None and previous.fingerprint != loaded.fingerprint:
+                self._invalidate(previous.fingerprint)
+            
+            self.reloads += 1
+            self.last_reload = {
+                "model_type": loaded.model_type,
+                "model_path": model_path,
+                "vectorizer_path": vectorizer_path,
+                "fingerprint": loaded.fingerprint,
+                "previous_fingerprint": previous.fingerprint if previous is not None else None,
+                "engine": "numpy" if loaded.engine is not None else "sklearn",
+                "reload_time_ms": round((time.perf_counter() - start_time) * 1000, 2),
+                "reloaded_at": time.time()
+            }
+            print(f"✅ Модель заменена за {self.last_reload['reload_time_ms']:.0f} мс: {loaded.fingerprint}")
+            return self.last_reload
+        finally:
+            self._reload_lock.release()
+    
+    def _inherited_compact_dir(self, model_path: str, vectorizer_path: Optional[str]) -> Optional[str]:
+        """Текущий compact_dir, только если он собран из новых pickle.
+
+        Иначе при перезагрузке на другую пару продолжили бы работать старые
+        компактные артефакты под новым путем модели.
+        """
+        if not vectorizer_path or not CompactArtifacts.exists(self.compact_dir):
+            return None
+        meta = CompactArtifacts.load(self.compact_dir).meta
+        if meta.get("source_fingerprint") != artifact_fingerprint(model_path, vectorizer_path):
+            print(f"⚠️ {self.compact_dir} не соответствует новым pickle, загружаю pickle")
+            return None
+        return self.compact_dir
+    
+    @property
+    def is_reloading(self) -> bool:
+        return self._reload_lock.locked()
+    
+    def warmup(self, rounds: int = DEFAULT_WARMUP_ROUNDS) -> float:
+        """Прогрев текущей модели до приема запросов; возвращает время в мс"""
+        start_time = time.perf_counter()
+        if self._loaded is not None:
+            self._warmup(self._loaded, rounds)
+        return (time.perf_counter() - start_time) * 1000
+    
+    def _warmup(self, loaded: LoadedModel, rounds: int):
+        """Прогрев новой модели до подмены; заодно проверка, что она считает"""
+        prepared = [self._prepare(text) for text in WARMUP_TEXTS]
+        predictions = None
+        for _ in range(max(1, int(rounds))):
+            predictions = loaded.score(prepared)
+        if len(predictions) != len(prepared) or not np.all(np.isfinite(predictions)):
+            raise ValueError("Warmup produced invalid predictions")
+    
+    def _load_artifacts(self, model_path: str, vectorizer_path: Optional[str],
+                        compact_dir: Optional[str]) -> LoadedModel:
+        if self.use_engine and self._compact_is_usable(model_path, vectorizer_path, compact_dir):
+            return self._load_compact(model_path, vectorizer_path, compact_dir)
+        return self._load_pickles(model_path, vectorizer_path, compact_dir)
+    
+    @staticmethod
+    def _compact_is_usable(model_path: str, vectorizer_path: Optional[str], compact_dir: Optional[str]) -> bool:
+        """Компактные артефакты есть и соответствуют текущим pickle"""
+        if not vectorizer_path or not CompactArtifacts.exists(compact_dir):
+            return False
+        if not (os.path.exists(model_path) and os.path.exists(vectorizer_path)):
+            return True
+        
+        meta = CompactArtifacts.load(compact_dir).meta
+        if meta.get("source_fingerprint") != artifact_fingerprint(model_path, vectorizer_path):
+            print(f"⚠️ Компактные артефакты устарели относительно pickle, загружаю pickle")
+            return False
+        return True
+    
+    def _load_compact(self, model_path: str, vectorizer_path: str, compact_dir: str) -> LoadedModel:
+        print(f"🔍 Загружаю компактные артефакты (mmap): {compact_dir}")
+        artifacts = CompactArtifacts.load(compact_dir)
+        fingerprint = artifacts.meta.get("source_fingerprint") or artifact_fingerprint(
+            *(os.path.join(compact_dir, name) for name in sorted(os.listdir(compact_dir)))
+        )
+        print(f"✅ Компактные артефакты загружены")
+        
+        # Pickle совпадают с артефактами (проверено в _compact_is_usable), но читаются
+        # только при первом большом батче, чтобы не замедлять старт
+        sklearn_loader = None
+        if os.path.exists(model_path) and os.path.exists(vectorizer_path):
+            def sklearn_loader():
+                vectorizer = self._load_vectorizer(vectorizer_path)
+                if self.artifact_pool is not None:
+                    vectorizer = self.artifact_pool.share(vectorizer)
+                return self._load_model(model_path), vectorizer
+        return LoadedModel(model_path, vectorizer_path, compact_dir, fingerprint,
+                           engine=LinearTfidfEngine(artifacts), engine_max_batch=self.engine_max_batch,
+                           sklearn_loader=sklearn_loader)
+    
+    def _load_pickles(self, model_path: str, vectorizer_path: Optional[str],
+                      compact_dir: Optional[str]) -> LoadedModel:
+        print(f"🔍 Загружаю модель...")
+        model = self._load_model(model_path)
+        vectorizer, svd = None, None
+        if isinstance(model, dict):
+            # Пайплайн из ноутбука: {'vectorizer', 'svd', 'model'}
+            vectorizer, svd, model = model.get("vectorizer"), model.get("svd"), model["model"]
+        print(f"✅ Модель загружена")
+        
+        if vectorizer_path:
+            print(f"🔍 Загружаю векторайзер...")
+            vectorizer_obj = self._load_vectorizer(vectorizer_path)
+            if isinstance(vectorizer_obj, dict):
+                # Предобработка нейросети: {'vectorizer', 'svd'}
+                vectorizer, svd = vectorizer_obj["vectorizer"], vectorizer_obj.get("svd")
+            else:
+                vectorizer = vectorizer_obj
+            print(f"✅ Векторайзер загружен")
+        if vectorizer is None:
+            raise ValueError(f"No vectorizer for model {model_path}")
+        
+        # Одинаковые векторайзеры разных моделей держим в памяти один раз
+        if self.artifact_pool is not None:
+            vectorizer = self.artifact_pool.share(vectorizer)
+            if svd is not None:
+                svd = self.artifact_pool.share(svd)
+        
+        fingerprint = artifact_fingerprint(*(path for path in (model_path, vectorizer_path) if path))
+        
+        # Если пара поддерживается, считаем тем же NumPy движком прямо из памяти
+        engine = None
+        if self.use_engine and svd is None:
+            try:
+                check_exportable(model, vectorizer)
+                engine = LinearTfidfEngine(CompactArtifacts.from_sklearn(model, vectorizer))
+            except ValueError as e:
+                print(f"ℹ️ NumPy движок недоступен для этих артефактов: {e}")
+        return LoadedModel(model_path, vectorizer_path, compact_dir, fingerprint,
+                           model=model, vectorizer=vectorizer, engine=engine, svd=svd,
+                           engine_max_batch=self.engine_max_batch)
+    
+    @staticmethod
+    def _load_model(path: str):
+        """Pickle модели (или пайплайна) либо Keras .h5/.keras"""
+        if path.endswith((".h5", ".keras")):
+            try:
+                from tensorflow import keras
+            except ImportError as e:
+                raise ImportError("Keras models require tensorflow (see requirements-dev.txt)") from e
+            return keras.models.load_model(path, compile=False)
+        return joblib.load(path)
+    
+    @staticmethod
+    def _load_vectorizer(path: str):
+        """Pickle векторайзера или .npz признаков с хэшированием (без словаря)"""
+        if path.endswith(".npz"):
+            from hashing_features import HashingTfidfFeaturizer
+            return HashingTfidfFeaturizer.load(path)
+        return joblib.load(path)
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded is not None
+    
+    @property
+    def model(self):
+        return self._loaded.model if self._loaded is not None else None
+    
+    @property
+    def vectorizer(self):
+        return self._loaded.vectorizer if self._loaded is not None else None
+    
+    @property
+    def engine(self) -> Optional[LinearTfidfEngine]:
+        return self._loaded.engine if self._loaded is not None else None
+    
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return self._loaded.fingerprint if self._loaded is not None else None
+    
+    @property
+    def model_type(self) -> Optional[str]:
+        return self._loaded.model_type if self._loaded is not None else None
+    
+    @property
+    def n_features(self) -> Optional[int]:
+        return self._loaded.n_features if self._loaded is not None else None
+    
+    @staticmethod
+    def _score(texts: List[str], loaded: LoadedModel) -> np.ndarray:
+        """Предсказания для уже предобработанных текстов (со временем стадий)"""
+        step = len(texts)
+        if loaded.uses_engine(len(texts)):
+            # Без sklearn большой батч идет в движок порциями: его память растет с батчем
+            step = loaded.engine_max_batch
+        predictions = []
+        for start in range(0, len(texts), max(1, step)):
+            part = texts[start:start + step]
+            with observe_stage("vectorize"):
+                features = loaded.vectorize(part)
+            with observe_stage("predict"):
+                predictions.append(loaded.predict_features(features, len(part)))
+        return np.concatenate(predictions) if predictions else np.zeros(0)
+    
+    def _profiled(self):
+        return self.profiler.track() if self.profiler is not None else nullcontext()
+    
     def predict(self, text: str) -> Dict[str, Any]:
         """Делает предсказание для одного текста"""
-        start_time = time.time()
+        with self._profiled():
+            return self._predict_single(text)
+    
+    def _predict_single(self, text: str, loaded: Optional[LoadedModel] = None) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        # Одна модель на весь запрос, даже если ее подменят посередине
+        loaded = loaded or self._loaded
         
-        if not self.is_loaded:
+        if loaded is None:
             return {
                 "prediction": 0.0,
                 "error": "Model not loaded",
                 "processing_time_ms": 0
             }
         
+        cache_key = None
+        if self.cache is not None and isinstance(text, str):
+            cache_key = self.cache.make_key(text, loaded.fingerprint)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return self._from_cache(cached, start_time)
+        
+        signature = None
+        if self.near_duplicates is not None and isinstance(text, str):
+            similar, signature = self._lookup_near_duplicate(text, loaded)
+            if similar is not None:
+                return self._from_cache(similar, start_time)
+        
         try:
-            # Преобразуем текст в фичи
-            features = self.vectorizer.transform([text])
-            
-            # Делаем предсказание
-            prediction = float(self.model.predict(features)[0])
+            # Преобразуем текст в фичи и делаем предсказание
+            with observe_stage("preprocess"):
+                prepared = self._prepare(text)
+            prediction = float(self._score([prepared], loaded)[0])
             
             # Время обработки
-            processing_time = (time.time() - start_time) * 1000
+            processing_time = (time.perf_counter() - start_time) * 1000
             
-            return {
+            result = {
                 "prediction": prediction,
                 "processing_time_ms": round(processing_time, 2),
-                "features_count": features.shape[1],
+                "features_count": loaded.n_features,
                 "error": None
             }
+            if cache_key is not None:
+                self.cache.put(cache_key, dict(result), loaded.fingerprint)
+            if signature is not None:
+                self.near_duplicates.add(signature, dict(result), loaded.fingerprint)
+            return result
             
         except Exception as e:
             return {
@@ -74,26 +478,222 @@ class ModelPredictor:
                 "error": str(e)
             }
     
-    def batch_predict(self, texts: list) -> list:
-        """Предсказание для нескольких текстов"""
-        return [self.predict(text) for text in texts]
+    def batch_predict(self, texts: list, chunk_size: Optional[int] = None) -> list:
+        """Предсказание для нескольких текстов.
+
+        Тексты обрабатываются чанками: на каждый чанк строится одна
+        разреженная матрица и делается один вызов model.predict, поэтому
+        память ограничена размером чанка, а не всего запроса.
+        """
+        with self._profiled():
+            return self._batch_predict(texts, chunk_size)
+    
+    def batch_predict_array(self, texts: list, chunk_size: Optional[int] = None) -> Tuple[np.ndarray, Dict[int, str]]:
+        """Batch предсказание без словаря на каждый текст.
+
+        Возвращает float64 массив предсказаний (0.0 на месте ошибок) и
+        ошибки по индексам - для бинарных ответов /predict/batch.
+        """
+        with self._profiled():
+            loaded = self._loaded
+            if loaded is None:
+                return np.zeros(len(texts)), {i: "Model not loaded" for i in range(len(texts))}
+            
+            chunk_size = max(1, int(chunk_size or self.batch_chunk_size))
+            predictions = np.zeros(len(texts))
+            errors: Dict[int, str] = {}
+            for start in range(0, len(texts), chunk_size):
+                chunk_predictions, chunk_errors, _ = self._score_chunk(texts[start:start + chunk_size], loaded)
+                predictions[start:start + len(chunk_predictions)] = chunk_predictions
+                errors.update((start + i, error) for i, error in chunk_errors.items())
+            return predictions, errors
+    
+    def _batch_predict(self, texts: list, chunk_size: Optional[int]) -> list:
+        loaded = self._loaded
+        if loaded is None:
+            return [
+                {"prediction": 0.0, "error": "Model not loaded", "processing_time_ms": 0}
+                for _ in texts
+            ]
+        
+        chunk_size = max(1, int(chunk_size or self.batch_chunk_size))
+        results = []
+        for start in range(0, len(texts), chunk_size):
+            results.extend(self._predict_chunk(texts[start:start + chunk_size], loaded))
+        return results
+    
+    def _predict_chunk(self, texts: list, loaded: LoadedModel) -> List[Dict[str, Any]]:
+        """Результаты чанка в виде словарей по каждому тексту"""
+        start_time = time.perf_counter()
+        predictions, errors, cached = self._score_chunk(texts, loaded)
+        
+        # Время чанка делим поровну между посчитанными текстами
+        scored = len(texts) - len(errors) - len(cached)
+        processing_time = round((time.perf_counter() - start_time) * 1000 / max(1, scored), 2)
+        features_count = loaded.n_features
+        results = []
+        for i, prediction in enumerate(predictions.tolist()):
+            if i in errors:
+                results.append({"prediction": 0.0, "processing_time_ms": 0, "error": errors[i]})
+            elif i in cached:
+                results.append(self._from_cache(cached[i], start_time))
+            else:
+                results.append({
+                    "prediction": prediction,
+                    "processing_time_ms": processing_time,
+                    "features_count": features_count,
+                    "error": None
+                })
+        return results
+    
+    def _score_chunk(self, texts: list, loaded: LoadedModel) -> Tuple[np.ndarray, Dict[int, str], Dict[int, Dict[str, Any]]]:
+        """Один transform и один predict на чанк с ошибками по каждому тексту.
+
+        Возвращает предсказания, ошибки и найденные в кэше записи по индексам
+        (включая приближенные - из индекса почти одинаковых текстов).
+        """
+        start_time = time.perf_counter()
+        predictions = np.zeros(len(texts))
+        errors: Dict[int, str] = {}
+        cached: Dict[int, Dict[str, Any]] = {}
+        
+        # Невалидные элементы отмечаем сразу, чтобы не ронять весь чанк,
+        # а найденные в кэше - не отправляем в модель
+        valid_indices = []
+        cache_keys = {}
+        signatures = {}
+        for i, text in enumerate(texts):
+            if not isinstance(text, str):
+                errors[i] = f"Expected str, got {type(text).__name__}"
+                continue
+            if self.cache is not None:
+                cache_keys[i] = self.cache.make_key(text, loaded.fingerprint)
+                entry = self.cache.get(cache_keys[i])
+                if entry is not None:
+                    cached[i] = entry
+                    predictions[i] = entry["prediction"]
+                    continue
+            if self.near_duplicates is not None:
+                similar, signature = self._lookup_near_duplicate(text, loaded)
+                if similar is not None:
+                    cached[i] = similar
+                    predictions[i] = similar["prediction"]
+                    continue
+                if signature is not None:
+                    signatures[i] = signature
+            valid_indices.append(i)
+        
+        if not valid_indices:
+            return predictions, errors, cached
+        
+        try:
+            with observe_stage("preprocess"):
+                prepared = [self._prepare(texts[i]) for i in valid_indices]
+            predictions[valid_indices] = self._score(prepared, loaded)
+        except Exception:
+            # Если упал весь чанк - выясняем, какой именно текст виноват
+            for i in valid_indices:
+                result = self._predict_single(texts[i], loaded)
+                if result["error"]:
+                    errors[i] = result["error"]
+                else:
+                    predictions[i] = result["prediction"]
+            return predictions, errors, cached
+        
+        if cache_keys or signatures:
+            processing_time = round((time.perf_counter() - start_time) * 1000 / len(valid_indices), 2)
+            features_count = loaded.n_features
+            for i in valid_indices:
+                result = {
+                    "prediction": float(predictions[i]),
+                    "processing_time_ms": processing_time,
+                    "features_count": features_count,
+                    "error": None
+                }
+                if i in cache_keys:
+                    self.cache.put(cache_keys[i], result, loaded.fingerprint)
+                if i in signatures:
+                    self.near_duplicates.add(signatures[i], dict(result), loaded.fingerprint)
+        return predictions, errors, cached
+    
+    def _prepare(self, text: str) -> str:
+        """Приводит сырой текст к виду, на котором обучалась модель"""
+        if self.preprocessor is None:
+            return text
+        return self.preprocessor.preprocess(text)
+    
+    def _lookup_near_duplicate(self, text: str, loaded: LoadedModel):
+        """(приближенный результат или None, подпись для добавления после расчета)"""
+        start_time = time.perf_counter()
+        signature = self.near_duplicates.signature(text)
+        match = self.near_duplicates.query(signature, loaded.fingerprint)
+        if match is None:
+            return None, signature
+        stored, similarity = match
+        # Экономия - исходное время модели за вычетом поиска в индексе
+        self.near_duplicates.record_saving(
+            stored["processing_time_ms"] - (time.perf_counter() - start_time) * 1000)
+        return {**stored, "approximate": True, "similarity": round(similarity, 4)}, None
+    
+    def _invalidate(self, fingerprint: str):
+        """Сбрасывает записи кэша и индекса почти одинаковых текстов прежней модели"""
+        if self.cache is not None:
+            self.cache.clear(fingerprint)
+        if self.near_duplicates is not None:
+            self.near_duplicates.clear(fingerprint)
+    
+    @staticmethod
+    def _from_cache(cached: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+        """Копия закэшированного результата с актуальным временем обработки"""
+        return {
+            **cached,
+            "processing_time_ms": round((time.perf_counter() - start_time) * 1000, 2),
+            "cached": True
+        }
     
     def get_model_info(self) -> Dict[str, Any]:
         """Возвращает информацию о модели"""
-        if not self.is_loaded:
-            return {"is_loaded": False}
+        loaded = self._loaded
+        if loaded is None:
+            return {"is_loaded": False, "reloading": self.is_reloading}
         
         info = {
             "is_loaded": True,
-            "model_type": type(self.model).__name__,
-            "model_path": self.model_path,
-            "vectorizer_path": self.vectorizer_path
+            "model_type": loaded.model_type,
+            "model_path": loaded.model_path,
+            "vectorizer_path": loaded.vectorizer_path,
+            "fingerprint": loaded.fingerprint,
+            "engine": "numpy" if loaded.engine is not None else "sklearn",
+            "engine_max_batch": loaded.engine_max_batch if loaded.engine is not None else None,
+            "reloading": self.is_reloading,
+            "reloads": self.reloads
         }
         
-        if hasattr(self.vectorizer, 'vocabulary_'):
-            info["vocabulary_size"] = len(self.vectorizer.vocabulary_)
+        if loaded.engine is not None and loaded.engine.artifacts.path:
+            info["compact_dir"] = loaded.engine.artifacts.path
+        
+        if loaded.n_features is not None:
+            info["vocabulary_size"] = loaded.n_features
+        
+        if loaded.svd is not None:
+            info["svd_components"] = getattr(loaded.svd, 'n_components', None)
         
-        if hasattr(self.model, 'get_params'):
-            info["model_params"] = str(self.model.get_params())
+        if hasattr(loaded.model, 'get_params'):
+            info["model_params"] = str(loaded.model.get_params())
+        
+        if self.last_reload is not None:
+            info["last_reload"] = self.last_reload
+        
+        if self.cache is not None:
+            info["cache"] = self.cache.get_stats()
+        
+        if self.near_duplicates is not None:
+            info["near_duplicates"] = self.near_duplicates.get_stats()
+        
+        if self.preprocessor is not None:
+            info["preprocessing"] = {
+                "mode": self.preprocessor.mode,
+                "memo": self.preprocessor.get_memo_info()
+            }
         
         return info
\ No newline at end of file
@@ -0,0 +1,171 @@
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Значения по умолчанию для профилирования живых запросов
+DEFAULT_INTERVAL_MS = 5.0
+MIN_INTERVAL_MS = 1.0
+DEFAULT_MAX_DURATION_S = 300.0
+DEFAULT_MAX_STACKS = 10000
+# Стек обрезается выше первого кадра из этих модулей: в профиль попадают
+# предиктор, предобработка, векторайзер и модель, а не asyncio и пулы потоков
+DEFAULT_SCOPE = ("predictor.py",)
+# Стек, не уместившийся в max_stacks, считается здесь
+OVERFLOW_STACK = "[other]"
+
+
+class SamplingProfiler:
+    """Семплирующий профилер запросов к предиктору.
+
+    Отслеживаются только потоки, которые сейчас внутри track(); отдельный
+    поток раз в interval_ms снимает их стеки через sys._current_frames().
+    Запросы сами ничего не пишут, поэтому накладные расходы - один random()
+    на запрос и обход стеков в фоне. Стеки считаются в collapsed формате
+    (flamegraph.pl, speedscope, inferno).
+    """
+
+    def __init__(self, interval_ms: float = DEFAULT_INTERVAL_MS, max_duration_s: float = DEFAULT_MAX_DURATION_S,
+                 scope=DEFAULT_SCOPE, max_stacks: int = DEFAULT_MAX_STACKS):
+        self.interval_ms = max(MIN_INTERVAL_MS, float(interval_ms))
+        self.max_duration_s = float(max_duration_s)
+        self.scope = tuple(scope)
+        self.max_stacks = max(1, int(max_stacks))
+
+        self._lock = threading.Lock()
+        self._stacks: Counter = Counter()
+        # id потока -> глубина вложенных track() (predict внутри batch_predict)
+        self._tracked: Dict[int, int] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.active = False
+        self.sample_rate = 1.0
+        self.started_at: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.samples = 0
+        self.requests_seen = 0
+        self.requests_profiled = 0
+
+    def start(self, sample_rate: float = 1.0, duration_s: Optional[float] = None,
+              interval_ms: Optional[float] = None) -> Dict[str, Any]:
+        """Начинает новую сессию; прежние стеки сбрасываются"""
+        if not 0.0 < sample_rate <= 1.0:
+            raise ValueError("sample_rate must be in (0, 1]")
+        # Без ограничения по времени сессия все равно закончится через max_duration_s
+        duration_s = min(float(duration_s), self.max_duration_s) if duration_s else self.max_duration_s
+        self.stop()
+        with self._lock:
+            self._stacks.clear()
+            self._reset_stats()
+            if interval_ms is not None:
+                self.interval_ms = max(MIN_INTERVAL_MS, float(interval_ms))
+            self.sample_rate = float(sample_rate)
+            self.started_at = time.time()
+            self.deadline = time.monotonic() + duration_s
+            self.active = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        print(f"🔬 Профилирование: {self.sample_rate:.0%} запросов, {duration_s:.0f} с, "
+              f"интервал {self.interval_ms:.0f} мс")
+        return self.get_status()
+
+    def stop(self) -> Dict[str, Any]:
+        """Останавливает сессию; собранные стеки остаются доступны"""
+        self.active = False
+        self._stop_event.set()
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        return self.get_status()
+
+    @contextmanager
+    def track(self):
+        """Отмечает текущий поток для семплирования на время блока"""
+        thread_id = threading.get_ident()
+        nested = thread_id in self._tracked
+        if not nested:
+            if not self.active:
+                yield
+                return
+            self.requests_seen += 1
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                yield
+                return
+            self.requests_profiled += 1
+        with self._lock:
+            self._tracked[thread_id] = self._tracked.get(thread_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                depth = self._tracked.pop(thread_id) - 1
+                if depth:
+                    self._tracked[thread_id] = depth
+
+    def _run(self):
+        interval_s = self.interval_ms / 1000
+        while not self._stop_event.wait(interval_s):
+            if time.monotonic() >= self.deadline:
+                self.active = False
+                print(f"🔬 Профилирование завершено: {self.samples} семплов")
+                return
+            with self._lock:
+                tracked = list(self._tracked)
+            if not tracked:
+                continue
+            frames = sys._current_frames()
+            stacks = [self._scoped_stack(frames[thread_id]) for thread_id in tracked if thread_id in frames]
+            with self._lock:
+                for stack in stacks:
+                    if stack is None:
+                        continue
+                    if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+                        stack = OVERFLOW_STACK
+                    self._stacks[stack] += 1
+                    self.samples += 1
+
+    def _scoped_stack(self, frame) -> Optional[str]:
+        """Стек от внешнего кадра из scope до текущего, через ';'"""
+        names: List[str] = []
+        scoped_depth = None
+        while frame is not None:
+            code = frame.f_code
+            filename = os.path.basename(code.co_filename)
+            names.append(f"{os.path.splitext(filename)[0]}:{getattr(code, 'co_qualname', code.co_name)}")
+            if filename in self.scope:
+                scoped_depth = len(names)
+            frame = frame.f_back
+        if scoped_depth is None:
+            return None
+        return ";".join(reversed(names[:scoped_depth]))
+
+    def collapsed(self) -> str:
+        """Стеки в collapsed формате: 'кадр;кадр;кадр число' на строку"""
+        with self._lock:
+            items = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            remaining = None
+            if self.active and self.deadline is not None:
+                remaining = round(max(0.0, self.deadline - time.monotonic()), 1)
+            return {
+                "active": self.active,
+                "sample_rate": self.sample_rate,
+                "interval_ms": self.interval_ms,
+                "started_at": self.started_at,
+                "remaining_s": remaining,
+                "samples": self.samples,
+                "unique_stacks": len(self._stacks),
+                "requests_seen": self.requests_seen,
+                "requests_profiled": self.requests_profiled
+            }
@@ -0,0 +1,202 @@
+"""NumPy движок TF-IDF + линейной модели без sklearn на инференсе.
+
+Предсказание для пары TfidfVectorizer + Ridge сводится к: токенизация ->
+номера терминов -> tf * idf -> нормировка -> скалярное произведение с
+коэффициентами. Движок делает ровно эту математику по массивам из
+compact_artifacts, причем весь батч обрабатывается одним searchsorted и
+несколькими bincount вместо общего механизма sklearn transform.
+
+Проверка паритета с sklearn:
+    python scoring_engine.py --model models/best_model.pkl \\
+        --vectorizer models/tfidf_vectorizer.pkl --compact-dir models/compact
+"""
+
+import argparse
+import re
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from compact_artifacts import CompactArtifacts
+
+# Сколько терминов помнить в памяти процесса, прежде чем сбросить кэш поиска
+DEFAULT_TERM_MEMO_SIZE = 200_000
+
+# Тексты для проверки паритета, если свои не переданы
+PARITY_SAMPLE_TEXTS = [
+    "",
+    "метро",
+    "Метро работает отлично!",
+    "станция метро станция метро станция",
+    "новый поезд московский метрополитен проект приложение",
+    "осень хороший время горячий чай любимый произведение проект книга метро",
+    "пассажир пересадка кольцевой линия ремонт неудобство пассажир",
+    "unknown words only",
+]
+
+
+class LinearTfidfEngine:
+    """Скоринг TF-IDF + линейной модели по компактным массивам"""
+
+    def __init__(self, artifacts: CompactArtifacts, term_memo_size: int = DEFAULT_TERM_MEMO_SIZE):
+        self.artifacts = artifacts
+        # Частые термины не ищем в mmap массиве повторно; кэш ограничен и
+        # целиком сбрасывается при переполнении
+        self.term_memo_size = int(term_memo_size)
+        self._term_columns = {}
+        params = artifacts.vectorizer_params
+        self.lowercase = params["lowercase"]
+        self.min_n, self.max_n = params["ngram_range"]
+        self.norm = params["norm"]
+        self.use_idf = params["use_idf"]
+        self.sublinear_tf = params["sublinear_tf"]
+        self._token_re = re.compile(params["token_pattern"])
+        if self._token_re.groups > 1:
+            raise ValueError("token_pattern с несколькими группами не поддерживается")
+
+    @property
+    def n_features(self) -> int:
+        return self.artifacts.n_features
+
+    def analyze(self, text: str) -> List[str]:
+        """Термины документа - повторяет build_analyzer() sklearn для analyzer='word'"""
+        if self.lowercase:
+            text = text.lower()
+        tokens = self._token_re.findall(text)
+        if self.max_n == 1:
+            return tokens
+
+        min_n = self.min_n
+        terms = list(tokens) if min_n == 1 else []
+        min_n = max(min_n, 2)
+        n_tokens = len(tokens)
+        for n in range(min_n, min(self.max_n + 1, n_tokens + 1)):
+            for i in range(n_tokens - n + 1):
+                terms.append(" ".join(tokens[i:i + n]))
+        return terms
+
+    def _lookup(self, terms: List[str]) -> np.ndarray:
+        """Номера колонок терминов через кэш процесса и mmap словарь.
+
+        Движок вызывают несколько потоков пула: колонки берутся из локального
+        словаря, а общий кэш только пополняется и может быть сброшен другим
+        потоком в любой момент.
+        """
+        memo = self._term_columns
+        columns = np.fromiter((memo.get(term, -2) for term in terms), dtype=np.int64, count=len(terms))
+        missing_positions = np.flatnonzero(columns == -2)
+        if len(missing_positions) == 0:
+            return columns
+
+        missing = list({terms[i] for i in missing_positions})
+        resolved = dict(zip(missing, self.artifacts.lookup(missing).tolist()))
+        columns[missing_positions] = [resolved[terms[i]] for i in missing_positions]
+        if len(memo) + len(missing) > self.term_memo_size:
+            memo.clear()
+        memo.update(resolved)
+        return columns
+
+    def vectorize(self, texts: Sequence[str]):
+        """Ненулевые элементы TF-IDF матрицы батча: (doc, column, value)"""
+        doc_ids = []
+        terms = []
+        for doc, text in enumerate(texts):
+            doc_terms = self.analyze(text)
+            terms.extend(doc_terms)
+            doc_ids.extend([doc] * len(doc_terms))
+
+        columns = self._lookup(terms)
+        known = columns >= 0
+        docs = np.asarray(doc_ids, dtype=np.int64)[known]
+        columns = columns[known]
+
+        # Счетчики терминов по документам одним unique по составному ключу
+        n_features = self.n_features
+        keys, counts = np.unique(docs * n_features + columns, return_counts=True)
+        docs = keys // n_features
+        columns = keys % n_features
+
+        values = counts.astype(np.float64)
+        if self.sublinear_tf:
+            values = np.log(values) + 1
+        if self.use_idf:
+            values *= self.artifacts.idf[columns]
+
+        if self.norm is not None:
+            if self.norm == "l2":
+                norms = np.sqrt(np.bincount(docs, weights=values * values, minlength=len(texts)))
+            else:
+                norms = np.bincount(docs, weights=np.abs(values), minlength=len(texts))
+            norms[norms == 0] = 1.0
+            values /= norms[docs]
+        return docs, columns, values
+
+    def transform(self, texts: Sequence[str]):
+        """TF-IDF матрица как у vectorizer.transform (для проверок и отладки)"""
+        from scipy.sparse import csr_matrix
+
+        docs, columns, values = self.vectorize(texts)
+        return csr_matrix((values, (docs, columns)), shape=(len(texts), self.n_features))
+
+    def score(self, weights, n_texts: int) -> np.ndarray:
+        """Предсказания по результату vectorize"""
+        docs, columns, values = weights
+        scores = np.bincount(docs, weights=values * self.artifacts.coef[columns], minlength=n_texts)
+        return scores + self.artifacts.intercept
+
+    def predict(self, texts: Sequence[str]) -> np.ndarray:
+        """Предсказания для батча текстов"""
+        return self.score(self.vectorize(texts), len(texts))
+
+
+def check_parity(engine: LinearTfidfEngine, model, vectorizer,
+                 texts: Optional[Sequence[str]] = None, atol: float = 1e-8) -> float:
+    """Сверяет движок с sklearn; бросает AssertionError при расхождении"""
+    texts = list(texts) if texts is not None else PARITY_SAMPLE_TEXTS
+    # Добавляем тексты прямо из словаря, чтобы гарантированно задеть n-граммы
+    vocabulary = engine.artifacts.terms[:50]
+    texts = texts + [" ".join(term.decode("utf-8") for term in vocabulary[i:i + 5])
+                     for i in range(0, len(vocabulary), 5)]
+
+    expected_features = vectorizer.transform(texts)
+    actual_features = engine.transform(texts)
+    feature_diff = abs(expected_features - actual_features).max() if len(texts) else 0.0
+
+    expected = model.predict(expected_features)
+    actual = engine.predict(texts)
+    prediction_diff = float(np.max(np.abs(expected - actual))) if len(texts) else 0.0
+
+    max_diff = max(float(feature_diff), prediction_diff)
+    if max_diff > atol:
+        raise AssertionError(f"Движок расходится с sklearn: max |Δ| = {max_diff:.2e} > {atol:.0e}")
+    return max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка паритета NumPy движка с sklearn")
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--vectorizer", required=True)
+    parser.add_argument("--compact-dir", default=None, help="Без него движок строится из pickle в памяти")
+    parser.add_argument("--texts-csv", default=None, help="CSV с текстами для проверки")
+    parser.add_argument("--column", default="processed_text")
+    args = parser.parse_args()
+
+    import joblib
+    model = joblib.load(args.model)
+    vectorizer = joblib.load(args.vectorizer)
+    if args.compact_dir:
+        artifacts = CompactArtifacts.load(args.compact_dir)
+    else:
+        artifacts = CompactArtifacts.from_sklearn(model, vectorizer)
+
+    texts = None
+    if args.texts_csv:
+        import pandas as pd
+        texts = pd.read_csv(args.texts_csv, usecols=[args.column])[args.column].fillna("").tolist()
+
+    max_diff = check_parity(LinearTfidfEngine(artifacts), model, vectorizer, texts)
+    print(f"✅ Паритет с sklearn: max |Δ| = {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
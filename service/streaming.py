@@ -0,0 +1,180 @@
+import asyncio
+import csv
+import tempfile
+from typing import IO, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from executors import QueueFullError
+from wire_format import dumps_json, loads_json
+
+# Значения по умолчанию для потокового скоринга
+DEFAULT_STREAM_CHUNK_SIZE = 256
+DEFAULT_MAX_LINE_BYTES = 1024 * 1024
+DEFAULT_TEXT_FIELD = "text"
+# Тело запроса до этого размера держим в памяти, дальше - во временном файле
+DEFAULT_SPOOL_MAX_MEMORY_BYTES = 8 * 1024 * 1024
+READ_BLOCK_SIZE = 64 * 1024
+# Пауза перед повтором чанка, если очередь инференса занята
+QUEUE_RETRY_DELAY_S = 0.05
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+
+# Запись входа: (номер, id из входа, текст или None, ошибка разбора или None)
+Record = Tuple[int, Any, Optional[str], Optional[str]]
+
+
+class LineTooLongError(Exception):
+    """Строка входа длиннее лимита - тело запроса не читается в память целиком"""
+
+
+def detect_format(content_type: Optional[str]) -> str:
+    """Формат тела по Content-Type: text/csv -> CSV, всё остальное - NDJSON"""
+    if content_type and content_type.split(";")[0].strip().lower() in ("text/csv", "application/csv"):
+        return FORMAT_CSV
+    return FORMAT_NDJSON
+
+
+async def spool_body(byte_chunks: AsyncIterator[bytes],
+                     max_memory_bytes: int = DEFAULT_SPOOL_MAX_MEMORY_BYTES) -> IO[bytes]:
+    """Сохраняет тело запроса до начала ответа.
+
+    Starlette (ASGI spec < 2.4) после отправки заголовков ответа сам читает
+    receive() в ожидании разрыва соединения, поэтому дочитывать тело внутри
+    StreamingResponse нельзя. Большое тело уходит на диск, память ограничена.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory_bytes)
+    try:
+        async for chunk in byte_chunks:
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+async def iter_file_blocks(f: IO[bytes], block_size: int = READ_BLOCK_SIZE) -> AsyncIterator[bytes]:
+    while True:
+        block = f.read(block_size)
+        if not block:
+            return
+        yield block
+
+
+async def iter_lines(byte_chunks: AsyncIterator[bytes],
+                     max_line_bytes: int = DEFAULT_MAX_LINE_BYTES) -> AsyncIterator[str]:
+    """Строки из потока байтов; в памяти только текущая неполная строка"""
+    pending = b""
+    async for chunk in byte_chunks:
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        if len(pending) > max_line_bytes:
+            raise LineTooLongError(f"Line exceeds {max_line_bytes} bytes")
+        for line in lines:
+            yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+    if pending:
+        yield pending.rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+async def iter_ndjson_records(lines: AsyncIterator[str], text_field: str = DEFAULT_TEXT_FIELD) -> AsyncIterator[Record]:
+    """NDJSON: объект с полем text_field (и необязательным id) или просто строка"""
+    index = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            item = loads_json(line)
+        except ValueError as e:
+            yield index, None, None, f"Invalid JSON: {e}"
+        else:
+            if isinstance(item, str):
+                yield index, None, item, None
+            elif isinstance(item, dict) and isinstance(item.get(text_field), str):
+                yield index, item.get("id"), item[text_field], None
+            else:
+                yield index, None, None, f"Expected a string or an object with '{text_field}' string field"
+        index += 1
+
+
+async def iter_csv_records(lines: AsyncIterator[str], text_field: str = DEFAULT_TEXT_FIELD,
+                           max_line_bytes: int = DEFAULT_MAX_LINE_BYTES) -> AsyncIterator[Record]:
+    """CSV с заголовком; поля в кавычках могут занимать несколько строк"""
+    header = None
+    pending: List[str] = []
+    pending_size = 0
+    index = 0
+    async for line in lines:
+        pending.append(line)
+        pending_size += len(line)
+        # Запись закончена, когда кавычки сбалансированы
+        if sum(part.count('"') for part in pending) % 2:
+            if pending_size > max_line_bytes:
+                raise LineTooLongError(f"CSV record exceeds {max_line_bytes} bytes")
+            continue
+
+        row = next(csv.reader(["\n".join(pending)]), [])
+        pending, pending_size = [], 0
+        if not row:
+            continue
+        if header is None:
+            header = row
+            if text_field not in header:
+                raise ValueError(f"CSV header has no '{text_field}' column")
+            text_position = header.index(text_field)
+            id_position = header.index("id") if "id" in header else None
+            continue
+
+        if len(row) != len(header):
+            yield index, None, None, f"Expected {len(header)} columns, got {len(row)}"
+        else:
+            yield index, row[id_position] if id_position is not None else None, row[text_position], None
+        index += 1
+
+    if pending:
+        yield index, None, None, "Unterminated quoted field"
+
+
+async def score_stream(records: AsyncIterator[Record],
+                       score_fn: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+                       chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Скорит записи чанками по chunk_size и отдает NDJSON строки по готовности.
+
+    Следующий чанк читается, только когда клиент забрал предыдущие строки,
+    поэтому память ограничена одним чанком независимо от размера входа.
+    """
+    chunk: List[Record] = []
+
+    async def flush() -> AsyncIterator[bytes]:
+        valid = [record for record in chunk if record[3] is None]
+        results = await _score_with_retry(score_fn, [record[2] for record in valid]) if valid else []
+        scored = iter(results)
+        for index, record_id, _, parse_error in chunk:
+            if parse_error is not None:
+                result = {"prediction": None, "error": parse_error}
+            else:
+                result = next(scored)
+            line = {"index": index}
+            if record_id is not None:
+                line["id"] = record_id
+            line.update(result)
+            yield dumps_json(line) + b"\n"
+
+    async for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            async for line in flush():
+                yield line
+            chunk = []
+    if chunk:
+        async for line in flush():
+            yield line
+
+
+async def _score_with_retry(score_fn, texts: List[str]) -> List[Dict[str, Any]]:
+    # Ответ уже начат, поэтому 503 вернуть нельзя - ждем освобождения очереди
+    while True:
+        try:
+            return await score_fn(texts)
+        except QueueFullError:
+            await asyncio.sleep(QUEUE_RETRY_DELAY_S)
@@ -0,0 +1,138 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# orjson и msgpack необязательны: без orjson JSON кодируется стандартным json,
+# без msgpack формат MessagePack просто не предлагается клиентам
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMAT_JSON = "application/json"
+FORMAT_MSGPACK = "application/msgpack"
+# Сырой little-endian float32 массив предсказаний; ошибки - NaN
+FORMAT_FLOAT32 = "application/x-float32"
+
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": FORMAT_MSGPACK,
+    "application/vnd.msgpack": FORMAT_MSGPACK,
+}
+# Заголовки ответа float32: число предсказаний и ошибок (текст ошибок - только в JSON и MessagePack)
+COUNT_HEADER = "X-Prediction-Count"
+ERRORS_HEADER = "X-Prediction-Errors"
+
+
+class UnsupportedMediaTypeError(ValueError):
+    """Тело запроса в формате, который сервис не принимает (HTTP 415)"""
+
+
+def response_formats() -> Tuple[str, ...]:
+    """Форматы ответа в порядке предпочтения сервиса"""
+    if msgpack is None:
+        return FORMAT_JSON, FORMAT_FLOAT32
+    return FORMAT_JSON, FORMAT_MSGPACK, FORMAT_FLOAT32
+
+
+def request_formats() -> Tuple[str, ...]:
+    return (FORMAT_JSON, FORMAT_MSGPACK) if msgpack is not None else (FORMAT_JSON,)
+
+
+def _media_type(value: str) -> str:
+    media_type = value.split(";", 1)[0].strip().lower()
+    return MEDIA_TYPE_ALIASES.get(media_type, media_type)
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """Формат ответа по заголовку Accept (с q-весами); None - ни один не подходит (HTTP 406)"""
+    if not accept:
+        return FORMAT_JSON
+    supported = response_formats()
+    best, best_q = None, 0.0
+    for item in accept.split(","):
+        parts = item.split(";")
+        media_type = _media_type(parts[0])
+        q = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in ("*/*", "application/*"):
+            candidate = FORMAT_JSON
+        elif media_type in supported:
+            candidate = media_type
+        else:
+            continue
+        # При равных весах побеждает более ранний в заголовке
+        if q > best_q:
+            best, best_q = candidate, q
+    return best
+
+
+def dumps_json(obj: Any) -> bytes:
+    """Быстрый JSON (orjson, если установлен); кириллица без \\u-экранирования"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def loads_json(body: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def decode_body(body: bytes, content_type: Optional[str]) -> Any:
+    """Тело запроса по Content-Type: JSON (по умолчанию) или MessagePack"""
+    media_type = _media_type(content_type) if content_type else FORMAT_JSON
+    if media_type == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise UnsupportedMediaTypeError("MessagePack is not available, install msgpack")
+        return msgpack.unpackb(body, raw=False)
+    if media_type != FORMAT_JSON:
+        raise UnsupportedMediaTypeError(f"Unsupported Content-Type '{media_type}', expected one of {request_formats()}")
+    return loads_json(body)
+
+
+def encode_body(obj: Any, media_type: str = FORMAT_JSON) -> bytes:
+    if media_type == FORMAT_MSGPACK:
+        return msgpack.packb(obj, use_bin_type=True)
+    return dumps_json(obj)
+
+
+def encode_predictions(predictions, errors: Dict[int, str], media_type: str) -> Tuple[bytes, Dict[str, str]]:
+    """Колоночный ответ batch (MessagePack или float32) без словаря на каждый текст.
+
+    MessagePack: {"predictions": [float64, ...], "errors": {индекс: текст}}.
+    float32: 4 байта на текст, ошибки - NaN, их число - в X-Prediction-Errors.
+    """
+    import numpy as np
+
+    predictions = np.asarray(predictions, dtype=np.float64)
+    headers = {COUNT_HEADER: str(len(predictions)), ERRORS_HEADER: str(len(errors))}
+    if media_type == FORMAT_FLOAT32:
+        values = predictions.astype("<f4")
+        if errors:
+            values[list(errors)] = np.nan
+        return values.tobytes(), headers
+    return msgpack.packb({"predictions": predictions.tolist(), "errors": errors}, use_bin_type=True), headers
+
+
+def decode_predictions(body: bytes, media_type: str) -> Tuple[List[float], Dict[int, str]]:
+    """Обратное к encode_predictions (для клиентов): предсказания и ошибки по индексам"""
+    media_type = _media_type(media_type)
+    if media_type == FORMAT_FLOAT32:
+        import numpy as np
+
+        values = np.frombuffer(body, dtype="<f4")
+        errors = {int(i): "prediction failed" for i in np.flatnonzero(np.isnan(values))}
+        return values.astype(np.float64).tolist(), errors
+    data = msgpack.unpackb(body, raw=False, strict_map_key=False)
+    return data["predictions"], data.get("errors", {})
@@ -0,0 +1,541 @@
+# sweep_experiments.py
+
+"""Параллельный перебор гиперпараметров экспериментов из train_config.yaml.
+
+Сетки задаются в секции sweep.grids: для эксперимента перечисляются списки
+значений параметров из tfidf_params / hashing_params / idf / svd /
+ridge_params / rf_params / nn_params, триалы - их декартово произведение
+поверх конфига эксперимента.
+
+Признаки каждого различного набора (датасет, tfidf_params или
+hashing_params и idf, svd) строятся один раз в основном процессе через
+кэш признаков (feature_cache.py) и выгружаются в каталог запуска как .npy
+(разреженные матрицы - по частям CSR). Воркеры открывают их через mmap:
+все процессы читают одни и те же страницы файла, копии данных на воркер
+не создаются.
+
+Триалы выполняются в пуле процессов; у каждого бюджет cpus_per_trial ядер
+(потоки BLAS/OpenMP, n_jobs у случайного леса).
+
+Из train сплита откладывается валидационная выборка (sweep.validation_size):
+модели обучаются на остатке, а число деревьев леса, EarlyStopping нейросети
+и выбор лучшего триала смотрят только на валидацию. Тестовая выборка
+используется один раз - для лучшей модели эксперимента, поэтому ее MAE / R2
+не завышены перебором (модель обучена на train без валидации).
+
+Ранняя остановка: эксперимент прекращает перебор, если patience триалов
+подряд не улучшили метрику на валидации, а случайный лес растит деревья
+порциями, пока MAE падает. Триалы завершаются в произвольном порядке, но
+patience считается в порядке сетки, так что набор учтенных триалов и лучшая
+модель не зависят от параллельности; триалы после точки остановки
+отменяются или, если уже посчитаны, отбрасываются.
+
+Результаты - таблица в формате notebooks/models_summary.csv с
+дополнительными колонками (MAE / R2 / RMSE - на тесте, только у лучших
+триалов); лучшая модель эксперимента сохраняется в training.models_dir,
+как у train_experiment.py.
+
+Пример:
+    python sweep_experiments.py 1 2
+    python sweep_experiments.py 1 --workers 4 --cpus-per-trial 2
+"""
+
+import argparse
+import copy
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy import sparse
+
+from config_loader import config
+from feature_cache import cache_key
+
+# Разделы конфига эксперимента, которые можно перебирать
+GRID_SECTIONS = ("tfidf_params", "hashing_params", "idf", "svd", "ridge_params", "rf_params", "nn_params")
+# Разделы, от которых зависят признаки: триалы с одинаковыми значениями делят данные
+FEATURE_SECTIONS = ("dataset", "tfidf_params", "hashing_params", "idf", "svd")
+# Имена моделей как в notebooks/models_summary.csv
+MODEL_NAMES = {"ridge": "Ridge", "random_forest": "RandomForest", "neural_network": "NeuralNetwork",
+               "hashing": "RidgeHashing"}
+SUMMARY_COLUMNS = ["Model", "MAE", "R2", "Task ID", "Model ID",
+                   "Experiment", "RMSE", "Val MAE", "Val R2", "Val RMSE", "Params", "Fit s", "Stopped At", "Status"]
+SHARED_NAMES = ("X_train", "X_val", "X_test", "y_train", "y_val", "y_test")
+SHARED_META = "shared.json"
+
+METRIC_MAE = "mae"
+METRIC_RMSE = "rmse"
+METRIC_R2 = "r2"
+# Для этих метрик лучше большее значение
+MAXIMIZE_METRICS = (METRIC_R2,)
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+
+DEFAULT_TREES_STEP = 25
+DEFAULT_TREES_PATIENCE = 2
+DEFAULT_VALIDATION_SIZE = 0.1
+
+
+def expand_grid(exp_config: Dict[str, Any], grid: Dict[str, Dict[str, List[Any]]]) -> List[Dict[str, Any]]:
+    """Конфиги триалов: декартово произведение значений сетки поверх конфига эксперимента.
+
+    Каждое значение сетки - список кандидатов, поэтому параметр-список
+    задается списком списков: ngram_range: [[1, 1], [1, 2]].
+    """
+    axes = []
+    for section, params in (grid or {}).items():
+        if section not in GRID_SECTIONS:
+            raise KeyError(f"Раздел '{section}' нельзя перебирать, доступны: {', '.join(GRID_SECTIONS)}")
+        for param, values in params.items():
+            if not isinstance(values, list) or not values:
+                raise ValueError(f"sweep: {section}.{param} должен быть непустым списком значений")
+            axes.append((section, param, values))
+
+    trials = []
+    for combination in itertools.product(*(values for _, _, values in axes)):
+        trial = copy.deepcopy(exp_config)
+        overrides = {}
+        for (section, param, _), value in zip(axes, combination):
+            trial.setdefault(section, {})[param] = value
+            overrides[f"{section}.{param}"] = value
+        trial["overrides"] = overrides
+        trials.append(trial)
+    return trials
+
+
+def feature_key(trial: Dict[str, Any]) -> str:
+    return cache_key({section: trial.get(section) for section in FEATURE_SECTIONS})
+
+
+def split_validation(features: Dict[str, Any], validation_size: float, random_state: int) -> Dict[str, Any]:
+    """Откладывает валидацию из train: X_train / y_train становятся остатком"""
+    from sklearn.model_selection import train_test_split
+
+    X_train, X_val, y_train, y_val = train_test_split(
+        features["X_train"], features["y_train"], test_size=validation_size, random_state=random_state)
+    return {**features, "X_train": X_train, "X_val": X_val, "y_train": y_train, "y_val": y_val}
+
+
+def regression_metrics(y_true, y_pred) -> Dict[str, float]:
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    y_true = np.asarray(y_true)
+    return {
+        METRIC_MAE: float(mean_absolute_error(y_true, y_pred)),
+        METRIC_RMSE: float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        METRIC_R2: float(r2_score(y_true, y_pred))
+    }
+
+
+def share_features(features: Dict[str, Any], path: str):
+    """Выгружает матрицы и цели в .npy, которые воркеры читают через mmap"""
+    os.makedirs(path, exist_ok=True)
+    meta = {}
+    for name in SHARED_NAMES:
+        matrix = features[name]
+        if sparse.issparse(matrix):
+            matrix = matrix.tocsr()
+            for part in ("data", "indices", "indptr"):
+                np.save(os.path.join(path, f"{name}.{part}.npy"), getattr(matrix, part))
+            meta[name] = {"kind": "csr", "shape": list(matrix.shape)}
+        else:
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(matrix))
+            meta[name] = {"kind": "dense"}
+    with open(os.path.join(path, SHARED_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def load_shared(path: str) -> Dict[str, Any]:
+    """Матрицы из share_features без копирования в память процесса"""
+    with open(os.path.join(path, SHARED_META), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    features = {}
+    for name, info in meta.items():
+        if info["kind"] == "csr":
+            parts = [np.load(os.path.join(path, f"{name}.{part}.npy"), mmap_mode="r")
+                     for part in ("data", "indices", "indptr")]
+            features[name] = sparse.csr_matrix(tuple(parts), shape=tuple(info["shape"]), copy=False)
+        else:
+            features[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+    return features
+
+
+def limit_worker_threads(cpus: int):
+    """Инициализатор воркера: бюджет потоков на триал"""
+    # tensorflow и OpenMP читают переменные окружения при первом импорте
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[var] = str(cpus)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=cpus)
+    except ImportError:
+        pass
+
+
+def fit_forest_early_stopping(model, features: Dict[str, Any], step: int, patience: int,
+                              min_delta: float) -> int:
+    """Растит лес порциями по step деревьев, пока MAE на валидации снижается.
+
+    n_estimators из конфига - верхняя граница. Возвращает число деревьев
+    лучшей модели.
+    """
+    from sklearn.metrics import mean_absolute_error
+
+    max_trees = model.n_estimators
+    model.set_params(warm_start=True)
+    best_mae, best_trees, bad_steps, trees = math.inf, 0, 0, 0
+    while trees < max_trees:
+        trees = min(max_trees, trees + step)
+        model.set_params(n_estimators=trees)
+        model.fit(features["X_train"], features["y_train"])
+        mae = mean_absolute_error(features["y_val"], model.predict(features["X_val"]))
+        if mae < best_mae - min_delta:
+            best_mae, best_trees, bad_steps = mae, trees, 0
+        else:
+            bad_steps += 1
+            if bad_steps >= patience:
+                break
+    # Деревья после лучшей порции не помогли - отбрасываем их
+    model.estimators_ = model.estimators_[:best_trees]
+    model.set_params(n_estimators=best_trees, warm_start=False)
+    return best_trees
+
+
+def run_trial(trial: Dict[str, Any], shared_dir: str, trial_dir: str, cpus: int,
+              early_stopping: Dict[str, Any]) -> Dict[str, Any]:
+    """Выполняется в воркере: обучает модель триала на общих признаках, оценка - на валидации"""
+    import joblib
+
+    from train_experiment import build_model, fit_model, predict
+
+    result = {"task_id": trial["task_id"], "experiment": trial["experiment"], "stopped_at": None}
+    start_time = time.perf_counter()
+    try:
+        features = load_shared(shared_dir)
+        exp_config = copy.deepcopy(trial)
+        if exp_config["type"] == "random_forest":
+            exp_config["rf_params"].setdefault("n_jobs", cpus)
+        model = build_model(exp_config, features["X_train"].shape[1])
+
+        if exp_config["type"] == "random_forest" and early_stopping.get("enabled", False):
+            result["stopped_at"] = fit_forest_early_stopping(
+                model, features,
+                step=early_stopping.get("trees_step", DEFAULT_TREES_STEP),
+                patience=early_stopping.get("trees_patience", DEFAULT_TREES_PATIENCE),
+                min_delta=early_stopping.get("min_delta", 0.0))
+        else:
+            # fit_model передает X_test в EarlyStopping нейросети - подставляем валидацию
+            model = fit_model(exp_config, model, {**features, "X_test": features["X_val"], "y_test": features["y_val"]})
+            if exp_config["type"] == "neural_network":
+                result["stopped_at"] = len(model.history.epoch) if getattr(model, "history", None) else None
+
+        validation = regression_metrics(features["y_val"], predict(exp_config, model, features["X_val"]))
+        result.update({"status": STATUS_OK, **{f"val_{name}": value for name, value in validation.items()}})
+
+        # Модель сохраняется во временный каталог: после перебора остается только лучшая
+        os.makedirs(trial_dir, exist_ok=True)
+        if exp_config["type"] == "neural_network":
+            result["model_file"] = os.path.join(trial_dir, f"{trial['task_id']}.h5")
+            model.save(result["model_file"])
+        else:
+            result["model_file"] = os.path.join(trial_dir, f"{trial['task_id']}.joblib")
+            joblib.dump(model, result["model_file"])
+    except Exception as e:
+        result.update({"status": STATUS_FAILED, "error": f"{type(e).__name__}: {e}"})
+    result["fit_s"] = round(time.perf_counter() - start_time, 2)
+    return result
+
+
+class SweepTracker:
+    """Лучший результат и счетчик триалов без улучшения по каждому эксперименту.
+
+    Результаты передаются в update в порядке сетки; сравнение по метрике
+    на валидации.
+    """
+
+    def __init__(self, metric: str, patience: Optional[int], min_delta: float):
+        self.metric = f"val_{metric}"
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best: Dict[str, Dict[str, Any]] = {}
+        self.stale: Dict[str, int] = {}
+
+    def score(self, result: Dict[str, Any]) -> float:
+        value = result[self.metric]
+        return value if self.metric in MAXIMIZE_METRICS else -value
+
+    def update(self, result: Dict[str, Any]) -> bool:
+        """Учитывает результат; True - эксперимент пора останавливать"""
+        experiment = result["experiment"]
+        if result["status"] != STATUS_OK:
+            return False
+        best = self.best.get(experiment)
+        if best is None or self.score(result) > self.score(best) + self.min_delta:
+            self.best[experiment] = result
+            self.stale[experiment] = 0
+            return False
+        self.stale[experiment] = self.stale.get(experiment, 0) + 1
+        return self.patience is not None and self.stale[experiment] >= self.patience
+
+
+def write_summary(path: str, rows: List[Dict[str, Any]]):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def summary_row(trial: Dict[str, Any], result: Dict[str, Any], model_id: str = "") -> Dict[str, Any]:
+    """Строка таблицы; тестовые метрики есть только у лучших триалов (см. evaluate_best)"""
+    test = result.get("test") or {}
+    return {
+        "Model": MODEL_NAMES.get(trial["type"], trial["type"]),
+        "MAE": test.get(METRIC_MAE, ""),
+        "R2": test.get(METRIC_R2, ""),
+        "Task ID": trial["task_id"],
+        "Model ID": model_id,
+        "Experiment": trial["name"],
+        "RMSE": test.get(METRIC_RMSE, ""),
+        "Val MAE": result.get("val_mae", ""),
+        "Val R2": result.get("val_r2", ""),
+        "Val RMSE": result.get("val_rmse", ""),
+        "Params": json.dumps(trial["overrides"], ensure_ascii=False),
+        "Fit s": result.get("fit_s", ""),
+        "Stopped At": result.get("stopped_at") or "",
+        "Status": result["status"] if result["status"] == STATUS_OK else f"{result['status']}: {result.get('error', '')}"
+    }
+
+
+def load_trial_model(trial: Dict[str, Any], result: Dict[str, Any]):
+    if trial["type"] == "neural_network":
+        import tensorflow as tf
+        return tf.keras.models.load_model(result["model_file"])
+    import joblib
+    return joblib.load(result["model_file"])
+
+
+def evaluate_best(trial: Dict[str, Any], model, shared_dir: str) -> Dict[str, float]:
+    """Метрики выбранной модели на тесте - единственное обращение перебора к тестовой выборке"""
+    from train_experiment import predict
+
+    features = load_shared(shared_dir)
+    return regression_metrics(features["y_test"], predict(trial, model, features["X_test"]))
+
+
+def save_best_model(trial: Dict[str, Any], model, transformers: Dict[str, Any],
+                    output_dir: str) -> Dict[str, str]:
+    """Лучшая модель эксперимента в формате train_experiment.save_model"""
+    from train_experiment import save_model
+
+    return save_model(trial, model, transformers, output_dir)
+
+
+def run_sweep(experiments: List[int], grids: Optional[Dict[str, Any]] = None, max_workers: Optional[int] = None,
+              cpus_per_trial: Optional[int] = None, early_stopping: Optional[bool] = None,
+              use_cache: bool = True, output_dir: Optional[str] = None,
+              run_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Перебирает сетки экспериментов и возвращает путь к таблице и лучшие триалы"""
+    from train_experiment import SUPPORTED_TYPES, build_features
+
+    training = config.get_training_params()
+    sweep_config = config.get_sweep_config()
+    grids = grids if grids is not None else sweep_config.get("grids") or {}
+    stopping = dict(sweep_config.get("early_stopping") or {})
+    if early_stopping is not None:
+        stopping["enabled"] = early_stopping
+    metric = sweep_config.get("metric", METRIC_MAE)
+    if metric not in (METRIC_MAE, METRIC_RMSE, METRIC_R2):
+        raise ValueError(f"sweep.metric должен быть одним из {METRIC_MAE}, {METRIC_RMSE}, {METRIC_R2}")
+    validation_size = float(sweep_config.get("validation_size", DEFAULT_VALIDATION_SIZE))
+    if not 0.0 < validation_size < 1.0:
+        raise ValueError(f"sweep.validation_size должен быть в (0, 1), получено {validation_size}")
+
+    cpus = max(1, int(cpus_per_trial or sweep_config.get("cpus_per_trial") or 1))
+    workers = int(max_workers or sweep_config.get("max_workers") or max(1, (os.cpu_count() or 1) // cpus))
+    output_dir = output_dir or config.resolve_path(training.get("models_dir", "models/"))
+    run_dir = run_dir or config.resolve_path(os.path.join(
+        training.get("artifacts_dir", "artifacts/"), "sweeps", time.strftime("%Y%m%d-%H%M%S")))
+    shared_root = os.path.join(run_dir, "shared")
+    trial_dir = os.path.join(run_dir, "trials")
+    summary_path = os.path.join(run_dir, "models_summary.csv")
+    os.makedirs(run_dir, exist_ok=True)
+
+    trials = []
+    for exp_num in experiments:
+        exp_config = config.get_experiment_config(exp_num)
+        if exp_config["type"] not in SUPPORTED_TYPES:
+            raise ValueError(f"Эксперимент {exp_num} имеет тип {exp_config['type']}, "
+                             f"ожидается один из {SUPPORTED_TYPES}")
+        for trial in expand_grid(exp_config, grids.get(f"experiment{exp_num}")):
+            trial["experiment"] = f"experiment{exp_num}"
+            trial["feature_key"] = feature_key(trial)
+            # Task ID в формате models_summary.csv: хэш конфига триала
+            trial["task_id"] = cache_key({k: v for k, v in trial.items() if k != "overrides"})
+            trials.append(trial)
+
+    print(f"🚀 Перебор: {len(trials)} триалов в {len(experiments)} экспериментах, "
+          f"{workers} воркеров по {cpus} CPU, ранняя остановка: {'да' if stopping.get('enabled') else 'нет'}")
+    print(f"   Валидация: {validation_size:.0%} train сплита, тест - только для лучших моделей")
+
+    # Признаки: один раз на набор, через кэш; в памяти остаются только векторайзер и SVD.
+    # Векторайзер обучен на всем train сплите, валидация отделяется уже от матриц
+    cache = config.get_feature_cache() if use_cache else None
+    transformers = {}
+    for trial in trials:
+        key = trial["feature_key"]
+        if key in transformers:
+            continue
+        features = split_validation(build_features(trial, cache), validation_size, training["random_state"])
+        share_features(features, os.path.join(shared_root, key))
+        transformers[key] = {"vectorizer": features["vectorizer"], "svd": features["svd"]}
+        print(f"   Признаки {key[:8]}: train {features['X_train'].shape}, валидация {features['X_val'].shape} "
+              f"(кэш: {features['cache']})")
+        del features
+
+    tracker = SweepTracker(metric, stopping.get("patience") if stopping.get("enabled") else None,
+                           stopping.get("min_delta", 0.0))
+    rows, results, skipped = [], {}, 0
+    # Триалы каждого эксперимента в порядке сетки: patience считается по этому порядку,
+    # а не по порядку завершения, поэтому остановка не зависит от числа воркеров
+    grid_order: Dict[str, List[Dict[str, Any]]] = {}
+    for trial in trials:
+        grid_order.setdefault(trial["experiment"], []).append(trial)
+    cursor = {experiment: 0 for experiment in grid_order}
+    finished: Dict[str, Dict[str, Any]] = {}
+    start_time = time.perf_counter()
+    # spawn: воркеры не наследуют потоки BLAS/OpenMP основного процесса
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=limit_worker_threads, initargs=(cpus,)) as executor:
+        futures = {}
+        for trial in trials:
+            future = executor.submit(run_trial, trial, os.path.join(shared_root, trial["feature_key"]),
+                                     trial_dir, cpus, stopping)
+            futures[future] = trial
+        trials_by_id = {trial["task_id"]: trial for trial in trials}
+
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            trial = futures[future]
+            experiment = trial["experiment"]
+            if cursor[experiment] is None:
+                # Эксперимент уже остановлен на более раннем триале сетки
+                continue
+            finished[trial["task_id"]] = future.result()
+
+            # Учитываются только триалы, перед которыми в сетке все уже завершены
+            ordered = grid_order[experiment]
+            while cursor[experiment] is not None and cursor[experiment] < len(ordered):
+                current = ordered[cursor[experiment]]
+                result = finished.pop(current["task_id"], None)
+                if result is None:
+                    break
+                cursor[experiment] += 1
+                results[current["task_id"]] = result
+                rows.append(summary_row(current, result))
+
+                if result["status"] == STATUS_OK:
+                    print(f"   {current['name']} {current['overrides']}: val MAE={result['val_mae']:.3f} "
+                          f"val R2={result['val_r2']:.3f} за {result['fit_s']} с")
+                else:
+                    print(f"   ❌ {current['name']} {current['overrides']}: {result['error']}")
+
+                if tracker.update(result):
+                    # Дальнейшие триалы сетки не учитываются: еще не начатые отменяются,
+                    # уже посчитанные отбрасываются
+                    rest = ordered[cursor[experiment]:]
+                    rest_ids = {other["task_id"] for other in rest}
+                    for other, other_trial in futures.items():
+                        if other_trial["task_id"] in rest_ids:
+                            other.cancel()
+                    skipped += len(rest)
+                    cursor[experiment] = None
+                    if rest:
+                        print(f"⏹️ {current['name']}: {tracker.patience} триалов без улучшения, "
+                              f"пропущено {len(rest)}")
+            write_summary(summary_path, rows)
+
+    # Лучшая модель каждого эксперимента оценивается на тесте и сохраняется в models_dir,
+    # остальные удаляются
+    best_models = {}
+    for experiment, result in tracker.best.items():
+        trial = trials_by_id[result["task_id"]]
+        model = load_trial_model(trial, result)
+        result["test"] = evaluate_best(trial, model, os.path.join(shared_root, trial["feature_key"]))
+        best = {"task_id": trial["task_id"], "model_id": "", "overrides": trial["overrides"],
+                "validation": {m: result[f"val_{m}"] for m in (METRIC_MAE, METRIC_RMSE, METRIC_R2)},
+                "metrics": result["test"]}
+        if training.get("save_best_model", True):
+            best.update(save_best_model(trial, model, transformers[trial["feature_key"]], output_dir))
+            best["model_id"] = uuid.uuid4().hex
+        best_models[experiment] = best
+        for i, row in enumerate(rows):
+            if row["Task ID"] == trial["task_id"]:
+                rows[i] = summary_row(trial, result, best["model_id"])
+
+    # Таблица: эксперименты по порядку, внутри - от лучшего триала к худшему
+    order = {f"experiment{n}": i for i, n in enumerate(experiments)}
+    sign = -1 if metric in MAXIMIZE_METRICS else 1
+
+    def sort_key(row):
+        trial = trials_by_id[row["Task ID"]]
+        value = results[row["Task ID"]].get(f"val_{metric}")
+        return order[trial["experiment"]], value is None, sign * value if value is not None else 0
+
+    rows.sort(key=sort_key)
+    write_summary(summary_path, rows)
+    shutil.rmtree(shared_root, ignore_errors=True)
+    shutil.rmtree(trial_dir, ignore_errors=True)
+
+    report = {
+        "summary_path": summary_path,
+        "trials": len(trials),
+        "completed": len(results),
+        "skipped": skipped,
+        "elapsed_s": round(time.perf_counter() - start_time, 2),
+        "best": best_models
+    }
+    with open(os.path.join(run_dir, "sweep_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ Перебор завершен за {report['elapsed_s']} с: {report['completed']} триалов, "
+          f"пропущено {skipped}")
+    for experiment, best in best_models.items():
+        print(f"   🏆 {experiment}: {best['overrides']} val MAE={best['validation']['mae']:.3f}, "
+              f"тест MAE={best['metrics']['mae']:.3f} R2={best['metrics']['r2']:.3f}"
+              f"{' -> ' + best['model_path'] if best.get('model_path') else ''}")
+    print(f"   Таблица: {summary_path}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Параллельный перебор гиперпараметров по sweep.grids")
+    parser.add_argument("experiments", type=int, nargs="+", help="Номера экспериментов")
+    parser.add_argument("--workers", type=int, default=None, help="Процессов (по умолчанию ядра / cpus-per-trial)")
+    parser.add_argument("--cpus-per-trial", type=int, default=None, help="Потоков на один триал")
+    parser.add_argument("--no-early-stopping", action="store_true", help="Выполнить все триалы сетки")
+    parser.add_argument("--no-cache", action="store_true", help="Не использовать кэш признаков")
+    parser.add_argument("--output-dir", default=None, help="Куда сохранить лучшие модели (по умолчанию training.models_dir)")
+    args = parser.parse_args()
+
+    run_sweep(args.experiments, max_workers=args.workers, cpus_per_trial=args.cpus_per_trial,
+              early_stopping=False if args.no_early_stopping else None,
+              use_cache=not args.no_cache, output_dir=args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
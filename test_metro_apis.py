@@ -1,5 +1,10 @@
-import requests
-import time
+import os
+import sys
+
+# Клиент сервисов лежит в service/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "service"))
+
+from ml_client import MLClient, SERVICE_FASTAPI, SERVICE_BENTOML
 
 # Простые тексты про метро
 test_texts = [
@@ -27,6 +32,8 @@ test_texts = [
 ]
 
 
+client = MLClient(timeout_s=5)
+
 print("\n" + "=" * 60)
 print("НАЧИНАЕМ ТЕСТИРОВАНИЕ")
 print("=" * 60)
@@ -37,61 +44,27 @@ test_text = test_texts[7]
 print(f"\nТестовый текст: '{test_text}'")
 print("-" * 40)
 
-# Тест FastAPI
-print("\n1. Тестируем FastAPI (порт 8000):")
-try:
-    start = time.time()
-    response = requests.post(
-        "http://localhost:8000/predict",
-        json={"text": test_text},
-        timeout=5
-    )
-    fastapi_time = time.time() - start
-    
-    if response.status_code == 200:
-        result = response.json()
-        print(f"   ✅ Успех!")
-        print(f"   📊 Предсказание: {result.get('prediction', 'N/A')}")
-        print(f"   ⏱️  Время: {fastapi_time:.3f} секунд")
-    else:
-        print(f"   ❌ Ошибка: {response.status_code}")
-        print(f"   📄 Ответ: {response.text}")
-except Exception as e:
-    print(f"   ❌ Исключение: {e}")
-
-# Тест BentoML  
-print("\n2. Тестируем BentoML (порт 3000):")
-try:
-    start = time.time()
-    
-    # Пробуем JSON
-    response = requests.post(
-        "http://localhost:3000/predict",
-        json={"text": test_text},
-        timeout=5
-    )
-    
-    # Если не сработало, пробуем text/plain
-    if response.status_code != 200:
-        response = requests.post(
-            "http://localhost:3000/predict",
-            data=test_text,
-            headers={"Content-Type": "text/plain"},
-            timeout=5
-        )
-    
-    bentoml_time = time.time() - start
-    
-    if response.status_code == 200:
-        result = response.json() if response.headers.get('content-type') == 'application/json' else response.text
-        print(f"   ✅ Успех!")
-        print(f"   📊 Результат: {result}")
-        print(f"   ⏱️  Время: {bentoml_time:.3f} секунд")
-    else:
-        print(f"   ❌ Ошибка: {response.status_code}")
-        print(f"   📄 Ответ: {response.text}")
-except Exception as e:
-    print(f"   ❌ Исключение: {e}")
+# FastAPI и BentoML опрашиваются одновременно
+results = client.predict_all(test_text)
+
+print("\n1. FastAPI (порт 8000):")
+result = results[SERVICE_FASTAPI]
+if not result.get("error"):
+    print(f"   ✅ Успех!")
+    print(f"   📊 Предсказание: {result.get('prediction', 'N/A')}")
+    print(f"   ⏱️  Время: {result['latency_ms'] / 1000:.3f} секунд")
+else:
+    print(f"   ❌ Ошибка: {result['error']}")
+
+print("\n2. BentoML (порт 3000):")
+result = results[SERVICE_BENTOML]
+if not result.get("error"):
+    print(f"   ✅ Успех!")
+    print(f"   📊 Результат: {result}")
+    print(f"   ⏱️  Время: {result['latency_ms'] / 1000:.3f} секунд")
+    print(f"   📦 Формат запроса: {client.bentoml_format}")
+else:
+    print(f"   ❌ Ошибка: {result['error']}")
 
 print("\n" + "=" * 60)
 print("ТЕСТИРУЕМ ЕЩЕ НЕСКОЛЬКО ТЕКСТОВ")
@@ -100,44 +73,28 @@ print("=" * 60)
 # Тестируем еще несколько текстов
 for i, text in enumerate(test_texts[1:4], 2):
     print(f"\n{i}. Текст: '{text[:50]}...'")
-    
-    # FastAPI
-    try:
-        response = requests.post(
-            "http://localhost:8000/predict",
-            json={"text": text},
-            timeout=5
-        )
-        if response.status_code == 200:
-            result = response.json()
-            print(f"   FastAPI: {result.get('prediction', 'N/A')}")
+    results = client.predict_all(text)
+    for service, name in ((SERVICE_FASTAPI, "FastAPI"), (SERVICE_BENTOML, "BentoML")):
+        result = results[service]
+        if not result.get("error"):
+            print(f"   {name}: {result.get('prediction', 'N/A')}")
         else:
-            print(f"   FastAPI: ошибка")
-    except:
-        print(f"   FastAPI: не отвечает")
-    
-    # BentoML
-    try:
-        response = requests.post(
-            "http://localhost:3000/predict",
-            json={"text": text},
-            timeout=5
-        )
-        if response.status_code != 200:
-            response = requests.post(
-                "http://localhost:3000/predict",
-                data=text,
-                headers={"Content-Type": "text/plain"},
-                timeout=5
-            )
-        
-        if response.status_code == 200:
-            result = response.json() if response.headers.get('content-type') == 'application/json' else response.text
-            print(f"   BentoML: {result}")
-        else:
-            print(f"   BentoML: ошибка")
-    except:
-        print(f"   BentoML: не отвечает")
+            print(f"   {name}: ошибка ({result['error']})")
+
+print("\n" + "=" * 60)
+print("BATCH: ВСЕ ТЕКСТЫ ОДНИМ ЗАПРОСОМ")
+print("=" * 60)
+
+results = client.predict_batch_all(test_texts)
+for service, name in ((SERVICE_FASTAPI, "FastAPI"), (SERVICE_BENTOML, "BentoML")):
+    result = results[service]
+    if not result.get("error"):
+        predictions = [round(p["prediction"], 2) for p in result["predictions"]]
+        print(f"   {name}: {predictions} за {result['latency_ms']:.1f} мс")
+    else:
+        print(f"   {name}: ошибка ({result['error']})")
+
+client.close()
 
 print("\n" + "=" * 60)
 print("КАК ЭТО ЗАПУСТИТЬ:")
@@ -0,0 +1,67 @@
+"""Паритет NumPy движка с sklearn на моделях сервиса.
+
+Запуск из корня проекта:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import joblib
+import numpy as np
+import pytest
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "service")
+sys.path.insert(0, SERVICE_DIR)
+
+from compact_artifacts import CompactArtifacts
+from predictor import ModelPredictor
+from scoring_engine import LinearTfidfEngine, PARITY_SAMPLE_TEXTS, check_parity
+
+MODELS_DIR = os.path.join(SERVICE_DIR, "models")
+MODEL_PATH = os.path.join(MODELS_DIR, "best_model.pkl")
+VECTORIZER_PATH = os.path.join(MODELS_DIR, "tfidf_vectorizer.pkl")
+COMPACT_DIR = os.path.join(MODELS_DIR, "compact")
+
+EDGE_CASE_TEXTS = [
+    "",
+    "   \n\t  ",
+    "!!! ??? ... ,,, ---",
+    "a б 1",
+    "qwertyuiop zxcvbnm несуществующееслово",
+    "МЕТРО Метро метро",
+    "метро " * 200,
+    "станция метро, пересадка! ремонт? 2024 год",
+]
+
+
+@pytest.fixture(scope="module")
+def sklearn_pair():
+    return joblib.load(MODEL_PATH), joblib.load(VECTORIZER_PATH)
+
+
+@pytest.mark.parametrize("source", ["compact", "pickle"])
+def test_engine_matches_sklearn(sklearn_pair, source):
+    model, vectorizer = sklearn_pair
+    if source == "compact":
+        artifacts = CompactArtifacts.load(COMPACT_DIR)
+    else:
+        artifacts = CompactArtifacts.from_sklearn(model, vectorizer)
+    engine = LinearTfidfEngine(artifacts)
+    check_parity(engine, model, vectorizer, PARITY_SAMPLE_TEXTS + EDGE_CASE_TEXTS)
+
+
+def test_empty_batch():
+    engine = LinearTfidfEngine(CompactArtifacts.load(COMPACT_DIR))
+    assert engine.predict([]).shape == (0,)
+
+
+def test_engine_and_sklearn_batches_agree():
+    """Небольшой батч считает движок, большой - sklearn: ответы одинаковые"""
+    predictor = ModelPredictor(MODEL_PATH, VECTORIZER_PATH, compact_dir=COMPACT_DIR, engine_max_batch=4)
+    texts = EDGE_CASE_TEXTS * 2
+    small = np.concatenate([predictor.batch_predict_array(texts[i:i + 4])[0] for i in range(0, len(texts), 4)])
+    large, errors = predictor.batch_predict_array(texts)
+    assert not errors
+    assert predictor.engine is not None and predictor._loaded.has_sklearn
+    np.testing.assert_allclose(small, large, atol=1e-8)
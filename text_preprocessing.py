@@ -0,0 +1,130 @@
+# text_preprocessing.py
+
+import re
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Iterable, List
+
+# Режимы предобработки: как в ноутбуке для exp1 (леммы) и exp3 (стеммы)
+MODE_LEMMATIZE = "lemmatize"
+MODE_STEM = "stem"
+SUPPORTED_MODES = (MODE_LEMMATIZE, MODE_STEM)
+
+DEFAULT_MEMO_SIZE = 100_000
+DEFAULT_MIN_TOKEN_LENGTH = 3
+
+# В ноутбуке текст чистится тремя regex (пунктуация, всё кроме русских букв,
+# лишние пробелы) и затем режется word_tokenize. После такой чистки в тексте
+# остаются только русские буквы и одиночные пробелы, и word_tokenize сводится
+# к split - поэтому хватает одного заранее скомпилированного regex.
+_TOKEN_RE = re.compile(r"[а-яё]+")
+
+
+@lru_cache(maxsize=1)
+def get_stop_words() -> FrozenSet[str]:
+    """Русские стоп-слова NLTK, загружаются один раз на процесс"""
+    import nltk
+    from nltk.corpus import stopwords
+
+    try:
+        words = stopwords.words("russian")
+    except LookupError:
+        nltk.download("stopwords", quiet=True)
+        words = stopwords.words("russian")
+    return frozenset(words)
+
+
+def tokenize(text: str) -> List[str]:
+    """Нижний регистр и русские слова - эквивалент чистки из ноутбука"""
+    if not isinstance(text, str):
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+class TextPreprocessor:
+    """Предобработка текста, общая для обучения и сервиса.
+
+    Повторяет preprocess_text / preprocess_text_with_stemming из ноутбука,
+    но без повторной работы на каждом вызове: regex компилируется один раз,
+    стоп-слова - frozenset на процесс, а нормальная форма токена
+    запоминается в ограниченном LRU, так что частые слова не проходят
+    через pymorphy3 повторно.
+    """
+
+    def __init__(self, mode: str = MODE_LEMMATIZE, memo_size: int = DEFAULT_MEMO_SIZE,
+                 min_token_length: int = DEFAULT_MIN_TOKEN_LENGTH):
+        if mode not in SUPPORTED_MODES:
+            raise ValueError(f"Неизвестный режим предобработки: {mode}. Доступны: {SUPPORTED_MODES}")
+
+        self.mode = mode
+        self.memo_size = int(memo_size)
+        self.min_token_length = int(min_token_length)
+        self._setup()
+
+    def _setup(self):
+        self.stop_words = get_stop_words()
+        self._normalize_token = lru_cache(maxsize=self.memo_size)(self._build_normalizer())
+
+    def _build_normalizer(self) -> Callable[[str], str]:
+        if self.mode == MODE_LEMMATIZE:
+            import pymorphy3
+            morph = pymorphy3.MorphAnalyzer()
+            return lambda token: morph.parse(token)[0].normal_form
+
+        from nltk.stem.snowball import SnowballStemmer
+        stemmer = SnowballStemmer("russian")
+        return stemmer.stem
+
+    # При передаче в другой процесс (пул воркеров) пересоздаем анализатор
+    # на месте, а не тащим его через pickle
+    def __getstate__(self) -> Dict[str, object]:
+        return {
+            "mode": self.mode,
+            "memo_size": self.memo_size,
+            "min_token_length": self.min_token_length
+        }
+
+    def __setstate__(self, state: Dict[str, object]):
+        self.__dict__.update(state)
+        self._setup()
+
+    def __call__(self, text: str) -> str:
+        return self.preprocess(text)
+
+    def preprocess(self, text: str) -> str:
+        """Текст -> строка нормальных форм через пробел (как processed_text)"""
+        stop_words = self.stop_words
+        min_length = self.min_token_length
+        normalize = self._normalize_token
+        return " ".join(
+            normalize(token)
+            for token in tokenize(text)
+            if len(token) >= min_length and token not in stop_words
+        )
+
+    def preprocess_batch(self, texts: Iterable[str]) -> List[str]:
+        return [self.preprocess(text) for text in texts]
+
+    def get_memo_info(self) -> Dict[str, int]:
+        info = self._normalize_token.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize
+        }
+
+
+@lru_cache(maxsize=None)
+def get_preprocessor(mode: str = MODE_LEMMATIZE) -> TextPreprocessor:
+    """Общий экземпляр предобработчика на процесс для каждого режима"""
+    return TextPreprocessor(mode=mode)
+
+
+def preprocess_text(text: str) -> str:
+    """Лемматизация - замена preprocess_text из ноутбука"""
+    return get_preprocessor(MODE_LEMMATIZE).preprocess(text)
+
+
+def preprocess_text_with_stemming(text: str) -> str:
+    """Стемминг - замена preprocess_text_with_stemming из ноутбука"""
+    return get_preprocessor(MODE_STEM).preprocess(text)
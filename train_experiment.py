@@ -0,0 +1,345 @@
+# train_experiment.py
+
+"""Обучение экспериментов ridge / random_forest / neural_network / hashing из train_config.yaml.
+
+Повторяет ячейки ноутбука без ClearML: сплит по training.test_size и
+random_state, TF-IDF, опционально TruncatedSVD, модель, MAE / RMSE / R2.
+Обученные TfidfVectorizer и TruncatedSVD вместе с матрицами train/test
+берутся из кэша признаков (training.feature_cache, см. feature_cache.py):
+ключ TF-IDF - датасет, сплит и tfidf_params, ключ SVD - ключ TF-IDF и
+настройки svd. Если меняются только параметры модели, CSV даже не читается,
+а эксперименты с общим датасетом и tfidf_params делят одну запись.
+
+Тип hashing (experiment4) вместо TfidfVectorizer использует
+HashingTfidfFeaturizer: IDF копится по чанкам train сплита (chunk_size), а
+сервису достаточно .npz без словаря. Ridge обучается в памяти на всей
+матрице признаков - вне памяти обучается тип sgd (train_incremental.py,
+experiment5) через SGDRegressor.partial_fit.
+
+Пример:
+    python train_experiment.py 1 2
+    python train_experiment.py 4 --output-dir service/models
+    python train_experiment.py 2 --no-cache
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+import joblib
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from config_loader import config
+from feature_cache import FeatureCache, cache_key, file_digest
+
+TARGET_COLUMN = "comments_count"
+SUPPORTED_TYPES = ("ridge", "random_forest", "neural_network", "hashing")
+TYPE_HASHING = "hashing"
+
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+CACHE_OFF = "off"
+
+
+def load_split(exp_config):
+    """Сплит как в ноутбуке: test_size и random_state из секции training"""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    dataset_info = config.get_dataset_info(exp_config["dataset"])
+    text_column = dataset_info.get("text_column", "processed_text")
+    df = pd.read_csv(config.get_dataset_path(exp_config["dataset"]), usecols=[text_column, TARGET_COLUMN])
+    df = df.dropna(subset=[text_column, TARGET_COLUMN])
+
+    training = config.get_training_params()
+    train_df, test_df = train_test_split(df, test_size=training["test_size"], random_state=training["random_state"])
+    return train_df, test_df, text_column
+
+
+def tfidf_spec(exp_config) -> Dict[str, Any]:
+    """Все, от чего зависят TF-IDF (или hashing признаки) и матрицы train/test"""
+    import sklearn
+
+    dataset_info = config.get_dataset_info(exp_config["dataset"])
+    training = config.get_training_params()
+    spec = {
+        "stage": "tfidf",
+        "dataset_id": dataset_info.get("id", exp_config["dataset"]),
+        "dataset_sha256": file_digest(config.get_dataset_path(exp_config["dataset"])),
+        "text_column": dataset_info.get("text_column", "processed_text"),
+        "target": TARGET_COLUMN,
+        "test_size": training["test_size"],
+        "random_state": training["random_state"],
+        "sklearn": sklearn.__version__
+    }
+    if exp_config["type"] == TYPE_HASHING:
+        spec.update(stage="hashing", hashing_params=exp_config["hashing_params"], idf=exp_config.get("idf", {}))
+    else:
+        spec["tfidf_params"] = exp_config["tfidf_params"]
+    return spec
+
+
+def svd_spec(exp_config, tfidf_key: str) -> Optional[Dict[str, Any]]:
+    svd_config = exp_config.get("svd") or {}
+    if not svd_config.get("enabled", False):
+        return None
+    return {
+        "stage": "svd",
+        "tfidf_key": tfidf_key,
+        "components": svd_config["components"],
+        # Как в ноутбуке: TruncatedSVD(random_state=42) независимо от сплита
+        "random_state": svd_config.get("random_state", 42)
+    }
+
+
+def fit_tfidf(exp_config) -> Dict[str, Any]:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    train_df, test_df, text_column = load_split(exp_config)
+    tfidf_params = dict(exp_config["tfidf_params"])
+    tfidf_params["ngram_range"] = tuple(tfidf_params["ngram_range"])
+    vectorizer = TfidfVectorizer(**tfidf_params)
+    return {
+        "vectorizer": vectorizer,
+        "X_train": vectorizer.fit_transform(train_df[text_column]),
+        "X_test": vectorizer.transform(test_df[text_column]),
+        "y_train": train_df[TARGET_COLUMN].values.astype(np.float64),
+        "y_test": test_df[TARGET_COLUMN].values.astype(np.float64)
+    }
+
+
+def fit_hashing(exp_config) -> Dict[str, Any]:
+    """Hashing признаки: IDF по чанкам train сплита, как при обучении вне памяти"""
+    from hashing_features import HashingTfidfFeaturizer
+
+    train_df, test_df, text_column = load_split(exp_config)
+    featurizer = HashingTfidfFeaturizer.from_config(exp_config)
+    train_texts = train_df[text_column].tolist()
+    chunk_size = exp_config.get("chunk_size", 1000)
+    for start in range(0, len(train_texts), chunk_size):
+        featurizer.partial_fit(train_texts[start:start + chunk_size])
+    return {
+        "vectorizer": featurizer,
+        "X_train": featurizer.transform(train_texts),
+        "X_test": featurizer.transform(test_df[text_column].tolist()),
+        "y_train": train_df[TARGET_COLUMN].values.astype(np.float64),
+        "y_test": test_df[TARGET_COLUMN].values.astype(np.float64)
+    }
+
+
+def fit_svd(spec: Dict[str, Any], X_train, X_test) -> Dict[str, Any]:
+    from sklearn.decomposition import TruncatedSVD
+
+    svd = TruncatedSVD(n_components=spec["components"], random_state=spec["random_state"])
+    return {"svd": svd, "X_train": svd.fit_transform(X_train), "X_test": svd.transform(X_test)}
+
+
+def build_features(exp_config, cache: Optional[FeatureCache] = None) -> Dict[str, Any]:
+    """Векторайзер, SVD и матрицы train/test эксперимента - из кэша или обучением.
+
+    Возвращает словарь с ключами vectorizer, svd (None без SVD), X_train,
+    X_test, y_train, y_test и cache - статус кэша по стадиям.
+    """
+    stage_tfidf = tfidf_spec(exp_config) if cache is not None else None
+    tfidf_key = cache_key(stage_tfidf) if cache is not None else None
+    stage_svd = svd_spec(exp_config, tfidf_key)
+    svd_key = cache_key(stage_svd) if cache is not None and stage_svd is not None else None
+    status = {"tfidf": CACHE_OFF, "svd": CACHE_OFF if stage_svd is not None else None}
+
+    tfidf_entry = cache.get(tfidf_key) if cache is not None else None
+    if tfidf_entry is not None:
+        status["tfidf"] = CACHE_HIT
+        tfidf = {name: tfidf_entry.load(name) for name in ("vectorizer", "y_train", "y_test")}
+    else:
+        tfidf = fit_hashing(exp_config) if exp_config["type"] == TYPE_HASHING else fit_tfidf(exp_config)
+        if cache is not None:
+            status["tfidf"] = CACHE_MISS
+            tfidf_entry = cache.put(tfidf_key, tfidf, spec=stage_tfidf)
+
+    features = {"vectorizer": tfidf["vectorizer"], "svd": None,
+                "y_train": tfidf["y_train"], "y_test": tfidf["y_test"], "cache": status}
+
+    if stage_svd is None:
+        for name in ("X_train", "X_test"):
+            features[name] = tfidf[name] if name in tfidf else tfidf_entry.load(name)
+        return features
+
+    svd_entry = cache.get(svd_key) if cache is not None else None
+    if svd_entry is not None:
+        status["svd"] = CACHE_HIT
+        svd = {name: svd_entry.load(name) for name in ("svd", "X_train", "X_test")}
+    else:
+        # Разреженные матрицы читаются из кэша, только если SVD придется обучать
+        X_train = tfidf["X_train"] if "X_train" in tfidf else tfidf_entry.load("X_train")
+        X_test = tfidf["X_test"] if "X_test" in tfidf else tfidf_entry.load("X_test")
+        svd = fit_svd(stage_svd, X_train, X_test)
+        if cache is not None:
+            status["svd"] = CACHE_MISS
+            cache.put(svd_key, svd, spec=stage_svd)
+    features.update(svd)
+    return features
+
+
+def build_model(exp_config, input_dim: int):
+    exp_type = exp_config["type"]
+    if exp_type in ("ridge", TYPE_HASHING):
+        from sklearn.linear_model import Ridge
+        return Ridge(**exp_config["ridge_params"])
+    if exp_type == "random_forest":
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor(**exp_config["rf_params"])
+    if exp_type == "neural_network":
+        return build_keras_model(exp_config["nn_params"], input_dim)
+    raise ValueError(f"Тип эксперимента {exp_type} не поддерживается, ожидается один из {SUPPORTED_TYPES}")
+
+
+def build_keras_model(nn_params: Dict[str, Any], input_dim: int):
+    """DNN из ноутбука; tensorflow нужен только для экспериментов neural_network"""
+    try:
+        import tensorflow as tf
+    except ImportError as e:
+        raise ImportError("Для эксперимента neural_network нужен tensorflow: pip install tensorflow") from e
+
+    model = tf.keras.Sequential([tf.keras.Input(shape=(input_dim,))])
+    for units in nn_params["hidden_units"]:
+        model.add(tf.keras.layers.Dense(units, activation="relu"))
+        model.add(tf.keras.layers.Dropout(nn_params["dropout_rate"]))
+    model.add(tf.keras.layers.Dense(1))
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=nn_params["learning_rate"]),
+                  loss="mse", metrics=["mae"])
+    return model
+
+
+def fit_model(exp_config, model, features: Dict[str, Any]):
+    if exp_config["type"] != "neural_network":
+        model.fit(features["X_train"], features["y_train"])
+        return model
+
+    import tensorflow as tf
+    nn_params = exp_config["nn_params"]
+    # Не изменяем X из кэша: keras получает копию в float32
+    X_train = np.asarray(features["X_train"], dtype=np.float32)
+    X_test = np.asarray(features["X_test"], dtype=np.float32)
+    early_stop = tf.keras.callbacks.EarlyStopping(monitor="val_loss", patience=10, restore_best_weights=True)
+    model.fit(X_train, features["y_train"], validation_data=(X_test, features["y_test"]),
+              epochs=nn_params["epochs"], batch_size=nn_params["batch_size"],
+              callbacks=[early_stop], verbose=0)
+    return model
+
+
+def predict(exp_config, model, X) -> np.ndarray:
+    if exp_config["type"] == "neural_network":
+        return model.predict(np.asarray(X, dtype=np.float32), verbose=0).reshape(-1)
+    return model.predict(X)
+
+
+def save_model(exp_config, model, features: Dict[str, Any], output_dir: str) -> Dict[str, str]:
+    """Артефакты в форматах, которые читает ModelPredictor (см. registry в inference_config)"""
+    os.makedirs(output_dir, exist_ok=True)
+    name = exp_config["name"]
+    if exp_config["type"] == "neural_network":
+        model_path = os.path.join(output_dir, f"{name}.h5")
+        preprocessing_path = os.path.join(output_dir, f"{name}_preprocessing.pkl")
+        model.save(model_path)
+        joblib.dump({"vectorizer": features["vectorizer"], "svd": features["svd"]}, preprocessing_path)
+        return {"model_path": model_path, "vectorizer_path": preprocessing_path}
+
+    if exp_config["type"] == TYPE_HASHING:
+        # Как у train_incremental.py: модель + .npz признаков (параметры и IDF, без словаря)
+        model_path = os.path.join(output_dir, f"{name}.pkl")
+        vectorizer_path = os.path.join(output_dir, f"{name}_vectorizer.npz")
+        joblib.dump(model, model_path)
+        features["vectorizer"].save(vectorizer_path)
+        return {"model_path": model_path, "vectorizer_path": vectorizer_path}
+
+    # Пайплайн как rf_pipeline.pkl в ноутбуке: векторайзер внутри pickle модели
+    model_path = os.path.join(output_dir, f"{name}.pkl")
+    joblib.dump({"vectorizer": features["vectorizer"], "svd": features["svd"], "model": model}, model_path)
+    return {"model_path": model_path}
+
+
+def train_experiment(exp_num: int, use_cache: bool = True, output_dir: str = None,
+                     cache: Optional[FeatureCache] = None) -> Dict[str, Any]:
+    """Обучает эксперимент, сохраняет модель и отчет с метриками"""
+    exp_config = config.get_experiment_config(exp_num)
+    if exp_config["type"] not in SUPPORTED_TYPES:
+        raise ValueError(f"Эксперимент {exp_num} имеет тип {exp_config['type']}, "
+                         f"ожидается один из {SUPPORTED_TYPES}")
+
+    training = config.get_training_params()
+    name = exp_config["name"]
+    output_dir = output_dir or config.resolve_path(training.get("models_dir", "models/"))
+    if use_cache and cache is None:
+        cache = config.get_feature_cache()
+    elif not use_cache:
+        cache = None
+
+    print(f"🚀 Эксперимент {exp_num}: {name} ({exp_config['type']}, датасет {exp_config['dataset']})")
+
+    start_time = time.perf_counter()
+    features = build_features(exp_config, cache)
+    features_time = time.perf_counter() - start_time
+    status = features["cache"]
+    print(f"   Признаки: {features['X_train'].shape} за {features_time:.2f} с "
+          f"(TF-IDF: {status['tfidf']}" + (f", SVD: {status['svd']})" if status["svd"] else ")"))
+
+    fit_start = time.perf_counter()
+    model = build_model(exp_config, features["X_train"].shape[1])
+    model = fit_model(exp_config, model, features)
+    fit_time = time.perf_counter() - fit_start
+
+    y_test = features["y_test"]
+    y_pred = predict(exp_config, model, features["X_test"])
+    metrics = {
+        "mae": float(mean_absolute_error(y_test, y_pred)),
+        "rmse": float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        "r2": float(r2_score(y_test, y_pred)),
+        "rows": int(len(y_test))
+    }
+    print(f"   Модель обучена за {fit_time:.2f} с: MAE={metrics['mae']:.3f} "
+          f"RMSE={metrics['rmse']:.3f} R2={metrics['r2']:.3f}")
+
+    paths = save_model(exp_config, model, features, output_dir)
+    report = {
+        "experiment": name,
+        "type": exp_config["type"],
+        "metrics": metrics,
+        "features_s": round(features_time, 2),
+        "fit_s": round(fit_time, 2),
+        "elapsed_s": round(time.perf_counter() - start_time, 2),
+        "feature_cache": status,
+        **paths
+    }
+    if cache is not None:
+        report["feature_cache_stats"] = cache.get_stats()
+    with open(os.path.join(output_dir, f"{name}_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ Готово за {report['elapsed_s']} с")
+    print(f"   Модель: {paths['model_path']}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обучение экспериментов TF-IDF и hashing из train_config.yaml")
+    parser.add_argument("experiments", type=int, nargs="+", help="Номера экспериментов")
+    parser.add_argument("--no-cache", action="store_true", help="Не использовать кэш признаков")
+    parser.add_argument("--clear-cache", action="store_true", help="Очистить кэш признаков перед запуском")
+    parser.add_argument("--output-dir", default=None, help="Куда сохранить модели (по умолчанию training.models_dir)")
+    args = parser.parse_args()
+
+    # Один кэш на все эксперименты запуска: общая статистика попаданий
+    cache = None if args.no_cache else config.get_feature_cache()
+    if cache is not None and args.clear_cache:
+        cache.clear()
+    for exp_num in args.experiments:
+        train_experiment(exp_num, use_cache=cache is not None, output_dir=args.output_dir, cache=cache)
+    if cache is not None:
+        print(f"📊 Кэш признаков: {cache.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
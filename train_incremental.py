@@ -0,0 +1,282 @@
+# train_incremental.py
+
+"""Обучение вне памяти: датасет эксперимента читается чанками.
+
+Вместо загрузки всего CSV и TfidfVectorizer + Ridge в памяти используется
+HashingTfidfFeaturizer (признаки фиксированного размера, IDF копится потоково)
+и SGDRegressor.partial_fit. В памяти одновременно находится только один
+чанк, поэтому пиковое потребление не растет вместе с датасетом.
+
+Порядок: проход по CSV для IDF, затем epochs проходов обучения, после
+каждой эпохи - оценка на отложенных строках тоже потоком. Отложенные строки
+выбираются детерминированно по (random_state, номер чанка), поэтому
+совпадают во всех проходах и после --resume. Чекпоинт (модель, признаки,
+позиция в датасете) сохраняется между чанками.
+
+Пример:
+    python train_incremental.py 5
+    python train_incremental.py 5 --resume
+"""
+
+import argparse
+import json
+import os
+import resource
+import time
+from typing import Any, Dict, Optional
+
+import joblib
+import numpy as np
+from sklearn.linear_model import SGDRegressor
+
+from config_loader import config
+from hashing_features import HashingTfidfFeaturizer, iter_csv_chunks
+
+TARGET_COLUMN = "comments_count"
+STATE_FILE = "state.json"
+PHASE_IDF = "idf"
+PHASE_TRAIN = "train"
+PHASE_DONE = "done"
+
+
+def peak_memory_mb() -> float:
+    """Пиковый RSS процесса (ru_maxrss в Linux - в килобайтах)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def holdout_mask(chunk_index: int, size: int, test_size: float, random_state: int) -> np.ndarray:
+    """Отложенные строки чанка - одни и те же при каждом проходе"""
+    rng = np.random.default_rng([random_state, chunk_index])
+    return rng.random(size) < test_size
+
+
+class StreamingMetrics:
+    """MAE / RMSE / R2 по суммам, без хранения предсказаний"""
+
+    def __init__(self):
+        self.count = 0
+        self.abs_error = 0.0
+        self.squared_error = 0.0
+        self.target_sum = 0.0
+        self.target_squared_sum = 0.0
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray):
+        errors = y_true - y_pred
+        self.count += len(y_true)
+        self.abs_error += float(np.abs(errors).sum())
+        self.squared_error += float((errors ** 2).sum())
+        self.target_sum += float(y_true.sum())
+        self.target_squared_sum += float((y_true ** 2).sum())
+
+    def result(self) -> Dict[str, float]:
+        if not self.count:
+            return {}
+        total = self.target_squared_sum - self.target_sum ** 2 / self.count
+        return {
+            "mae": self.abs_error / self.count,
+            "rmse": float(np.sqrt(self.squared_error / self.count)),
+            "r2": 1 - self.squared_error / total if total else 0.0,
+            "rows": self.count
+        }
+
+
+def save_checkpoint(checkpoint_dir: str, featurizer: HashingTfidfFeaturizer,
+                    model: SGDRegressor, state: Dict[str, Any]):
+    """Сохраняет чекпоинт; state.json пишется последним и ссылается на файлы шага.
+
+    Прерывание в любой момент оставляет предыдущий согласованный чекпоинт.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    previous = _load_state(checkpoint_dir)
+
+    step = state["step"]
+    state["model_file"] = f"model_{step}.pkl"
+    state["vectorizer_file"] = f"vectorizer_{step}.npz"
+    joblib.dump(model, os.path.join(checkpoint_dir, state["model_file"]))
+    featurizer.save(os.path.join(checkpoint_dir, state["vectorizer_file"]))
+
+    tmp_path = os.path.join(checkpoint_dir, STATE_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(checkpoint_dir, STATE_FILE))
+
+    if previous:
+        for key in ("model_file", "vectorizer_file"):
+            if previous[key] != state[key]:
+                path = os.path.join(checkpoint_dir, previous[key])
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def _load_state(checkpoint_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(checkpoint_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_checkpoint(checkpoint_dir: str):
+    """(featurizer, model, state) из чекпоинта или None"""
+    state = _load_state(checkpoint_dir)
+    if state is None:
+        return None
+    featurizer = HashingTfidfFeaturizer.load(os.path.join(checkpoint_dir, state["vectorizer_file"]))
+    model = joblib.load(os.path.join(checkpoint_dir, state["model_file"]))
+    return featurizer, model, state
+
+
+def evaluate(featurizer, model, data_path: str, text_column: str, chunk_size: int,
+             test_size: float, random_state: int) -> Dict[str, float]:
+    """Метрики на отложенных строках, датасет читается потоком"""
+    metrics = StreamingMetrics()
+    for chunk_index, chunk in enumerate(iter_csv_chunks(data_path, text_column, TARGET_COLUMN, chunk_size)):
+        mask = holdout_mask(chunk_index, len(chunk), test_size, random_state)
+        if not mask.any():
+            continue
+        holdout = chunk[mask]
+        predictions = model.predict(featurizer.transform(holdout[text_column].tolist()))
+        metrics.update(holdout[TARGET_COLUMN].values.astype(np.float64), predictions)
+    return metrics.result()
+
+
+def train_incremental(exp_num: int, resume: bool = False, checkpoint_dir: str = None,
+                      output_dir: str = None) -> Dict[str, Any]:
+    """Обучает эксперимент типа sgd чанками и сохраняет модель + признаки"""
+    exp_config = config.get_experiment_config(exp_num)
+    if exp_config["type"] != "sgd":
+        raise ValueError(f"Эксперимент {exp_num} имеет тип {exp_config['type']}, ожидается sgd")
+
+    training = config.get_training_params()
+    test_size = training["test_size"]
+    random_state = training["random_state"]
+    name = exp_config["name"]
+    dataset_info = config.get_dataset_info(exp_config["dataset"])
+    text_column = dataset_info.get("text_column", "processed_text")
+    data_path = config.get_dataset_path(exp_config["dataset"])
+    chunk_size = exp_config.get("chunk_size", 1000)
+    epochs = exp_config.get("epochs", 1)
+    checkpoint_every = max(1, exp_config.get("checkpoint_every", 1))
+    checkpoint_dir = checkpoint_dir or config.resolve_path(
+        os.path.join(training.get("artifacts_dir", "artifacts/"), "checkpoints", name))
+    output_dir = output_dir or config.resolve_path(training.get("models_dir", "models/"))
+
+    # От этих значений зависят номера чанков и отложенная выборка (holdout_mask):
+    # продолжение с другими пропустило бы не те строки и сменило бы тест посреди обучения
+    split_params = {"chunk_size": chunk_size, "test_size": test_size, "random_state": random_state}
+
+    checkpoint = load_checkpoint(checkpoint_dir) if resume else None
+    if checkpoint is not None:
+        featurizer, model, state = checkpoint
+        if (state["experiment"], state["data_path"]) != (f"experiment{exp_num}", data_path):
+            raise ValueError(f"Чекпоинт относится к другому запуску: {state['experiment']}, {state['data_path']}")
+        mismatched = {name: state.get(name) for name, value in split_params.items() if state.get(name) != value}
+        if mismatched:
+            raise ValueError(f"Чекпоинт записан с другими параметрами {mismatched}; "
+                             f"верните их в train_config.yaml или запустите без --resume")
+        print(f"▶️  Продолжаем: фаза {state['phase']}, эпоха {state['epoch']}, чанк {state['chunks_done']}")
+    else:
+        featurizer = HashingTfidfFeaturizer.from_config(exp_config)
+        model = SGDRegressor(**exp_config["sgd_params"])
+        state = {"experiment": f"experiment{exp_num}", "data_path": data_path, **split_params,
+                 "phase": PHASE_IDF if featurizer.use_idf else PHASE_TRAIN,
+                 "epoch": 0, "chunks_done": 0, "rows_trained": 0, "step": 0,
+                 "history": [], "peak_memory_mb": 0.0}
+
+    print(f"🚀 Инкрементальное обучение: {name}")
+    print(f"   Датасет: {data_path} ({text_column})")
+    print(f"   Чанк: {chunk_size} строк, эпох: {epochs}, n_features: {featurizer.n_features}")
+    print(f"   Чекпоинты: {checkpoint_dir}")
+
+    def checkpoint_step(force: bool = False):
+        state["step"] += 1
+        state["peak_memory_mb"] = max(state["peak_memory_mb"], peak_memory_mb())
+        if force or state["chunks_done"] % checkpoint_every == 0:
+            save_checkpoint(checkpoint_dir, featurizer, model, state)
+
+    start_time = time.perf_counter()
+
+    if state["phase"] == PHASE_IDF:
+        # IDF считается только по обучающим строкам
+        for chunk_index, chunk in enumerate(iter_csv_chunks(data_path, text_column, TARGET_COLUMN, chunk_size)):
+            if chunk_index < state["chunks_done"]:
+                continue
+            mask = holdout_mask(chunk_index, len(chunk), test_size, random_state)
+            featurizer.partial_fit(chunk.loc[~mask, text_column].tolist())
+            state["chunks_done"] = chunk_index + 1
+            checkpoint_step()
+        print(f"   IDF: {featurizer.n_documents} документов, пик RSS {peak_memory_mb():.1f} МБ")
+        state["phase"] = PHASE_TRAIN
+        state["chunks_done"] = 0
+        checkpoint_step(force=True)
+
+    while state["phase"] == PHASE_TRAIN and state["epoch"] < epochs:
+        epoch = state["epoch"]
+        for chunk_index, chunk in enumerate(iter_csv_chunks(data_path, text_column, TARGET_COLUMN, chunk_size)):
+            if chunk_index < state["chunks_done"]:
+                continue
+            train = chunk[~holdout_mask(chunk_index, len(chunk), test_size, random_state)]
+            # Перемешиваем внутри чанка по-разному на каждой эпохе
+            order = np.random.default_rng([random_state, epoch, chunk_index]).permutation(len(train))
+            train = train.iloc[order]
+            if len(train):
+                model.partial_fit(featurizer.transform(train[text_column].tolist()),
+                                  train[TARGET_COLUMN].values.astype(np.float64))
+            state["chunks_done"] = chunk_index + 1
+            state["rows_trained"] += len(train)
+            checkpoint_step()
+
+        metrics = evaluate(featurizer, model, data_path, text_column, chunk_size, test_size, random_state)
+        metrics["epoch"] = epoch + 1
+        metrics["peak_memory_mb"] = round(peak_memory_mb(), 1)
+        state["history"].append(metrics)
+        print(f"   Эпоха {epoch + 1}/{epochs}: MAE={metrics.get('mae', float('nan')):.3f} "
+              f"R2={metrics.get('r2', float('nan')):.3f}, пик RSS {metrics['peak_memory_mb']} МБ")
+
+        state["epoch"] = epoch + 1
+        state["chunks_done"] = 0
+        checkpoint_step(force=True)
+
+    state["phase"] = PHASE_DONE
+    checkpoint_step(force=True)
+
+    # Пара модель + .npz признаков сразу подходит для ModelPredictor
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, f"{name}.pkl")
+    vectorizer_path = os.path.join(output_dir, f"{name}_vectorizer.npz")
+    joblib.dump(model, model_path)
+    featurizer.save(vectorizer_path)
+
+    report = {
+        "experiment": name,
+        "rows_trained": state["rows_trained"],
+        "epochs": state["epoch"],
+        "metrics": state["history"][-1] if state["history"] else {},
+        "peak_memory_mb": round(max(state["peak_memory_mb"], peak_memory_mb()), 1),
+        "elapsed_s": round(time.perf_counter() - start_time, 2),
+        "model_path": model_path,
+        "vectorizer_path": vectorizer_path
+    }
+    with open(os.path.join(output_dir, f"{name}_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ Готово за {report['elapsed_s']} с, пик RSS {report['peak_memory_mb']} МБ")
+    print(f"   Модель: {model_path}")
+    print(f"   Признаки: {vectorizer_path}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Инкрементальное обучение по чанкам датасета")
+    parser.add_argument("experiment", type=int, help="Номер эксперимента типа sgd из train_config.yaml")
+    parser.add_argument("--resume", action="store_true", help="Продолжить с последнего чекпоинта")
+    parser.add_argument("--checkpoint-dir", default=None)
+    parser.add_argument("--output-dir", default=None, help="Куда сохранить модель (по умолчанию training.models_dir)")
+    args = parser.parse_args()
+
+    train_incremental(args.experiment, resume=args.resume,
+                      checkpoint_dir=args.checkpoint_dir, output_dir=args.output_dir)
+
+
+if __name__ == "__main__":
+    main()